@@ -23,6 +23,15 @@ def get_event_class(name: str) -> type[Event] | None:
     return _event_registry.get(name)
 
 
+def _request_early_frame(event: Event) -> None:
+    """Срочное событие (или событие игры) обрабатывается ближайшим кадром, не дожидаясь дедлайна"""
+    from dependencies import app_manager, frame_scheduler
+
+    app = app_manager.get_current_app()
+    if event.latency_sensitive or (app is not None and app.latency_sensitive):
+        frame_scheduler.request_early_frame()
+
+
 def create_events_router() -> APIRouter:
     """Создает роутер для работы с событиями"""
     router = APIRouter()
@@ -37,6 +46,7 @@ def create_events_router() -> APIRouter:
         try:
             event = event_class.model_validate(payload)
             await event_queue.put(event)
+            _request_early_frame(event)
             return {"status": "ok", "event": event_name}
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
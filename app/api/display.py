@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from display_manager import MirrorMode
-from dependencies import display_manager
+from dependencies import display_manager, driver, renderer, frame_scheduler, frame_pipeline, governor
+from render.layers.utils import sprite_cache_stats
 
 
 router = APIRouter()
@@ -36,3 +37,24 @@ async def get_mirror_mode():
     return {
         "mirror_mode": display_manager.mirror_mode.value
     }
+
+
+@router.get("/sinks")
+async def get_sinks():
+    """Возвращает устройства вывода, число ошибок отправки на каждое и задержку потока транспорта"""
+    return {
+        "sinks": driver.get_sink_stats(),
+        "worker": driver.get_worker_stats()
+    }
+
+
+@router.get("/timing")
+async def get_timing():
+    """Статистика темпа кадров: джиттер, перегрузки, пропуски, конвейер, уровень качества, статичные кадры и кеш спрайтов"""
+    return {
+        **frame_scheduler.stats(),
+        "pipeline": frame_pipeline.stats(),
+        "governor": governor.stats(),
+        "static": {**driver.get_static_stats(), "render_skipped": renderer.static_hits},
+        "sprite_cache": sprite_cache_stats()
+    }
@@ -0,0 +1,71 @@
+import json
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel
+from dependencies import metrics, frame_scheduler, driver, tracer
+from frame_trace import TRACE_WINDOW
+router = APIRouter()
+
+
+class StartTraceRequest(BaseModel):
+    window: float = TRACE_WINDOW  # сколько последних секунд держать
+
+
+@router.get("/")
+async def get_metrics():
+    """Времена этапов кадра (p50/p95/p99/max), достигнутый fps, перегрузки и трафик по транспортам"""
+    return {
+        **metrics.summary(),
+        "target_fps": 1.0 / frame_scheduler.period,
+        "overruns": frame_scheduler.overruns,
+        "transports": driver.get_sink_stats()
+    }
+
+
+@router.post("/enable")
+async def enable_metrics():
+    metrics.enabled = True
+    return {"enabled": True}
+
+
+@router.post("/disable")
+async def disable_metrics():
+    metrics.enabled = False
+    return {"enabled": False}
+
+
+@router.post("/reset")
+async def reset_metrics():
+    metrics.reset()
+    return {"status": "ok"}
+
+
+@router.get("/trace")
+async def download_trace():
+    """Спаны последних секунд в формате Chrome Trace Event, открывать в ui.perfetto.dev"""
+    return Response(
+        content=json.dumps(tracer.export()),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="protothing-trace.json"'}
+    )
+
+
+@router.get("/trace/status")
+async def get_trace_status():
+    return tracer.stats()
+
+
+@router.post("/trace/start")
+async def start_trace(request: StartTraceRequest):
+    if request.window <= 0:
+        raise HTTPException(status_code=400, detail="window must be positive")
+    tracer.window = request.window
+    tracer.clear()
+    tracer.enabled = True
+    return tracer.stats()
+
+
+@router.post("/trace/stop")
+async def stop_trace():
+    """Останавливает запись, буфер остаётся доступен для выгрузки"""
+    tracer.enabled = False
+    return tracer.stats()
@@ -0,0 +1,78 @@
+"""
+Рендер кадра текущего приложения: описание кадра от app.render() -> готовый Frame.
+Общий для основного цикла и инструментов (tools/replay_bench).
+"""
+
+import numpy as np
+
+from dependencies import effect_manager, renderer
+from render.frame import Frame
+from render.frame_description import FrameDescription, RainbowEffect
+from render.led_strip import find_rainbow_effect
+
+
+# последняя склейка двух 64x32 кадров: (левый, правый, 128x32)
+_combined_frame: tuple[Frame, Frame, Frame] | None = None
+
+
+def render_app_frame(app, delta: float, timer) -> tuple[Frame | None, RainbowEffect | None]:
+    """Рендерит кадр приложения, для LED ленты возвращает ещё и rainbow effect если он есть"""
+    global _combined_frame
+    frame_desc = app.render() # получаем описание кадра или сам кадр
+    timer.lap("app_render")
+    
+    # для LED ленты нужен rainbow effect если есть
+    rainbow_effect = None
+    
+    if isinstance(frame_desc, FrameDescription):
+        frame_desc.effects.extend(effect_manager.get_effects())  # добавляем эффекты из менеджера
+        effect_manager.update_layers_cache(frame_desc.layers)  # обновляем кеш слоев для cleanup
+        rainbow_effect = find_rainbow_effect(frame_desc.effects)
+        frame = renderer.render_frame(frame_desc, delta, canvas="main") # если описание, то рендерим с dt
+        timer.lap("render_frame")
+        timer.observe("dirty_px", renderer.dirty_area)
+    elif isinstance(frame_desc, Frame):
+        frame = frame_desc  # если уже кадр, то просто берем его
+    elif isinstance(frame_desc, tuple) and len(frame_desc) == 2:
+        # tuple of two different frames for left and right 64x32 displays
+        left_frame_desc, right_frame_desc = frame_desc
+        
+        left_frame = None
+        right_frame = None
+        dirty_area = 0
+        
+        # render left frame
+        if isinstance(left_frame_desc, FrameDescription):
+            left_frame_desc.effects.extend(effect_manager.get_effects())
+            effect_manager.update_layers_cache(left_frame_desc.layers)
+            rainbow_effect = find_rainbow_effect(left_frame_desc.effects)
+            left_frame = renderer.render_frame(left_frame_desc, delta, canvas="left")
+            dirty_area += renderer.dirty_area
+        elif isinstance(left_frame_desc, Frame):
+            left_frame = left_frame_desc
+        
+        # render right frame
+        if isinstance(right_frame_desc, FrameDescription):
+            right_frame_desc.effects.extend(effect_manager.get_effects())
+            effect_manager.update_layers_cache(right_frame_desc.layers)
+            right_frame = renderer.render_frame(right_frame_desc, delta, canvas="right")
+            dirty_area += renderer.dirty_area
+        elif isinstance(right_frame_desc, Frame):
+            right_frame = right_frame_desc
+        
+        # combine both 64x32 frames into single 128x32 frame
+        if left_frame is None or right_frame is None:
+            return None, None
+        if _combined_frame and _combined_frame[0] is left_frame and _combined_frame[1] is right_frame:
+            # обе половины статичны (из кеша рендерера) - склейка та же
+            frame = _combined_frame[2]
+        else:
+            frame = Frame(128, 32)
+            frame.pixels = np.concatenate([left_frame.pixels, right_frame.pixels], axis=1)
+            _combined_frame = (left_frame, right_frame, frame)
+        timer.lap("render_frame")
+        timer.observe("dirty_px", dirty_area)
+    else:
+        return None, None
+
+    return frame, rainbow_effect
@@ -62,7 +62,7 @@ class AppManager:
 
     def set_active_app(self, app: BaseApp, with_transition: bool = True):
         """Устанавливает активное приложение с опциональным переходом"""
-        from dependencies import effect_manager
+        from dependencies import effect_manager, frame_scheduler
         
         effect_manager.clear_effects()
         
@@ -72,6 +72,10 @@ class AppManager:
         self._pending_app = app
         self._pending_old_app = old_app
         self._pending_transition = with_transition
+        frame_scheduler.wake()
+
+    def has_pending_app(self) -> bool:
+        return self._pending_app is not None
 
     def _apply_pending_app(self):
         """Применяет ожидающее приложение, если эффекты очищены"""
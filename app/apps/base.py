@@ -8,6 +8,7 @@ from render.frame import Frame
 logger = logging.getLogger(__name__)
 class BaseApp:
     name: str = "unnamed"   # unique name of the application
+    latency_sensitive: bool = False  # любое событие приложения запускает кадр сразу (игры)
 
     def __init__(self):
       pass  
@@ -30,6 +31,16 @@ class BaseApp:
         "Renders the current frame or frame description"
         return None
 
+    # через сколько секунд приложению нужен следующий кадр, если ничего не произойдёт
+    def wake_after(self) -> Optional[float]:
+        "Seconds until the next frame is needed: None - animating (every frame), math.inf - only on events"
+        return None
+
+    # событие приложения для кнопки устройства
+    def button_event(self, button_id: int) -> Optional[Event]:
+        "Event the device button maps to, None - the app ignores the button"
+        return None
+
     # список типов запросов, которые приложение может обрабатывать
     def get_queries(self) -> list[type[Query]]:
         "Returns a list of query types that the application can handle"
@@ -1,3 +1,4 @@
+import math
 from apps.base import BaseApp
 from render.frame_description import FrameDescription
 from utils.sprites import load_sprite
@@ -9,4 +10,7 @@ class BSODApp(BaseApp):
         """Возвращает описание кадра с синим экраном смерти"""
         sprite = load_sprite("assets/bsod/bsod.png")
         return FrameDescription(layers=[sprite])
-        
+
+    def wake_after(self) -> float:
+        """Картинка не меняется, кадр нужен только по событию"""
+        return math.inf
@@ -12,6 +12,7 @@ logger = logging.getLogger(__name__)
 
 class DinoGameApp(BaseApp):
     name = "dino_game"
+    latency_sensitive = True
 
     def __init__(self):
         super().__init__()
@@ -110,6 +111,10 @@ class DinoGameApp(BaseApp):
     def get_events(self) -> list[type[Event]]:
         return [JumpEvent, DuckEvent, RestartEvent]
 
+    def button_event(self, button_id: int) -> Event:
+        # прыжок, после столкновения он же перезапускает игру
+        return JumpEvent()
+
     def start(self):
         super().start()
         self.reset_game()
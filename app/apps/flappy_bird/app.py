@@ -10,6 +10,7 @@ logger = logging.getLogger(__name__)
 
 class FlappyBirdApp(BaseApp):
     name = "flappy_bird"
+    latency_sensitive = True
     
     def __init__(self):
         super().__init__()
@@ -176,3 +177,7 @@ class FlappyBirdApp(BaseApp):
     
     def get_events(self):
         return [Flap, ResetFlappyBirdGame]
+
+    def button_event(self, button_id: int) -> Event:
+        # after game over the button starts a new game
+        return ResetFlappyBirdGame() if self.game_over else Flap()
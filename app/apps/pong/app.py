@@ -2,7 +2,7 @@ import numpy as np
 import logging
 from apps.base import BaseApp
 from models.app_contract import Event
-from render.frame_description import FrameDescription, RectLayer, FillLayer, TextLayer
+from render.frame_description import FrameDescription, RectLayer, RectBatchLayer, FillLayer, TextLayer
 from apps.pong.events import MovePlayer, ResetGame
 
 logger = logging.getLogger(__name__)
@@ -10,6 +10,7 @@ logger = logging.getLogger(__name__)
 
 class PongApp(BaseApp):
     name = "pong"
+    latency_sensitive = True
     
     def __init__(self):
         super().__init__()
@@ -122,15 +123,11 @@ class PongApp(BaseApp):
         # Background
         layers.append(FillLayer(color=(0, 0, 0, 255)))
         
-        # Center line
-        for y in range(0, self.height, 4):
-            layers.append(RectLayer(
-                x=self.width // 2 - 0.5,
-                y=y,
-                width=1,
-                height=2,
-                color=(100, 100, 100, 255)
-            ))
+        # Center line (all dashes in one layer)
+        layers.append(RectBatchLayer(
+            rects=[(self.width // 2 - 0.5, y, 1, 2) for y in range(0, self.height, 4)],
+            color=(100, 100, 100, 255)
+        ))
         
         # Player 1 paddle (left)
         layers.append(RectLayer(
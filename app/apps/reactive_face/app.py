@@ -7,6 +7,7 @@ import dependencies
 from .events import handle_events, get_events as imported_get_events, get_queries as imported_get_queries, handle_queries
 from utils.audio_processor import AudioProcessor
 from display_manager import MirrorMode
+import math
 import random
 import logging
 logger = logging.getLogger(__name__)
@@ -322,6 +323,17 @@ class ReactiveFaceApp(BaseApp):
         
         handle_events(self, dt, event_list)
     
+    def wake_after(self) -> float | None:
+        """Между морганиями лицо статично, следующий кадр нужен к ближайшему таймеру"""
+        if self.audio_enabled or self.blink_state is not None or self.transition_manager.active_transitions:
+            return None
+        timers = [math.inf]
+        if self.blink_enabled:
+            timers.append(self.time_to_next_blink - self.blink_elapsed_time)
+        if self.boop_active:
+            timers.append(2.0 - self.boop_elapsed_time)
+        return max(0.0, min(timers))
+
     def handle_query(self, query: Query) -> QueryResult:
         """Обрабатывает запросы приложения"""
         return handle_queries(self, query)
@@ -49,7 +49,7 @@ class FaceStateResult(QueryResult):
 
 class Boop(Event):
     """Event for button press (boop)"""
-    pass
+    latency_sensitive = True
 
 def handle_events(self: "ReactiveFaceApp", dt: float, events: list[Event]):
     self._ensure_initialized()
@@ -1,8 +1,9 @@
+import math
 import numpy as np
 import logging
 from apps.base import BaseApp
 from models.app_contract import Event
-from render.frame_description import FrameDescription, RectLayer, FillLayer, TextLayer
+from render.frame_description import FrameDescription, RectLayer, RectBatchLayer, FillLayer, TextLayer
 from apps.snake.events import MoveSnake, ResetSnakeGame
 
 logger = logging.getLogger(__name__)
@@ -109,6 +110,12 @@ class SnakeApp(BaseApp):
                 # Remove tail if no food eaten
                 self.snake_body.pop()
     
+    def wake_after(self) -> float:
+        """Между ходами поле не меняется"""
+        if self.game_over:
+            return math.inf
+        return max(0.0, self.move_interval - self.move_timer)
+
     def _is_opposite_direction(self, new_dir: int, current_dir: int) -> bool:
         """Check if new direction is opposite to current direction"""
         opposites = {0: 1, 1: 0, 2: 3, 3: 2}  # up-down, left-right
@@ -140,20 +147,19 @@ class SnakeApp(BaseApp):
                 color=(255, 100, 100, 255)
             ))
         
-        # Snake body (tail to head, so head is drawn last)
-        for i, (x, y) in enumerate(self.snake_body):
-            if i == 0:  # Head
-                color = (100, 255, 100, 255)
-            else:  # Body
-                color = (100, 200, 100, 255)
-            
-            layers.append(RectLayer(
-                x=x,
-                y=y,
-                width=self.segment_size,
-                height=self.segment_size,
-                color=color
-            ))
+        # Snake head, then the body in one layer (drawn over the head, as before)
+        head_x, head_y = self.snake_body[0]
+        layers.append(RectLayer(
+            x=head_x,
+            y=head_y,
+            width=self.segment_size,
+            height=self.segment_size,
+            color=(100, 255, 100, 255)
+        ))
+        layers.append(RectBatchLayer(
+            rects=[(x, y, self.segment_size, self.segment_size) for x, y in self.snake_body[1:]],
+            color=(100, 200, 100, 255)
+        ))
         
         # Score
         layers.append(TextLayer(
@@ -7,11 +7,21 @@ from render.renderer import Renderer
 from render.transition_engine import TransitionEngine
 from transport.driver import Driver
 from display_manager import DisplayManager
+from frame_scheduler import FrameScheduler
+from frame_pipeline import FramePipeline
+from metrics import FrameMetrics
+from frame_trace import FrameTracer
+from quality_governor import QualityGovernor
 
+tracer = FrameTracer()
 app_manager = AppManager()
 config = Config()  # будет загружен из config.yaml при старте
-driver = Driver()
-renderer = Renderer()
+driver = Driver(tracer)
+renderer = Renderer(tracer)
 effect_manager = EffectManager()
 display_manager = DisplayManager()
-transition_engine = TransitionEngine()
\ No newline at end of file
+transition_engine = TransitionEngine()
+frame_scheduler = FrameScheduler()
+governor = QualityGovernor()
+metrics = FrameMetrics(tracer=tracer)
+frame_pipeline = FramePipeline(driver, display_manager, metrics)
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Конвейер вывода кадров: рендер кадра N+1 в основном цикле идёт параллельно
+с выводом кадра N в потоке транспорта.
+"""
+
+import logging
+import weakref
+from typing import Optional
+
+import numpy as np
+
+from display_manager import DisplayManager
+from metrics import FrameMetrics
+from render.frame import Frame
+from render.frame_description import RainbowEffect
+from render.led_strip import generate_led_strip_pixels
+from transport.driver import Driver
+
+logger = logging.getLogger(__name__)
+
+# допустимое число вращающихся буферов кадра
+MIN_DEPTH = 2
+MAX_DEPTH = 3
+
+
+class _OutputJob:
+    """Этап вывода одного кадра, пока задание живо - его буфер занят"""
+
+    def __init__(self, pipeline: 'FramePipeline', frame: Frame, led_count: int,
+                 rainbow_effect: Optional[RainbowEffect]):
+        self.pipeline = pipeline
+        self.frame = frame
+        self.led_count = led_count
+        self.rainbow_effect = rainbow_effect
+
+    async def __call__(self) -> None:
+        await self.pipeline._output(self.frame, self.led_count, self.rainbow_effect)
+
+
+class FramePipeline:
+    """
+    Основной цикл делает update, render и переход, копирует кадр в один из depth
+    вращающихся буферов и сразу идёт за следующим кадром. Поток транспорта делает
+    остальное: display_manager, кодирование и отправку кадра, генерацию и отправку LED ленты.
+    NumPy отпускает GIL на большей части этой работы, так что на многоядерном Pi
+    этапы действительно идут параллельно.
+
+    Если все буферы заняты (поток вывода не успевает), ожидающий кадр выбрасывается
+    в пользу нового - на устройство всегда уходит самый свежий.
+    """
+
+    def __init__(self, driver: Driver, display_manager: DisplayManager, metrics: FrameMetrics):
+        self.driver = driver
+        self.display_manager = display_manager
+        self.metrics = metrics
+        self.depth = 0  # 0 - конвейер выключен, кадр выводится в основном цикле
+        self.submitted = 0
+        self.dropped = 0  # кадры, для которых не нашлось свободного буфера
+        self._buffers: list[Frame] = []
+        self._owners: list[Optional[weakref.ref]] = []
+
+    def configure(self, depth: int) -> None:
+        if depth and not MIN_DEPTH <= depth <= MAX_DEPTH:
+            raise ValueError(f"pipeline depth must be 0 or {MIN_DEPTH}..{MAX_DEPTH}, got {depth}")
+        if depth and not self.driver.threaded:
+            raise ValueError("pipeline requires the transport worker thread")
+        self.depth = depth
+        self._buffers = []
+        self._owners = [None] * depth
+        if depth:
+            logger.info(f"Frame pipeline enabled with {depth} buffers")
+
+    @property
+    def enabled(self) -> bool:
+        return self.depth > 0
+
+    def submit(self, frame: Frame, led_count: int, rainbow_effect: Optional[RainbowEffect]) -> None:
+        """Копирует кадр в свободный буфер и отдаёт этап вывода в поток транспорта"""
+        index = self._free_buffer()
+        if index is None:
+            # поток вывода держит все буферы - освобождаем тот, что ещё ждёт в слоте
+            self.driver.discard_output()
+            index = self._free_buffer()
+        if index is None:
+            self.dropped += 1
+            return
+
+        buffer = self._buffer_for(index, frame)
+        np.copyto(buffer.pixels, frame.pixels)
+        job = _OutputJob(self, buffer, led_count, rainbow_effect)
+        self._owners[index] = weakref.ref(job)
+        self.submitted += 1
+        self.driver.submit_output(job)
+
+    def _free_buffer(self) -> Optional[int]:
+        for index, owner in enumerate(self._owners):
+            if owner is None or owner() is None:
+                return index
+        return None
+
+    def _buffer_for(self, index: int, frame: Frame) -> Frame:
+        """Буфер нужного размера (приложения отдают 64x32 или 128x32)"""
+        while len(self._buffers) <= index:
+            self._buffers.append(Frame(frame.width, frame.height))
+        buffer = self._buffers[index]
+        if buffer.pixels.shape != frame.pixels.shape:
+            buffer = Frame(frame.width, frame.height)
+            self._buffers[index] = buffer
+        return buffer
+
+    async def _output(self, frame: Frame, led_count: int, rainbow_effect: Optional[RainbowEffect]) -> None:
+        """Выполняется в потоке транспорта, этапы пишутся в метрики под теми же именами что и без конвейера"""
+        timer = self.metrics.frame_timer()
+        frame = self.display_manager.process_frame(frame)
+        timer.lap("display_manager")
+        await self.driver.output_frame(frame)
+        timer.lap("frame_send")
+        led_pixels = generate_led_strip_pixels(led_count, frame, rainbow_effect)
+        timer.lap("led_generate")
+        await self.driver.output_led_strip_frame(led_pixels)
+        timer.lap("led_send")
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "submitted": self.submitted,
+            "dropped": self.dropped
+        }
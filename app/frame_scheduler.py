@@ -0,0 +1,207 @@
+"""
+Планировщик кадров основного цикла: абсолютные дедлайны на монотонных часах.
+"""
+
+import asyncio
+import logging
+from enum import Enum
+from time import perf_counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# сколько последних кадров хранить для статистики джиттера
+JITTER_HISTORY = 600
+# режим catch_up не догоняет больше N кадров подряд, дальше сетка пересчитывается
+MAX_CATCH_UP_FRAMES = 3
+# дольше этого цикл не простаивает, даже если приложению кадры не нужны
+IDLE_MAX_SLEEP = 1.0
+
+
+class FramePolicy(Enum):
+    DROP = "drop"  # опоздавшие дедлайны пропускаются, следующий кадр - на ближайшем узле сетки
+    CATCH_UP = "catch_up"  # опоздавшие кадры рендерятся сразу друг за другом, пока не догоним
+
+
+class FrameScheduler:
+    """
+    Держит кадры на сетке deadline = start + n * period (perf_counter, не зависит от
+    системных часов и NTP), поэтому время рендера не сдвигает темп кадров.
+    Опционально досыпает последние busy_wait секунд активным ожиданием для
+    субмиллисекундной точности (asyncio.sleep просыпается с точностью ~1 мс).
+    Срочное событие может начать кадр раньше дедлайна, но не чаще max_fps.
+    """
+
+    def __init__(self, target_fps: int = 60, policy: FramePolicy = FramePolicy.DROP, busy_wait: float = 0.0,
+                 max_fps: int = 0):
+        self._wakeup = asyncio.Event()
+        self._urgent = asyncio.Event()
+        self.configure(target_fps, policy, busy_wait, max_fps)
+
+    def configure(self, target_fps: int, policy: FramePolicy = FramePolicy.DROP, busy_wait: float = 0.0,
+                  max_fps: int = 0) -> None:
+        """max_fps - предел для ранних кадров по срочным событиям, 0 - ранние кадры выключены"""
+        self.period = 1.0 / target_fps
+        self.policy = policy
+        self.busy_wait = busy_wait
+        self.min_interval = 1.0 / max_fps if max_fps > target_fps else 0.0
+        self.reset()
+
+    def set_target_fps(self, target_fps: float) -> None:
+        """Меняет период на ходу: сетка продолжается от начала текущего кадра, статистика сохраняется"""
+        self.period = 1.0 / target_fps
+        self._next_deadline = self._last_frame_start
+
+    def reset(self) -> None:
+        """Начинает новую сетку дедлайнов от текущего момента"""
+        self._next_deadline = perf_counter()
+        self._last_frame_start = self._next_deadline
+        self._lateness = np.zeros(JITTER_HISTORY)
+        self._periods = np.zeros(JITTER_HISTORY)
+        self._count = 0
+        self.frames = 0
+        self.overruns = 0  # кадры, не уложившиеся в свой период
+        self.dropped = 0  # дедлайны, пропущенные в режиме drop
+        self.resyncs = 0  # пересчёты сетки в режиме catch_up
+        self.idles = 0  # сколько раз цикл уходил в простой
+        self.early_frames = 0  # кадры, начатые раньше дедлайна по срочному событию
+        self.idle_time = 0.0  # суммарное время простоя
+
+    def frame_start(self) -> float:
+        """Отмечает начало кадра, возвращает время с начала предыдущего кадра (delta для update)"""
+        now = perf_counter()
+        delta = now - self._last_frame_start
+        self._last_frame_start = now
+        # события до этого момента кадр и так увидит
+        self._urgent.clear()
+        return delta
+
+    def elapsed(self) -> float:
+        """Время с начала текущего кадра"""
+        return perf_counter() - self._last_frame_start
+
+    async def wait(self) -> None:
+        """Ждёт дедлайн следующего кадра"""
+        self._next_deadline += self.period
+        now = perf_counter()
+
+        if now > self._next_deadline:
+            # кадр не уложился в период
+            self.overruns += 1
+            behind = int((now - self._next_deadline) / self.period)
+            if self.policy == FramePolicy.DROP:
+                # переходим на ближайший будущий узел сетки, фаза сохраняется
+                self.dropped += behind + 1
+                self._next_deadline += (behind + 1) * self.period
+            elif behind >= MAX_CATCH_UP_FRAMES:
+                # слишком сильно отстали - догонять бессмысленно, начинаем сетку заново
+                self.resyncs += 1
+                self._next_deadline = now
+            else:
+                # catch_up: следующий кадр сразу, сетка остаётся прежней
+                self._record(now)
+                await asyncio.sleep(0)  # даём другим задачам шанс выполниться
+                return
+
+        sleep_time = self._next_deadline - now - self.busy_wait
+        if sleep_time > 0:
+            if await self._sleep(sleep_time):
+                await self._early_frame()
+                return
+        else:
+            await asyncio.sleep(0)
+
+        if self.busy_wait:
+            while perf_counter() < self._next_deadline:
+                pass
+
+        self._record(perf_counter())
+
+    async def _sleep(self, duration: float) -> bool:
+        """Сон до дедлайна, True если его прервало срочное событие"""
+        if not self.min_interval:
+            await asyncio.sleep(duration)
+            return False
+        try:
+            await asyncio.wait_for(self._urgent.wait(), duration)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _early_frame(self) -> None:
+        """Следующий кадр раньше дедлайна, но не чаще max_fps; сетка продолжается от него"""
+        self._urgent.clear()
+        earliest = self._last_frame_start + self.min_interval
+        now = perf_counter()
+        if now < earliest:
+            await asyncio.sleep(earliest - now)
+        self._next_deadline = perf_counter()
+        self.early_frames += 1
+
+    def wake(self) -> None:
+        """Прерывает простой: пришло событие или API поменял состояние. Только из основного loop"""
+        self._wakeup.set()
+
+    def request_early_frame(self) -> None:
+        """Срочное событие (кнопка, ввод в игре): кадр начинается сразу, не дожидаясь дедлайна"""
+        if self.min_interval:
+            self._urgent.set()
+        self._wakeup.set()
+
+    async def idle(self, timeout: float) -> None:
+        """
+        Простой вместо ожидания дедлайна: спит до wake() или timeout, потом сетка
+        начинается заново от момента пробуждения. wake() во время кадра не теряется -
+        тогда простой заканчивается сразу.
+        """
+        started = perf_counter()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), min(timeout, IDLE_MAX_SLEEP))
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+        self._urgent.clear()
+        self._next_deadline = perf_counter()
+        self.idles += 1
+        self.idle_time += self._next_deadline - started
+
+    def _record(self, woke_at: float) -> None:
+        index = self._count % JITTER_HISTORY
+        self._lateness[index] = woke_at - self._next_deadline
+        self._periods[index] = woke_at - self._last_frame_start
+        self._count += 1
+        self.frames += 1
+
+    def stats(self) -> dict:
+        """Статистика джиттера по последним кадрам (мс)"""
+        count = min(self._count, JITTER_HISTORY)
+        lateness = self._lateness[:count] * 1000
+        periods = self._periods[:count] * 1000
+        result = {
+            "target_fps": 1.0 / self.period,
+            "policy": self.policy.value,
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+            "early_frames": self.early_frames,
+            "idles": self.idles,
+            "idle_time": self.idle_time,
+        }
+        if count:
+            result.update({
+                "lateness_ms": {
+                    "mean": float(lateness.mean()),
+                    "p50": float(np.percentile(lateness, 50)),
+                    "p95": float(np.percentile(lateness, 95)),
+                    "max": float(lateness.max()),
+                },
+                "period_ms": {
+                    "mean": float(periods.mean()),
+                    "std": float(periods.std()),
+                    "min": float(periods.min()),
+                    "max": float(periods.max()),
+                },
+            })
+        return result
@@ -0,0 +1,109 @@
+"""
+Трассировка отдельных кадров в формате Chrome Trace Event (открывается в Perfetto / chrome://tracing).
+"""
+
+import threading
+from collections import deque
+from time import perf_counter
+from typing import Optional
+
+# сколько секунд истории отдавать при выгрузке
+TRACE_WINDOW = 10.0
+# жёсткий предел числа событий в памяти (~60 fps * 10 с * десятки спанов на кадр)
+TRACE_MAX_EVENTS = 100_000
+
+
+class _Span:
+    """Отрезок времени, записывается при выходе из with"""
+
+    __slots__ = ("_tracer", "_name", "_category", "_start")
+
+    def __init__(self, tracer: 'FrameTracer', name: str, category: str):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+
+    def __enter__(self) -> '_Span':
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._tracer.add(self._name, self._category, self._start, perf_counter())
+
+
+class _NullSpan:
+    """Спан для выключенной трассировки - ничего не делает"""
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class FrameTracer:
+    """
+    Кольцевой буфер спанов за последние window секунд: этапы основного цикла,
+    каждый слой и эффект рендера, кодирование и отправка на каждое устройство.
+    Пишется из основного цикла и из потока транспорта, у каждого потока своя дорожка.
+    Выключенный трейсер отдаёт пустой спан, цена - один вызов на слой.
+    """
+
+    def __init__(self, enabled: bool = False, window: float = TRACE_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self._events: deque[tuple] = deque(maxlen=TRACE_MAX_EVENTS)
+        self._threads: dict[int, str] = {}
+
+    def clear(self) -> None:
+        self._events.clear()
+
+    def span(self, name: str, category: str = "render") -> _Span | _NullSpan:
+        """with tracer.span("sprite"): ... - записывает время выполнения блока"""
+        return _Span(self, name, category) if self.enabled else _NULL_SPAN
+
+    def add(self, name: str, category: str, start: float, end: float, args: Optional[dict] = None) -> None:
+        """Записывает готовый спан (время по perf_counter)"""
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        # deque.append атомарен, лок между потоками не нужен
+        self._events.append((name, category, start, end - start, tid, args))
+
+    def export(self) -> dict:
+        """Последние window секунд в формате Chrome Trace Event"""
+        events = list(self._events)
+        if not events:
+            return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+        cutoff = max(start + duration for _, _, start, duration, _, _ in events) - self.window
+        trace_events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": duration * 1e6,
+                "pid": 1,
+                "tid": tid,
+                **({"args": args} if args else {})
+            }
+            for name, category, start, duration, tid, args in events
+            if start >= cutoff
+        ]
+        # подписи дорожек потоков
+        trace_events.extend(
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread_name}}
+            for tid, thread_name in list(self._threads.items())
+        )
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "window": self.window,
+            "events": len(self._events)
+        }
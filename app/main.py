@@ -14,34 +14,60 @@ from api.effects import router as effects_router
 from api.display import router as display_router
 from api.files import router as files_router
 from api.brightness import router as brightness_router
-from dependencies import app_manager, config, driver, renderer, effect_manager, display_manager, transition_engine
-from render.frame_description import FrameDescription
+from api.metrics import router as metrics_router
+from dependencies import (
+    app_manager, config, driver, effect_manager, display_manager, transition_engine, frame_scheduler,
+    frame_pipeline, metrics, tracer, governor
+)
+from frame_scheduler import FramePolicy
+from app_frame import render_app_frame
 from render.frame import Frame
-from render.led_strip import generate_led_strip_pixels, find_rainbow_effect
-from time import time
+from render.led_strip import generate_led_strip_pixels
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import logging
 import os
 import random
 import subprocess
-import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+def idle_timeout(app, frame: Frame, previous_frame: Frame | None, keepalive: float) -> float | None:
+    """
+    Сколько можно простаивать после этого кадра, None если нужен следующий кадр по расписанию.
+    Простой только когда приложение не анимируется, нет эффектов, переходов и смены приложения,
+    и кадр тот же самый объект что и прошлый (рендерер отдаёт статичные кадры из кеша).
+    Вызывается только для кадров, которые на этом шаге действительно рендерились.
+    """
+    wake_after = app.wake_after()
+    if (wake_after is None or frame is not previous_frame or effect_manager.get_effects()
+            or transition_engine.active_transition is not None or app_manager.has_pending_app()):
+        return None
+    if keepalive:
+        # устройству всё равно нужен повтор кадра раз в keepalive
+        wake_after = min(wake_after, keepalive)
+    return wake_after
+
+
 async def main_loop_task():
     """Главный цикл обновления и отрисовки приложений"""
-    last = time()
     cfg = config.get()
-    frame_time = 1.0 / cfg.system.target_fps  # время на один кадр
+    frame_scheduler.configure(
+        cfg.system.target_fps,
+        FramePolicy(cfg.system.frame_policy),
+        cfg.system.busy_wait_ms / 1000,
+        cfg.system.max_fps
+    )
     led_count = cfg.led_strip.led_number
+    governor.configure(cfg.system.target_fps)
+    last_render = None  # (приложение, кадр, rainbow effect) для повтора при нехватке времени
+    previous_frame = None
 
     while True:
         try:
-            now = time()
-            delta = now - last
-            last = now
+            delta = frame_scheduler.frame_start()
+            timer = metrics.frame_timer()
 
             # собираем события из очереди
             events = []
@@ -59,75 +85,60 @@ async def main_loop_task():
                 await asyncio.sleep(0.01)
                 continue
             
+            timer.lap("events")
             app.update(delta, events) # обновляем состояние приложения
-            frame_desc = app.render() # получаем описание кадра или сам кадр
-            
-            # для LED ленты нужен rainbow effect если есть
-            rainbow_effect = None
-            
-            if isinstance(frame_desc, FrameDescription):
-                frame_desc.effects.extend(effect_manager.get_effects())  # добавляем эффекты из менеджера
-                effect_manager.update_layers_cache(frame_desc.layers)  # обновляем кеш слоев для cleanup
-                rainbow_effect = find_rainbow_effect(frame_desc.effects)
-                frame = renderer.render_frame(frame_desc, delta) # если описание, то рендерим с dt
-            elif isinstance(frame_desc, Frame):
-                frame = frame_desc  # если уже кадр, то просто берем его
-            elif isinstance(frame_desc, tuple) and len(frame_desc) == 2:
-                # tuple of two different frames for left and right 64x32 displays
-                left_frame_desc, right_frame_desc = frame_desc
-                
-                left_frame = None
-                right_frame = None
-                
-                # render left frame
-                if isinstance(left_frame_desc, FrameDescription):
-                    left_frame_desc.effects.extend(effect_manager.get_effects())
-                    effect_manager.update_layers_cache(left_frame_desc.layers)
-                    rainbow_effect = find_rainbow_effect(left_frame_desc.effects)
-                    left_frame = renderer.render_frame(left_frame_desc, delta)
-                elif isinstance(left_frame_desc, Frame):
-                    left_frame = left_frame_desc
-                
-                # render right frame
-                if isinstance(right_frame_desc, FrameDescription):
-                    right_frame_desc.effects.extend(effect_manager.get_effects())
-                    effect_manager.update_layers_cache(right_frame_desc.layers)
-                    right_frame = renderer.render_frame(right_frame_desc, delta)
-                elif isinstance(right_frame_desc, Frame):
-                    right_frame = right_frame_desc
-                
-                # combine both 64x32 frames into single 128x32 frame
-                if left_frame is not None and right_frame is not None:
-                    frame = Frame(128, 32)
-                    frame.pixels = np.concatenate([left_frame.pixels, right_frame.pixels], axis=1)
-                else:
+            timer.lap("app_update")
+            rendered = last_render is None or last_render[0] is not app or governor.should_render(delta)
+            if rendered:
+                frame, rainbow_effect = render_app_frame(app, governor.render_dt(delta), timer)
+                if frame is None:
                     await asyncio.sleep(0.01)
-                    continue
+                    continue  # пропускаем итерацию, если нет кадра
+                last_render = (app, frame, rainbow_effect)
             else:
-                await asyncio.sleep(0.01)
-                continue  # пропускаем итерацию, если нет кадра
+                # не хватает времени кадра - повторяем последний отрендеренный кадр
+                _, frame, rainbow_effect = last_render
 
             # применяем переход между кадрами если есть
             frame = transition_engine.process(frame, delta)
+            timer.lap("transition")
 
             # сохраняем кадр для возможного перехода при смене приложения
             app_manager.save_last_frame(frame)
 
-            frame = display_manager.process_frame(frame)
-            await driver.display_frame(frame)
-            
-            # формируем и отправляем кадр для LED ленты 
-            led_pixels = generate_led_strip_pixels(led_count, frame, rainbow_effect)
-            await driver.send_led_strip_frame(led_pixels)
-
-            # ограничиваем FPS в соответствии с конфигом
-            elapsed = time() - now
-            sleep_time = frame_time - elapsed
-            if sleep_time > 0:
-                await asyncio.sleep(sleep_time)
+            if frame_pipeline.enabled:
+                # вывод кадра (display_manager, отправка, LED лента) идёт в потоке транспорта
+                frame_pipeline.submit(frame, led_count, rainbow_effect)
+                timer.lap("pipeline_submit")
+            else:
+                frame = display_manager.process_frame(frame)
+                timer.lap("display_manager")
+                await driver.display_frame(frame)
+                timer.lap("frame_send")
+
+                # формируем и отправляем кадр для LED ленты 
+                led_pixels = generate_led_strip_pixels(led_count, frame, rainbow_effect)
+                timer.lap("led_generate")
+                await driver.send_led_strip_frame(led_pixels)
+                timer.lap("led_send")
+            timer.finish()
+
+            if governor.observe(frame_scheduler.elapsed()):
+                frame_scheduler.set_target_fps(governor.fps)
+
+            idle_for = None
+            # повтор last_render ничего не говорит о статичности: после update() с событиями
+            # состояние могло измениться, а кадр с изменением ещё не отрендерен
+            if cfg.system.idle_mode and rendered and not events:
+                idle_for = idle_timeout(app, frame, previous_frame, cfg.system.static_keepalive)
+            previous_frame = frame
+
+            if idle_for is not None:
+                # кадр статичен - спим до события, вызова API или таймера приложения
+                await frame_scheduler.idle(idle_for)
             else:
-                # даже если не успеваем - даём другим задачам шанс выполниться
-                await asyncio.sleep(0)
+                # ждём дедлайн следующего кадра в соответствии с конфигом
+                await frame_scheduler.wait()
     
         except Exception as e:
             logger.error(f"Error in main loop: {e}", exc_info=True)
@@ -138,7 +149,17 @@ async def main_loop_task():
 async def lifespan(app: FastAPI):
     # инициализация при старте
     cfg = config.get()
-    driver.init_from_config(cfg.system.transport, ws_enabled=cfg.system.ws_enabled)
+    driver.init_from_config(
+        cfg.system.transport,
+        ws_enabled=cfg.system.ws_enabled,
+        threaded=cfg.system.transport_thread or cfg.system.pipeline_depth > 0,
+        static_keepalive=cfg.system.static_keepalive
+    )
+    frame_pipeline.configure(cfg.system.pipeline_depth)
+    metrics.enabled = cfg.system.metrics_enabled
+    governor.enabled = cfg.system.quality_governor
+    tracer.window = cfg.system.trace_window
+    tracer.enabled = cfg.system.trace_enabled
     await driver.start()
 
     saved_effect_params = None
@@ -147,8 +168,10 @@ async def lifespan(app: FastAPI):
     def handle_button_press(button_id: int):
         nonlocal saved_effect_params
         logger.info(f"Processing button press {button_id}")                    
-        match app_manager.get_current_app().name:
+        current_app = app_manager.get_current_app()
+        match current_app.name:
             case "reactive_face":
+                frame_scheduler.request_early_frame()
                 if random.random() < 0.15: # 15% шанс тролинга
                 #if True: # для теста
                     if random.random() < 0.5: 
@@ -159,6 +182,7 @@ async def lifespan(app: FastAPI):
                             app_manager.set_active_app_by_name("reactive_face")
                             await asyncio.sleep(1)  # даём время на переключение
                             effect_manager.restore_effects(saved_effect_params)
+                            frame_scheduler.wake()
                     else:
                         saved_effect_params = effect_manager.save_effect_params()
                         app_manager.set_active_app_by_name("bsod")
@@ -170,17 +194,24 @@ async def lifespan(app: FastAPI):
                     event = Boop()
                     event_queue.put_nowait(event)
             case "bsod":
+                frame_scheduler.request_early_frame()
                 app_manager.set_active_app_by_name("reactive_face")
                 async def switch_back_effects():
                     await asyncio.sleep(1)  # даём время на переключение
                     effect_manager.restore_effects(saved_effect_params)
+                    frame_scheduler.wake()
                 asyncio.create_task(switch_back_effects())
+            case _:
+                # кадр раньше дедлайна нужен, только если кнопка что-то меняет в приложении
+                event = current_app.button_event(button_id)
+                if event is not None:
+                    event_queue.put_nowait(event)
+                    frame_scheduler.request_early_frame()
 
                 
     
-    # Устанавливаем коллбек для UDP транспорта
-    if hasattr(driver.transport, 'set_button_callback'):
-        driver.transport.set_button_callback(handle_button_press)
+    # Устанавливаем коллбек для UDP транспортов
+    driver.set_button_callback(handle_button_press)
     
     # устанавливаем стартовое приложение
     if cfg.system.startup_app:
@@ -251,6 +282,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def wake_main_loop(request, call_next):
+    """Изменяющий запрос к API (события, эффекты, смена приложения) выводит главный цикл из простоя"""
+    response = await call_next(request)
+    if request.method != "GET":
+        frame_scheduler.wake()
+    return response
+
 app.include_router(apps_router, prefix="/api/apps", tags=["apps"])
 app.include_router(config_router, prefix="/api/config", tags=["config"])
 app.include_router(effects_router, prefix="/api/effects", tags=["effects"])
@@ -258,6 +298,7 @@ app.include_router(display_router, prefix="/api/display", tags=["display"])
 app.include_router(files_router, prefix="/api/files", tags=["files"])
 app.include_router(create_events_router(), prefix="/api/events", tags=["events"])
 app.include_router(brightness_router, prefix="/api/brightness", tags=["brightness"])
+app.include_router(metrics_router, prefix="/api/metrics", tags=["metrics"])
 
 # регистрируем роутеры приложений на основе их контрактов
 for app_instance in app_manager.get_available_apps():
@@ -0,0 +1,154 @@
+"""
+Метрики времени кадра по этапам основного цикла.
+"""
+
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+
+from frame_trace import FrameTracer
+
+# сколько последних замеров хранить на этап
+METRICS_HISTORY = 1000
+
+
+class _StageHistory:
+    """Кольцевой буфер последних длительностей этапа"""
+
+    def __init__(self, size: int = METRICS_HISTORY):
+        self._samples = np.zeros(size)
+        self._count = 0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self._samples[self._count % len(self._samples)] = value
+        self._count += 1
+        if value > self.max:
+            self.max = value
+
+    def summary(self, scale: float = 1000, unit: str = "ms") -> dict:
+        """Перцентили по окну; для величин не-времени scale=1 и unit="" (ключи без суффикса)"""
+        suffix = f"_{unit}" if unit else ""
+        samples = self._samples[:min(self._count, len(self._samples))] * scale
+        if not len(samples):
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+        return {
+            "count": self._count,
+            f"mean{suffix}": float(samples.mean()),
+            f"p50{suffix}": float(p50),
+            f"p95{suffix}": float(p95),
+            f"p99{suffix}": float(p99),
+            f"max{suffix}": float(samples.max()),  # по окну
+            f"max_all{suffix}": self.max * scale,  # за всё время
+        }
+
+
+class FrameTimer:
+    """Секундомер одного кадра: lap(stage) записывает время с предыдущей отметки"""
+
+    def __init__(self, metrics: 'FrameMetrics'):
+        self._metrics = metrics
+        self._start = perf_counter()
+        self._last = self._start
+
+    def lap(self, stage: str) -> None:
+        now = perf_counter()
+        self._metrics.stage_done(stage, self._last, now)
+        self._last = now
+
+    def observe(self, name: str, value: float) -> None:
+        """Записывает не время, а величину кадра (например, перерисованную площадь)"""
+        self._metrics.observe(name, value)
+
+    def finish(self) -> None:
+        self._metrics.frame_finished(self._start, perf_counter())
+
+
+class _NullTimer:
+    """Секундомер для выключенных метрик - ничего не делает"""
+
+    def lap(self, stage: str) -> None:
+        pass
+
+    def observe(self, name: str, value: float) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class FrameMetrics:
+    """
+    Длительности этапов кадра (p50/p95/p99/max по последним METRICS_HISTORY кадрам) и fps.
+    Выключенные метрики отдают пустой секундомер, так что цена - один вызов пустого метода на этап.
+    Этапы конвейера пишутся из потока транспорта, у каждого этапа свой буфер.
+    Если включена трассировка, этапы заодно попадают в неё спанами.
+    """
+
+    def __init__(self, enabled: bool = False, tracer: Optional[FrameTracer] = None):
+        self.enabled = enabled
+        self.tracer = tracer or FrameTracer()
+        self.reset()
+
+    def reset(self) -> None:
+        self._stages: dict[str, _StageHistory] = {}
+        self._values: dict[str, _StageHistory] = {}  # величины кадра, не время
+        self._frame_starts = _StageHistory()
+        self._frames = 0
+
+    def frame_timer(self) -> FrameTimer | _NullTimer:
+        return FrameTimer(self) if self.enabled or self.tracer.enabled else _NULL_TIMER
+
+    def stage_done(self, stage: str, start: float, end: float) -> None:
+        if self.enabled:
+            self.record(stage, end - start)
+        if self.tracer.enabled:
+            self.tracer.add(stage, "stage", start, end)
+
+    def frame_finished(self, start: float, end: float) -> None:
+        if self.enabled:
+            self.record("total", end - start)
+            self.frame_done(start)
+        if self.tracer.enabled:
+            self.tracer.add("frame", "frame", start, end)
+
+    def record(self, stage: str, duration: float) -> None:
+        history = self._stages.get(stage)
+        if history is None:
+            history = self._stages.setdefault(stage, _StageHistory())
+        history.add(duration)
+
+    def observe(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+        history = self._values.get(name)
+        if history is None:
+            history = self._values.setdefault(name, _StageHistory())
+        history.add(value)
+
+    def frame_done(self, started: float) -> None:
+        self._frame_starts.add(started)
+        self._frames += 1
+
+    def fps(self) -> float:
+        """Достигнутый fps по окну последних кадров"""
+        count = min(self._frames, METRICS_HISTORY)
+        if count < 2:
+            return 0.0
+        starts = self._frame_starts._samples[:count]
+        span = starts.max() - starts.min()
+        return (count - 1) / span if span > 0 else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "frames": self._frames,
+            "fps": self.fps(),
+            "stages": {name: history.summary() for name, history in list(self._stages.items())},
+            "values": {name: history.summary(scale=1, unit="") for name, history in list(self._values.items())},
+        }
@@ -1,10 +1,12 @@
 # Базовые классы для системы событий и запросов приложений
+from typing import ClassVar
 from pydantic import BaseModel
 
 
 class Event(BaseModel):
     """Базовый класс события - любое входящее воздействие на приложение"""
-    pass
+    # событие запускает кадр сразу, не дожидаясь дедлайна (в пределах max_fps)
+    latency_sensitive: ClassVar[bool] = False
 
 
 class Query(BaseModel):
@@ -3,10 +3,21 @@
 from pydantic import BaseModel
 
 class SystemConfig(BaseModel):
-    transport: str = ""
+    transport: str | list[str] = ""  # один URI или список устройств
     startup_app: str
     target_fps: int = 60
+    max_fps: int = 120  # предел для ранних кадров по срочным событиям, 0 - без ранних кадров
+    frame_policy: str = "drop"  # drop - пропускать опоздавшие кадры, catch_up - догонять
+    busy_wait_ms: float = 0.0  # активное ожидание перед дедлайном для точности < 1 мс
+    idle_mode: bool = False  # статичный кадр - цикл спит до события вместо target_fps
+    quality_governor: bool = False  # снижать качество/fps при нехватке времени кадра
     ws_enabled: bool = False
+    static_keepalive: float = 0.0  # неизменный кадр повторяется раз в N секунд, 0 - слать каждый кадр
+    transport_thread: bool = False  # кодирование и отправка на устройства в отдельном потоке
+    metrics_enabled: bool = False  # замеры этапов кадра для /api/metrics
+    trace_enabled: bool = False  # запись спанов кадров для /api/metrics/trace
+    trace_window: float = 10.0  # сколько последних секунд трассировки держать
+    pipeline_depth: int = 0  # 2-3 - вывод кадра N в потоке транспорта параллельно с рендером N+1
 
 class ReactiveFaceConfig(BaseModel):
     default_preset: str
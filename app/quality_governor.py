@@ -0,0 +1,113 @@
+"""
+Адаптивное качество: при нехватке времени кадра ступенчато снижает нагрузку и возвращает её обратно.
+"""
+
+import logging
+from collections import deque
+from enum import IntEnum
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# по скольким последним кадрам принимается решение
+GOVERNOR_WINDOW = 60
+# перегрузка: среднее время работы кадра выше этой доли бюджета текущего уровня
+OVERLOAD_RATIO = 0.9
+# восстановление: p90 полного кадра ниже этой доли бюджета предыдущего уровня (гистерезис)
+RECOVER_RATIO = 0.7
+RECOVER_PERCENTILE = 90
+
+
+class QualityLevel(IntEnum):
+    FULL = 0  # всё как есть
+    REUSE_FRAMES = 1  # рендер (app.render, слои, эффекты) через кадр, между ними повторяется последний кадр
+    REDUCED_FPS = 2  # плюс target_fps * 3/4
+    HALF_FPS = 3  # плюс target_fps / 2
+
+
+# множитель target_fps на каждом уровне
+LEVEL_FPS_SCALE = {
+    QualityLevel.FULL: 1.0,
+    QualityLevel.REUSE_FRAMES: 1.0,
+    QualityLevel.REDUCED_FPS: 0.75,
+    QualityLevel.HALF_FPS: 0.5,
+}
+
+
+class QualityGovernor:
+    """
+    Смотрит на время работы последних кадров (от начала кадра до ожидания дедлайна).
+    Если в среднем кадр не влезает в бюджет - поднимает уровень деградации на одну ступень,
+    если полный кадр снова влезает с запасом - опускает. После каждой смены уровня окно
+    замеров начинается заново, так что уровни не скачут на данных от предыдущего режима.
+    """
+
+    def __init__(self, target_fps: int = 60, enabled: bool = False):
+        self.enabled = enabled
+        self.configure(target_fps)
+
+    def configure(self, target_fps: int) -> None:
+        self.target_fps = target_fps
+        self.level = QualityLevel.FULL
+        self.changes = 0
+        self._work: deque[float] = deque(maxlen=GOVERNOR_WINDOW)
+        self._frame = 0
+        self._skipped_dt = 0.0
+
+    @property
+    def fps(self) -> float:
+        """target_fps для планировщика на текущем уровне"""
+        return self.target_fps * LEVEL_FPS_SCALE[self.level]
+
+    def _budget(self, level: QualityLevel) -> float:
+        return 1.0 / (self.target_fps * LEVEL_FPS_SCALE[level])
+
+    def should_render(self, dt: float) -> bool:
+        """False - рендер этого кадра пропускается, его dt копится до следующего рендера"""
+        self._frame += 1
+        if self.enabled and self.level >= QualityLevel.REUSE_FRAMES and self._frame % 2:
+            self._skipped_dt += dt
+            return False
+        return True
+
+    def render_dt(self, dt: float) -> float:
+        """dt для рендера с учётом пропущенных кадров, чтобы анимации не замедлялись"""
+        dt += self._skipped_dt
+        self._skipped_dt = 0.0
+        return dt
+
+    def observe(self, work_time: float) -> bool:
+        """Записывает время работы кадра, True если уровень изменился (нужно перенастроить fps)"""
+        if not self.enabled:
+            return False
+        self._work.append(work_time)
+        if len(self._work) < GOVERNOR_WINDOW:
+            return False
+
+        work = np.fromiter(self._work, dtype=np.float64)
+        if work.mean() > OVERLOAD_RATIO * self._budget(self.level) and self.level < QualityLevel.HALF_FPS:
+            self._set_level(QualityLevel(self.level + 1), work.mean())
+            return True
+        if self.level > QualityLevel.FULL:
+            # на REUSE_FRAMES половина кадров без рендера, p90 - это время полного кадра
+            full_frame = np.percentile(work, RECOVER_PERCENTILE)
+            if full_frame < RECOVER_RATIO * self._budget(QualityLevel(self.level - 1)):
+                self._set_level(QualityLevel(self.level - 1), full_frame)
+                return True
+        return False
+
+    def _set_level(self, level: QualityLevel, work_time: float) -> None:
+        logger.info(f"Quality level {self.level.name} -> {level.name} "
+                    f"(frame work {work_time * 1000:.1f} ms, budget {self._budget(self.level) * 1000:.1f} ms)")
+        self.level = level
+        self.changes += 1
+        self._work.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "level": self.level.name.lower(),
+            "fps": self.fps,
+            "changes": self.changes
+        }
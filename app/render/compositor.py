@@ -0,0 +1,164 @@
+"""
+Удержанный кадр для перерисовки только изменившихся областей (dirty rectangles).
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+from render.frame import Frame
+from render.frame_description import (
+    SpriteLayer, AnimatedSpriteLayer, TextLayer, MarqueeLayer, RectLayer,
+    RectBatchLayer, LineLayer, PointLayer, CircleLayer
+)
+from render.layers.marquee import marquee_bounds
+from render.layers.text import rendered_text
+
+# прямоугольник (x0, y0, x1, y1), правая и нижняя граница не входят
+Rect = tuple[int, int, int, int]
+
+# если грязная площадь больше этой доли кадра, дешевле перерисовать всё сразу в кадр
+FULL_REDRAW_RATIO = 0.6
+
+
+def _hashable(value):
+    """Поле слоя для ключа: координаты пакетных слоёв бывают списком или numpy массивом"""
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return value.shape, value.dtype.str, value.tobytes()
+    return value
+
+
+def layer_key(layer) -> tuple:
+    """Всё, от чего зависит картинка слоя: совпал ключ - слой нарисует те же пиксели"""
+    if isinstance(layer, AnimatedSpriteLayer):
+        # время анимации меняется каждый кадр, а картинка - только при смене фрейма
+        return (AnimatedSpriteLayer, layer.frames[layer.current_frame], layer.sprite_width,
+                layer.sprite_height, layer.x, layer.y)
+    if isinstance(layer, MarqueeLayer):
+        return (MarqueeLayer, math.floor(layer.offset), layer.text, layer.font_path, layer.font_size,
+                _hashable(layer.color), layer.loop, layer.gap, layer.x, layer.width, layer.y)
+    return (type(layer), *map(_hashable, vars(layer).values()))
+
+
+def _sprite_bounds(x: float, y: float, width: int, height: int) -> Rect:
+    # субпиксельная позиция задевает ещё по пикселю справа и снизу
+    x_start = math.floor(x)
+    y_start = math.floor(y)
+    return x_start, y_start, x_start + width + 1, y_start + height + 1
+
+
+def _points_bounds(xs: np.ndarray, ys: np.ndarray, pad: float = 0.0) -> Optional[Rect]:
+    if not len(xs):
+        return None
+    # точки округляются до ближайшего пикселя: floor(v + 0.5)
+    return (math.floor(xs.min() - pad + 0.5), math.floor(ys.min() - pad + 0.5),
+            math.floor(xs.max() + pad + 0.5) + 1, math.floor(ys.max() + pad + 0.5) + 1)
+
+
+def layer_bounds(layer, width: int, height: int) -> Optional[Rect]:
+    """
+    Область кадра, за которую слой точно не выходит (может быть с запасом), None если слой
+    ничего не рисует. Для неизвестных слоёв - весь кадр.
+    """
+    if isinstance(layer, (SpriteLayer, AnimatedSpriteLayer)):
+        rect = _sprite_bounds(layer.x, layer.y, layer.sprite_width, layer.sprite_height)
+    elif isinstance(layer, TextLayer):
+        sprite = rendered_text(layer.text, layer.font_path, layer.font_size, layer.color)
+        if sprite is None:
+            return None
+        text_height, text_width, _ = sprite.data.shape
+        rect = _sprite_bounds(layer.x, layer.y, text_width, text_height)
+    elif isinstance(layer, MarqueeLayer):
+        rect = marquee_bounds(width, layer)
+    elif isinstance(layer, RectLayer):
+        # как в rect_layer: int() каждой стороны
+        rect = (int(layer.x), int(layer.y), int(layer.x + layer.width), int(layer.y + layer.height))
+    elif isinstance(layer, RectBatchLayer):
+        rects = np.asarray(layer.rects, dtype=np.float64).reshape(-1, 4)
+        if not len(rects):
+            return None
+        x, y, rect_width, rect_height = rects.T
+        rect = (int(np.trunc(x).min()), int(np.trunc(y).min()),
+                int(np.trunc(x + rect_width).max()), int(np.trunc(y + rect_height).max()))
+    elif isinstance(layer, LineLayer):
+        segments = np.asarray(layer.segments, dtype=np.float64).reshape(-1, 4)
+        rect = _points_bounds(segments[:, [0, 2]].ravel(), segments[:, [1, 3]].ravel())
+    elif isinstance(layer, PointLayer):
+        points = np.asarray(layer.points, dtype=np.float64).reshape(-1, 2)
+        rect = _points_bounds(points[:, 0], points[:, 1])
+    elif isinstance(layer, CircleLayer):
+        circles = np.asarray(layer.circles, dtype=np.float64).reshape(-1, 3)
+        if not len(circles):
+            return None
+        # пиксель закрашивается ближе чем |radius| + 0.5 от центра
+        extent = np.abs(circles[:, 2]) + 0.5
+        rect = (math.floor((circles[:, 0] - extent).min()), math.floor((circles[:, 1] - extent).min()),
+                math.ceil((circles[:, 0] + extent).max()) + 1, math.ceil((circles[:, 1] + extent).max()) + 1)
+    else:
+        # FillLayer и всё неизвестное
+        return 0, 0, width, height
+
+    if rect is None:
+        return None
+    x_start, y_start, x_end, y_end = rect
+    x_start, y_start = max(0, x_start), max(0, y_start)
+    x_end, y_end = min(width, x_end), min(height, y_end)
+    if x_start >= x_end or y_start >= y_end:
+        return None
+    return x_start, y_start, x_end, y_end
+
+
+def intersects(a: Rect, b: Rect) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _merge(rects: list[Rect]) -> list[Rect]:
+    """Объединяет пересекающиеся прямоугольники в описанные, пока есть что объединять"""
+    merged: list[Rect] = []
+    for rect in rects:
+        while True:
+            for index, other in enumerate(merged):
+                if intersects(rect, other):
+                    rect = (min(rect[0], other[0]), min(rect[1], other[1]),
+                            max(rect[2], other[2]), max(rect[3], other[3]))
+                    del merged[index]
+                    break
+            else:
+                break
+        merged.append(rect)
+    return merged
+
+
+def area(rects: list[Rect]) -> int:
+    return sum((x_end - x_start) * (y_end - y_start) for x_start, y_start, x_end, y_end in rects)
+
+
+class RetainedCanvas:
+    """
+    Результат прошлого кадра одного экрана (до пост-эффектов) и для каждого слоя -
+    его ключ и занятая область. Слои сопоставляются по порядку в списке.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.frame = Frame(width, height)
+        self.scratch = Frame(width, height)  # сюда перерисовываются слои грязных областей
+        self.keys: list[tuple] = []
+        self.bounds: list[Optional[Rect]] = []
+        self.valid = False
+
+    def dirty_rects(self, keys: list[tuple], bounds: list[Optional[Rect]]) -> Optional[list[Rect]]:
+        """Области, которые нужно перерисовать, None - перерисовать весь кадр"""
+        if not self.valid or len(keys) != len(self.keys):
+            return None
+        rects = []
+        for key, rect, old_key, old_rect in zip(keys, bounds, self.keys, self.bounds):
+            if key != old_key:
+                # слой пропал со старого места и появился на новом
+                rects.extend(r for r in (old_rect, rect) if r is not None)
+        rects = _merge(rects)
+        if area(rects) > FULL_REDRAW_RATIO * self.frame.width * self.frame.height:
+            return None
+        return rects
@@ -52,6 +52,23 @@ class TextLayer(Layer):
     color: tuple[int, int, int, int] = (255, 255, 255, 255)  # RGBA
     font_path: str | None = None  # путь к TTF шрифту, если None - используется дефолтный
 
+# бегущая строка: текст рендерится один раз, на кадр копируется только видимое окно;
+# слой хранит прокрутку, поэтому его нужно переиспользовать между кадрами (как AnimatedSpriteLayer)
+@dataclass
+class MarqueeLayer(Layer):
+    text: str
+    y: float = 0.0
+    speed: float = 20.0  # пикселей в секунду справа налево
+    font_size: int = 12
+    color: tuple[int, int, int, int] = (255, 255, 255, 255)  # RGBA
+    font_path: str | None = None
+    loop: bool = True  # после конца текста через gap пикселей начинается снова
+    gap: int = 16
+    x: int = 0  # область прокрутки по горизонтали, width None - до правого края кадра
+    width: int | None = None
+    offset: float = 0.0  # сколько пикселей уже прокручено (растёт при рендере)
+    _strip: tuple | None = field(default=None, repr=False)  # (ключ, маска, цвета) отрендеренной полосы
+
 @dataclass
 class RectLayer(Layer):
     x: float
@@ -60,6 +77,31 @@ class RectLayer(Layer):
     height: float
     color: tuple[int, int, int, int]  # RGBA
 
+# ------ пакетные примитивы: много фигур одного цвета одним слоем ------
+# координаты - список кортежей или numpy массив (N, k); каждый пиксель смешивается один раз,
+# даже если фигуры пересекаются
+
+@dataclass
+class RectBatchLayer(Layer):
+    rects: list[tuple[float, float, float, float]] | np.ndarray  # (x, y, width, height), как у RectLayer
+    color: tuple[int, int, int, int]  # RGBA
+
+@dataclass
+class LineLayer(Layer):
+    segments: list[tuple[float, float, float, float]] | np.ndarray  # (x0, y0, x1, y1) в центрах пикселей
+    color: tuple[int, int, int, int]  # RGBA
+
+@dataclass
+class PointLayer(Layer):
+    points: list[tuple[float, float]] | np.ndarray  # (x, y), округляются до ближайшего пикселя
+    color: tuple[int, int, int, int]  # RGBA
+
+@dataclass
+class CircleLayer(Layer):
+    circles: list[tuple[float, float, float]] | np.ndarray  # (cx, cy, radius) в центрах пикселей
+    color: tuple[int, int, int, int]  # RGBA
+    filled: bool = True  # False - только контур толщиной в пиксель
+
 # ------ типы эффектов ------
 
 @dataclass
@@ -1,12 +1,16 @@
-import numpy as np
 from render.frame import Frame
 from render.frame_description import AnimatedSpriteLayer
-from render.layers.utils import render_subpixel_sprite
+from render.layers.utils import cached_sprite, render_prepared_sprite
 
 
 def animated_sprite_layer(frame: Frame, layer: AnimatedSpriteLayer, dt: float) -> None:
     """Отрисовывает анимированный спрайт на кадре с учетом альфа-канала и обновлением времени"""
-    
+    advance_animated_sprite(layer, dt)
+    draw_animated_sprite(frame, layer)
+
+
+def advance_animated_sprite(layer: AnimatedSpriteLayer, dt: float) -> None:
+    """Обновляет время анимации и текущий фрейм"""
     # обновляем время анимации
     layer.elapsed_time += dt
     
@@ -34,14 +38,15 @@ def animated_sprite_layer(frame: Frame, layer: AnimatedSpriteLayer, dt: float) -
                     layer._completed_once = True
                     layer.on_complete()
                     layer.on_complete = None  # чтобы не вызывать повторно
-    
+
+
+def draw_animated_sprite(frame: Frame, layer: AnimatedSpriteLayer) -> None:
+    """Рисует текущий фрейм анимации без обновления времени"""
     # получаем текущий фрейм
     current_frame_data = layer.frames[layer.current_frame]
     
-    # преобразуем спрайт в numpy массив (RGBA)
-    sprite_data = np.frombuffer(current_frame_data, dtype=np.uint8).reshape(
-        layer.sprite_height, layer.sprite_width, 4
-    )
+    # подготовленный фрейм из кеша (у каждого фрейма анимации свои bytes)
+    sprite = cached_sprite(current_frame_data, layer.sprite_width, layer.sprite_height)
     
-    render_subpixel_sprite(frame, sprite_data, layer.x, layer.y)
+    render_prepared_sprite(frame, sprite, layer.x, layer.y)
 
@@ -0,0 +1,24 @@
+import numpy as np
+from render.frame import Frame
+from render.frame_description import CircleLayer
+from render.layers.utils import blend_color
+
+
+def circle_layer(frame: Frame, layer: CircleLayer) -> None:
+    """
+    Рисует все круги слоя одной заливкой. Пиксель внутри, если его центр ближе radius + 0.5
+    к центру круга; контур - кольцо между radius - 0.5 и radius + 0.5.
+    """
+    circles = np.asarray(layer.circles, dtype=np.float64).reshape(-1, 3)
+    if not len(circles):
+        return
+    cx, cy, radius = (column[:, None, None] for column in circles.T)
+
+    # расстояния от каждого пикселя до каждого центра: (N, H, W)
+    ys, xs = np.ogrid[:frame.height, :frame.width]
+    distance_sq = (xs - cx) ** 2 + (ys - cy) ** 2
+    inside = distance_sq < (radius + 0.5) ** 2
+    if not layer.filled:
+        inside &= distance_sq >= np.maximum(radius - 0.5, 0) ** 2
+
+    blend_color(frame, inside.any(axis=0), layer.color)
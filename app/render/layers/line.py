@@ -0,0 +1,22 @@
+import numpy as np
+from render.frame import Frame
+from render.frame_description import LineLayer
+from render.layers.utils import blend_points
+
+
+def line_layer(frame: Frame, layer: LineLayer) -> None:
+    """Рисует все отрезки слоя (DDA: по точке на пиксель вдоль длинной оси) одной заливкой"""
+    segments = np.asarray(layer.segments, dtype=np.float64).reshape(-1, 4)
+    if not len(segments):
+        return
+    x0, y0, x1, y1 = segments.T
+    dx = x1 - x0
+    dy = y1 - y0
+
+    # точки всех отрезков подряд: segment - номер отрезка точки, step - номер точки в отрезке
+    counts = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.intp) + 1
+    segment = np.repeat(np.arange(len(segments)), counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = step / np.maximum(counts - 1, 1)[segment]
+
+    blend_points(frame, x0[segment] + dx[segment] * t, y0[segment] + dy[segment] * t, layer.color)
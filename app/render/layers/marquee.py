@@ -0,0 +1,103 @@
+import math
+from typing import Optional
+import numpy as np
+from render.frame import Frame
+from render.frame_description import MarqueeLayer
+from render.layers.text import rendered_text
+
+
+def _strip_for(layer: MarqueeLayer) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    (маска, цвета) полосы текста шириной в текст плюс gap при зацикливании.
+    Строится один раз и пересобирается, только если поменялись текст, шрифт, цвет или gap.
+    """
+    key = (layer.text, layer.font_path, layer.font_size, tuple(layer.color), layer.loop, layer.gap)
+    if layer._strip is not None and layer._strip[0] == key:
+        return None if layer._strip[1] is None else layer._strip[1:]
+
+    sprite = rendered_text(layer.text, layer.font_path, layer.font_size, layer.color)
+    if sprite is None:
+        layer._strip = (key, None, None)
+        return None
+
+    # прокрутка идёт по целым пикселям, так что полоса - готовая маска с цветами
+    opaque, colors = sprite.blit_data()
+    gap = max(0, layer.gap) if layer.loop else 0
+    if gap:
+        opaque = np.pad(opaque, ((0, 0), (0, gap)))
+        colors = np.pad(colors, ((0, 0), (0, gap), (0, 0)))
+    layer._strip = (key, opaque, colors)
+    return opaque, colors
+
+
+def _region(frame_width: int, layer: MarqueeLayer) -> tuple[int, int, int]:
+    """(ширина области прокрутки, первый и последний+1 столбец кадра в ней)"""
+    region_width = frame_width - layer.x if layer.width is None else layer.width
+    return region_width, max(0, layer.x), min(frame_width, layer.x + region_width)
+
+
+def marquee_layer(frame: Frame, layer: MarqueeLayer, dt: float) -> None:
+    """Сдвигает бегущую строку на speed * dt и копирует видимое окно полосы в кадр"""
+    advance_marquee(layer, frame.width, dt)
+    draw_marquee(frame, layer)
+
+
+def advance_marquee(layer: MarqueeLayer, frame_width: int, dt: float) -> None:
+    """Сдвигает бегущую строку на speed * dt"""
+    layer.offset += layer.speed * dt
+    strip = _strip_for(layer)
+    if strip is None or not layer.loop:
+        return
+    region_width = _region(frame_width, layer)[0]
+    period = strip[0].shape[1]
+    if layer.offset > region_width + period:
+        # полоса повторяется с периодом period, держим offset ограниченным
+        layer.offset -= period
+
+
+def marquee_bounds(frame_width: int, layer: MarqueeLayer) -> Optional[tuple[int, int, int, int]]:
+    """(x0, y0, x1, y1) области кадра, которую может занять строка, None если строка пустая"""
+    strip = _strip_for(layer)
+    if strip is None:
+        return None
+    _, x_start, x_end = _region(frame_width, layer)
+    y = math.floor(layer.y)
+    return x_start, y, x_end, y + strip[0].shape[0]
+
+
+def draw_marquee(frame: Frame, layer: MarqueeLayer) -> None:
+    """Копирует видимое окно полосы в кадр без сдвига"""
+    strip = _strip_for(layer)
+    if strip is None:
+        return
+    opaque, colors = strip
+    strip_height, period = opaque.shape
+
+    # область прокрутки
+    region_width, x_start, x_end = _region(frame.width, layer)
+    if x_start >= x_end:
+        return
+
+    # текст въезжает из-за правого края области
+    text_x = layer.x + region_width - math.floor(layer.offset)
+    if layer.loop:
+        columns = (np.arange(x_start, x_end) - text_x) % period
+    else:
+        x_start = max(x_start, text_x)
+        x_end = min(x_end, text_x + period)
+        if x_start >= x_end:
+            return
+        columns = slice(x_start - text_x, x_end - text_x)
+
+    y = math.floor(layer.y)
+    y_start = max(0, y)
+    y_end = min(frame.height, y + strip_height)
+    if y_start >= y_end:
+        return
+    rows = slice(y_start - y, y_end - y)
+
+    np.copyto(
+        frame.pixels[y_start:y_end, x_start:x_end],
+        colors[rows][:, columns],
+        where=opaque[rows][:, columns, None]
+    )
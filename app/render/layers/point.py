@@ -0,0 +1,12 @@
+import numpy as np
+from render.frame import Frame
+from render.frame_description import PointLayer
+from render.layers.utils import blend_points
+
+
+def point_layer(frame: Frame, layer: PointLayer) -> None:
+    """Рисует облако точек одной заливкой"""
+    points = np.asarray(layer.points, dtype=np.float64).reshape(-1, 2)
+    if not len(points):
+        return
+    blend_points(frame, points[:, 0], points[:, 1], layer.color)
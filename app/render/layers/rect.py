@@ -1,5 +1,6 @@
 from render.frame import Frame
 from render.frame_description import RectLayer
+from render.layers.utils import blend_color
 
 def rect_layer(frame: Frame, layer: RectLayer, dt: float) -> None:
     """Draws a rectangle on the frame with alpha blending"""
@@ -17,13 +18,5 @@ def rect_layer(frame: Frame, layer: RectLayer, dt: float) -> None:
     if x_start >= x_end or y_start >= y_end:
         return
     
-    r, g, b, a = layer.color
-    alpha = a / 255.0
-    
-    # Draw rectangle with alpha blending
-    for y in range(y_start, y_end):
-        for x in range(x_start, x_end):
-            dst_r, dst_g, dst_b = frame.pixels[y, x]
-            frame.pixels[y, x, 0] = int(r * alpha + dst_r * (1 - alpha))
-            frame.pixels[y, x, 1] = int(g * alpha + dst_g * (1 - alpha))
-            frame.pixels[y, x, 2] = int(b * alpha + dst_b * (1 - alpha))
\ No newline at end of file
+    # Draw rectangle with alpha blending (one slice operation)
+    blend_color(frame, (slice(y_start, y_end), slice(x_start, x_end)), layer.color)
@@ -0,0 +1,22 @@
+import numpy as np
+from render.frame import Frame
+from render.frame_description import RectBatchLayer
+from render.layers.utils import blend_color
+
+
+def rect_batch_layer(frame: Frame, layer: RectBatchLayer) -> None:
+    """Собирает маску покрытия всех прямоугольников и заливает её одним смешиванием"""
+    rects = layer.rects.tolist() if isinstance(layer.rects, np.ndarray) else layer.rects
+    # на реальных размерах (единицы-десятки прямоугольников) запись срезов в маску
+    # быстрее векторного расчёта границ - накладные расходы numpy на маленьких массивах больше
+    mask = np.zeros((frame.height, frame.width), dtype=bool)
+    for x, y, width, height in rects:
+        # границы как у RectLayer: int() каждой стороны, затем обрезка по кадру
+        x_start = max(0, min(frame.width, int(x)))
+        y_start = max(0, min(frame.height, int(y)))
+        x_end = max(0, min(frame.width, int(x + width)))
+        y_end = max(0, min(frame.height, int(y + height)))
+        if x_start < x_end and y_start < y_end:
+            mask[y_start:y_end, x_start:x_end] = True
+
+    blend_color(frame, mask, layer.color)
@@ -1,63 +1,186 @@
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
 from render.frame import Frame
 from render.frame_description import TextLayer
-from render.layers.utils import render_subpixel_sprite
+from render.layers.utils import PreparedSprite, render_prepared_sprite
 import os
 
+# сколько отрендеренных строк помнить, ключ - (текст, шрифт, размер, цвет)
+TEXT_CACHE_SIZE = 256
+# сколько шрифтов (путь, размер) держать загруженными
+FONT_CACHE_SIZE = 32
+
+# None - строка пустая, рисовать нечего
+_text_cache: OrderedDict[tuple, Optional[PreparedSprite]] = OrderedDict()
+
 
 def _get_default_unicode_font(size: int):
     """Находит системный шрифт с поддержкой Unicode"""
     font_paths = [
-        "assets/font.otf", 
+        "assets/font.otf",
     ]
-    
+
     for path in font_paths:
         if os.path.exists(path):
             try:
                 return ImageFont.truetype(path, size)
             except Exception:
                 continue
-    
+
     # если ничего не нашли, используем дефолтный (но он не поддерживает кириллицу)
     return ImageFont.load_default()
 
 
-def text_layer(frame: Frame, layer: TextLayer) -> None:
-    """Отрисовывает текст на кадре"""
+class GlyphAtlas:
+    """
+    Шрифт и маски покрытия его глифов: строка собирается из готовых глифов без FreeType.
+    Сборка побайтно совпадает с рендером всей строки через PIL, только если у шрифта целые
+    advance и нет кернинга (пиксельные шрифты как assets/font.otf). Это проверяется
+    на каждом новом глифе, при нарушении usable = False и строки рендерятся через PIL целиком.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.usable = isinstance(font, ImageFont.FreeTypeFont)
+        # символ -> (маска или None для пустого глифа, смещение маски от пера, advance)
+        self._glyphs: dict[str, tuple[Optional[np.ndarray], tuple[int, int], int]] = {}
+
+    def _glyph(self, char: str) -> Optional[tuple]:
+        glyph = self._glyphs.get(char)
+        if glyph is not None:
+            return glyph
+
+        advance = self.font.getlength(char)
+        if advance != int(advance) or self._has_kerning(char, advance):
+            self.usable = False
+            return None
+
+        mask, offset = self.font.getmask2(char, "L")
+        width, height = mask.size
+        coverage = np.array(mask, dtype=np.uint8).reshape(height, width) if width and height else None
+        glyph = (coverage, offset, int(advance))
+        self._glyphs[char] = glyph
+        return glyph
+
+    def _has_kerning(self, char: str, advance: float) -> bool:
+        """Пары с уже известными глифами (и с самим собой) должны давать простую сумму advance"""
+        pairs = [(char, advance)] + [(other, glyph[2]) for other, glyph in self._glyphs.items()]
+        return any(
+            self.font.getlength(char + other) != advance + other_advance
+            or self.font.getlength(other + char) != other_advance + advance
+            for other, other_advance in pairs
+        )
+
+    def coverage(self, text: str, bbox: tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """Маска покрытия однострочного текста в пределах bbox, None если строку не собрать из глифов"""
+        left, top, right, bottom = bbox
+        width = right - left
+        height = bottom - top
+        coverage = np.zeros((height, width), dtype=np.uint8)
+        pen = 0
+        for char in text:
+            glyph = self._glyph(char)
+            if glyph is None:
+                return None
+            mask, (offset_x, offset_y), advance = glyph
+            if mask is not None:
+                x = pen + offset_x - left
+                y = offset_y - top
+                x_start, y_start = max(0, x), max(0, y)
+                x_end, y_end = min(width, x + mask.shape[1]), min(height, y + mask.shape[0])
+                if x_start < x_end and y_start < y_end:
+                    target = coverage[y_start:y_end, x_start:x_end]
+                    glyph_part = mask[y_start - y:y_end - y, x_start - x:x_end - x]
+                    if np.logical_and(target, glyph_part).any():
+                        # глифы перекрываются - FreeType смешивает перекрытия по-своему, пусть рендерит PIL
+                        return None
+                    np.maximum(target, glyph_part, out=target)
+            pen += advance
+        return coverage
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_atlas(font_path: Optional[str], font_size: int) -> GlyphAtlas:
+    """Шрифт по (путь, размер) загружается с диска один раз"""
     try:
         # загружаем шрифт
-        if layer.font_path:
-            font = ImageFont.truetype(layer.font_path, layer.font_size)
+        if font_path:
+            font = ImageFont.truetype(font_path, font_size)
         else:
             # пытаемся найти системный шрифт с поддержкой Unicode
-            font = _get_default_unicode_font(layer.font_size)
+            font = _get_default_unicode_font(font_size)
     except Exception:
         # если не удалось загрузить, пытаемся найти системный
-        font = _get_default_unicode_font(layer.font_size)
-    
+        font = _get_default_unicode_font(font_size)
+    return GlyphAtlas(font)
+
+
+def _render_text(text: str, font_path: Optional[str], font_size: int, color: tuple) -> Optional[PreparedSprite]:
+    """Рендерит строку в RGBA спрайт, None если текст пустой"""
+    atlas = _load_atlas(font_path, font_size)
+    font = atlas.font
+
+    if atlas.usable and "\n" not in text and "\r" not in text:
+        # однострочный текст собираем из глифов атласа
+        bbox = font.getbbox(text)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        if text_width <= 0 or text_height <= 0:
+            return None
+        coverage = atlas.coverage(text, bbox)
+        if coverage is not None:
+            # раскраска маски тем же путём, что и у draw.text
+            text_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
+            ImageDraw.Draw(text_img).bitmap((0, 0), Image.fromarray(coverage, "L"), fill=color)
+            return PreparedSprite(np.array(text_img, dtype=np.uint8))
+
     # создаем временное изображение для рендеринга текста
     # используем dummy для получения размеров текста
     dummy_img = Image.new('RGBA', (1, 1))
     dummy_draw = ImageDraw.Draw(dummy_img)
-    
+
     # получаем размеры текста
-    bbox = dummy_draw.textbbox((0, 0), layer.text, font=font)
+    bbox = dummy_draw.textbbox((0, 0), text, font=font)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
-    
+
     if text_width <= 0 or text_height <= 0:
-        return
-    
+        return None
+
     # создаем изображение нужного размера с прозрачным фоном
     text_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
     draw = ImageDraw.Draw(text_img)
-    
+
     # рисуем текст
-    draw.text((-bbox[0], -bbox[1]), layer.text, fill=layer.color, font=font)
-    
+    draw.text((-bbox[0], -bbox[1]), text, fill=color, font=font)
+
     # конвертируем в numpy массив
-    text_data = np.array(text_img, dtype=np.uint8)
-    
+    return PreparedSprite(np.array(text_img, dtype=np.uint8))
+
+
+def rendered_text(text: str, font_path: Optional[str], font_size: int,
+                  color: tuple[int, int, int, int]) -> Optional[PreparedSprite]:
+    """Отрендеренная строка из LRU кеша, None если текст пустой"""
+    key = (text, font_path, font_size, tuple(color))
+    if key in _text_cache:
+        _text_cache.move_to_end(key)
+        return _text_cache[key]
+
+    sprite = _render_text(text, font_path, font_size, color)
+    _text_cache[key] = sprite
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return sprite
+
+
+def text_layer(frame: Frame, layer: TextLayer) -> None:
+    """Отрисовывает текст на кадре, отрендеренные строки берутся из LRU кеша"""
+    sprite = rendered_text(layer.text, layer.font_path, layer.font_size, layer.color)
+    if sprite is None:
+        return
+
     # используем существующую функцию для отрисовки с субпиксельным позиционированием
-    render_subpixel_sprite(frame, text_data, layer.x, layer.y)
+    render_prepared_sprite(frame, sprite, layer.x, layer.y)
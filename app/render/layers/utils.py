@@ -1,13 +1,171 @@
+from collections import OrderedDict
+from typing import Optional
+
 import numpy as np
 from render.frame import Frame
 
+# предел памяти кеша подготовленных спрайтов
+SPRITE_CACHE_BYTES = 8 * 1024 * 1024
+# на пиксель: premultiplied float32 RGBA (16) + цвет uint8 RGB (3) + маска (1), обе формы по максимуму
+PREPARED_BYTES_PER_PIXEL = 20
+
+# id(image) -> (image, подготовленный спрайт); image держим, чтобы id не переиспользовался
+_sprite_cache: OrderedDict[int, tuple[bytes, 'PreparedSprite']] = OrderedDict()
+_sprite_cache_bytes = 0
+
+
+def blend_color(frame: Frame, region, color: tuple[int, int, int, int]) -> None:
+    """
+    Заливает часть кадра цветом RGBA с альфа-смешиванием: region - срез, булева маска
+    или пара массивов индексов, всё что принимает frame.pixels[region].
+    """
+    r, g, b, a = color
+    if a == 0:
+        return
+    if a == 255:
+        frame.pixels[region] = (r, g, b)
+        return
+    alpha = a / 255.0
+    # float64 и отбрасывание дробной части, как в попиксельном int(r * alpha + dst * (1 - alpha))
+    blended = np.array((r, g, b)) * alpha + frame.pixels[region] * (1 - alpha)
+    frame.pixels[region] = blended.astype(np.uint8)
+
+
+def blend_points(frame: Frame, xs: np.ndarray, ys: np.ndarray, color: tuple[int, int, int, int]) -> None:
+    """Закрашивает пиксели в точках (округление до ближайшего), точки за кадром отбрасываются"""
+    xs = np.floor(np.asarray(xs, dtype=np.float64) + 0.5).astype(np.intp)
+    ys = np.floor(np.asarray(ys, dtype=np.float64) + 0.5).astype(np.intp)
+    inside = (xs >= 0) & (xs < frame.width) & (ys >= 0) & (ys < frame.height)
+    # через маску, чтобы совпадающие точки смешивались один раз
+    mask = np.zeros((frame.height, frame.width), dtype=bool)
+    mask[ys[inside], xs[inside]] = True
+    blend_color(frame, mask, color)
+
+
+def premultiply_sprite(sprite_data: np.ndarray) -> np.ndarray:
+    """RGBA uint8 (H, W, 4) -> float32 с RGB умноженным на альфу"""
+    sprite_float = sprite_data.astype(np.float32)
+    # Нормализуем альфу для умножения
+    alpha_norm = sprite_float[..., 3:4] / 255.0
+    # Premultiply RGB
+    sprite_float[..., :3] *= alpha_norm
+    return sprite_float
+
+
+class PreparedSprite:
+    """
+    RGBA спрайт в тех формах, что нужны для отрисовки, каждая считается при первом использовании:
+    premultiplied float32 для субпиксельной позиции и маска alpha > 127 с готовыми цветами
+    для целой позиции (просто копирование по маске).
+    """
+
+    __slots__ = ("data", "_premultiplied", "_opaque", "_colors")
+
+    def __init__(self, data: np.ndarray):
+        self.data = data  # RGBA uint8 (H, W, 4)
+        self._premultiplied: Optional[np.ndarray] = None
+        self._opaque: Optional[np.ndarray] = None
+        self._colors: Optional[np.ndarray] = None
+
+    @property
+    def nbytes(self) -> int:
+        height, width, _ = self.data.shape
+        return height * width * PREPARED_BYTES_PER_PIXEL
+
+    @property
+    def premultiplied(self) -> np.ndarray:
+        if self._premultiplied is None:
+            self._premultiplied = premultiply_sprite(self.data)
+            self._premultiplied.flags.writeable = False  # общий для всех кадров
+        return self._premultiplied
+
+    def blit_data(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (маска, цвета) для целой позиции. Считается теми же операциями, что субпиксельный путь
+        при fx = fy = 0 (де-премультипликация во float32 и порог 0.5), так что результат побайтно тот же.
+        """
+        if self._opaque is None:
+            premultiplied = self._premultiplied if self._premultiplied is not None else premultiply_sprite(self.data)
+            alpha = premultiplied[..., 3:4] / 255.0
+            colors = premultiplied[..., :3] / np.maximum(alpha, 1e-6)
+            self._colors = np.clip(colors, 0, 255).astype(np.uint8)
+            self._opaque = alpha[..., 0] > 0.5
+        return self._opaque, self._colors
+
+
+def cached_sprite(image: bytes, width: int, height: int) -> PreparedSprite:
+    """
+    Подготовленный спрайт для RGBA байтов слоя. Кеш по объекту image (LRU, не больше SPRITE_CACHE_BYTES):
+    приложения отдают одни и те же bytes из кеша спрайтов каждый кадр, так что конвертация
+    делается один раз, а на кадр остаётся только зависящее от позиции смешивание.
+    """
+    global _sprite_cache_bytes
+    key = id(image)
+    entry = _sprite_cache.get(key)
+    if entry is not None and entry[0] is image:
+        _sprite_cache.move_to_end(key)
+        return entry[1]
+
+    sprite = PreparedSprite(np.frombuffer(image, dtype=np.uint8).reshape(height, width, 4))
+    if sprite.nbytes <= SPRITE_CACHE_BYTES:
+        _sprite_cache[key] = (image, sprite)
+        _sprite_cache_bytes += sprite.nbytes
+        while _sprite_cache_bytes > SPRITE_CACHE_BYTES:
+            _, (_, evicted) = _sprite_cache.popitem(last=False)
+            _sprite_cache_bytes -= evicted.nbytes
+    return sprite
+
+
+def sprite_cache_stats() -> dict:
+    return {
+        "sprites": len(_sprite_cache),
+        "bytes": _sprite_cache_bytes
+    }
+
+
 def render_subpixel_sprite(frame: Frame, sprite_data: np.ndarray, x: float, y: float) -> None:
     """
     Renders a sprite with sub-pixel positioning using bilinear interpolation.
     sprite_data: RGBA numpy array of shape (H, W, 4), dtype=uint8
     x, y: float coordinates
     """
-    h, w, _ = sprite_data.shape
+    render_prepared_sprite(frame, PreparedSprite(sprite_data), x, y)
+
+
+def render_prepared_sprite(frame: Frame, sprite: PreparedSprite, x: float, y: float) -> None:
+    """Рисует спрайт, на целой позиции - копированием по маске вместо билинейной интерполяции"""
+    x_int = int(np.floor(x))
+    y_int = int(np.floor(y))
+    if x == x_int and y == y_int:
+        _blit_sprite(frame, sprite, x_int, y_int)
+    else:
+        _render_subpixel(frame, sprite.premultiplied, x, y)
+
+
+def _blit_sprite(frame: Frame, sprite: PreparedSprite, x: int, y: int) -> None:
+    """Целая позиция: пиксели с alpha > 127 копируются как есть, остальные не трогаются"""
+    opaque, colors = sprite.blit_data()
+    h, w = opaque.shape
+
+    x_start = max(0, x)
+    y_start = max(0, y)
+    x_end = min(frame.width, x + w)
+    y_end = min(frame.height, y + h)
+    if x_start >= x_end or y_start >= y_end:
+        return
+
+    sprite_rows = slice(y_start - y, y_end - y)
+    sprite_cols = slice(x_start - x, x_end - x)
+    np.copyto(
+        frame.pixels[y_start:y_end, x_start:x_end],
+        colors[sprite_rows, sprite_cols],
+        where=opaque[sprite_rows, sprite_cols, None]
+    )
+
+
+def _render_subpixel(frame: Frame, sprite_float: np.ndarray, x: float, y: float) -> None:
+    """Субпиксельная позиция: билинейная интерполяция premultiplied спрайта"""
+    h, w, _ = sprite_float.shape
     
     # 1. Разделяем координаты
     x_int = int(np.floor(x))
@@ -15,12 +173,7 @@ def render_subpixel_sprite(frame: Frame, sprite_data: np.ndarray, x: float, y: f
     fx = x - x_int
     fy = y - y_int
     
-    # 2. Подготовка спрайта (premultiplied alpha)
-    sprite_float = sprite_data.astype(np.float32)
-    # Нормализуем альфу для умножения
-    alpha_norm = sprite_float[..., 3:4] / 255.0
-    # Premultiply RGB
-    sprite_float[..., :3] *= alpha_norm
+    # 2. Спрайт уже подготовлен (premultiplied alpha)
     
     # 3. Создаем расширенный спрайт (интерполяция)
     # Мы распределяем энергию пикселя на 4 соседних
@@ -1,51 +1,193 @@
+from typing import Optional
+import numpy as np
+from render.compositor import RetainedCanvas, layer_bounds, layer_key, intersects, area
 from render.frame import Frame
-from render.frame_description import FrameDescription, FillLayer, SpriteLayer, AnimatedSpriteLayer, TextLayer, RectLayer, WiggleEffect, DizzyEffect, RainbowEffect, ShakeEffect
+from render.frame_description import (
+    FrameDescription, FillLayer, SpriteLayer, AnimatedSpriteLayer, TextLayer, MarqueeLayer, RectLayer,
+    RectBatchLayer, LineLayer, PointLayer, CircleLayer, WiggleEffect, DizzyEffect, RainbowEffect, ShakeEffect
+)
 from render.layers.fill import fill_layer
 from render.layers.sprite import sprite_layer
-from render.layers.animated_sprite import animated_sprite_layer
+from render.layers.animated_sprite import animated_sprite_layer, advance_animated_sprite, draw_animated_sprite
 from render.layers.text import text_layer
+from render.layers.marquee import marquee_layer, advance_marquee, draw_marquee
 from render.layers.rect import rect_layer
+from render.layers.rect_batch import rect_batch_layer
+from render.layers.line import line_layer
+from render.layers.point import point_layer
+from render.layers.circle import circle_layer
 from render.effects.wiggle import wiggle_effect
 from render.effects.dizzy import dizzy_effect
 from render.effects.rainbow import rainbow_effect
 from render.effects.shake import shake_effect
+from frame_trace import FrameTracer
+
+# слои, которые рисуются только по своим полям (без dt и внутреннего состояния)
+STATIC_LAYERS = {FillLayer, SpriteLayer, TextLayer, RectLayer, RectBatchLayer, LineLayer, PointLayer, CircleLayer}
+# сколько последних статичных кадров помнить (левый и правый экран рендерятся отдельно)
+STATIC_CACHE_SIZE = 2
+
+
+def _static_signature(frame_desc: FrameDescription) -> Optional[tuple]:
+    """
+    Ключ описания кадра из типов и полей слоёв, None если кадр может меняться сам по себе
+    (есть эффекты или анимированные слои). bytes и str кешируют свой хеш, так что
+    повторное сравнение тех же спрайтов почти бесплатно.
+    """
+    if frame_desc.effects:
+        return None
+    signature = [frame_desc.width, frame_desc.height]
+    for layer in frame_desc.layers:
+        if type(layer) not in STATIC_LAYERS:
+            return None
+        signature.append(layer_key(layer))
+    return tuple(signature)
+
 
 class Renderer:
+
+    def __init__(self, tracer: Optional[FrameTracer] = None):
+        self.tracer = tracer or FrameTracer()
+        self.static_hits = 0  # кадры, взятые из кеша без рендера
+        self.dirty_area = 0  # сколько пикселей перерисовано в последнем кадре
+        self._static_cache: dict[tuple, Frame] = {}
+        self._canvases: dict[str, RetainedCanvas] = {}
     
-    def render_frame(self, frame_desc: FrameDescription, dt: float = 0.0) -> Frame:
-        frame = Frame(frame_desc.width, frame_desc.height)
+    def render_frame(self, frame_desc: FrameDescription, dt: float = 0.0, canvas: Optional[str] = None) -> Frame:
+        """
+        Рендерит описание кадра. Если описание совпадает с недавним статичным,
+        возвращается тот же объект Frame - его нельзя менять на месте.
+        canvas - имя удержанного кадра (свой на каждый экран): с ним перерисовываются
+        только области, где слои изменились с прошлого кадра этого экрана.
+        """
+        signature = _static_signature(frame_desc)
+        if signature is not None:
+            cached = self._static_cache.get(signature)
+            if cached is not None:
+                self.static_hits += 1
+                self.dirty_area = 0
+                return cached
 
         if frame_desc.effects:
             self._apply_effects(frame_desc.layers, frame_desc.effects, dt)
 
-        for layer in frame_desc.layers:
-            if isinstance(layer, FillLayer):
-                fill_layer(frame, layer)
-            elif isinstance(layer, AnimatedSpriteLayer):
-                animated_sprite_layer(frame, layer, dt)
-            elif isinstance(layer, SpriteLayer):
-                sprite_layer(frame, layer)
-            elif isinstance(layer, TextLayer):
-                text_layer(frame, layer)
-            elif isinstance(layer, RectLayer):
-                rect_layer(frame, layer, dt)
+        if canvas is None:
+            frame = Frame(frame_desc.width, frame_desc.height)
+            for layer in frame_desc.layers:
+                with self.tracer.span(type(layer).__name__, "layer"):
+                    self._render_layer(frame, layer, dt)
+            self.dirty_area = frame.width * frame.height
+        else:
+            frame = self._render_retained(frame_desc, dt, canvas)
 
         # применяем пост-эффекты к готовому кадру
         if frame_desc.effects:
             self._apply_post_effects(frame, frame_desc.effects, dt)
 
+        if signature is not None:
+            if len(self._static_cache) >= STATIC_CACHE_SIZE:
+                del self._static_cache[next(iter(self._static_cache))]
+            self._static_cache[signature] = frame
         return frame
 
+    def _render_retained(self, frame_desc: FrameDescription, dt: float, name: str) -> Frame:
+        """
+        Собирает кадр в удержанном кадре экрана, перерисовывая только грязные прямоугольники:
+        старые и новые области слоёв, у которых поменялся ключ. Пост-эффекты сюда не попадают,
+        они применяются к копии, так что меняющий весь кадр эффект не сбрасывает удержанный кадр.
+        """
+        width, height = frame_desc.width, frame_desc.height
+        retained = self._canvases.get(name)
+        if retained is None or retained.frame.width != width or retained.frame.height != height:
+            retained = self._canvases[name] = RetainedCanvas(width, height)
+
+        layers = frame_desc.layers
+        # сначала продвигаем анимации: ключ и область считаются по состоянию, которое будет нарисовано
+        for layer in layers:
+            if isinstance(layer, AnimatedSpriteLayer):
+                advance_animated_sprite(layer, dt)
+            elif isinstance(layer, MarqueeLayer):
+                advance_marquee(layer, width, dt)
+        keys = [layer_key(layer) for layer in layers]
+        bounds = [layer_bounds(layer, width, height) for layer in layers]
+
+        dirty = retained.dirty_rects(keys, bounds)
+        retained.valid = False  # если слой упадёт посреди отрисовки, следующий кадр рисуется целиком
+        if dirty is None:
+            retained.frame.pixels[:] = 0
+            for layer in layers:
+                with self.tracer.span(type(layer).__name__, "layer"):
+                    self._draw_layer(retained.frame, layer)
+            self.dirty_area = width * height
+        elif dirty:
+            scratch = retained.scratch
+            for x_start, y_start, x_end, y_end in dirty:
+                scratch.pixels[y_start:y_end, x_start:x_end] = 0
+            for layer, rect in zip(layers, bounds):
+                if rect is not None and any(intersects(rect, dirty_rect) for dirty_rect in dirty):
+                    with self.tracer.span(type(layer).__name__, "layer"):
+                        self._draw_layer(scratch, layer)
+            # за пределами грязных областей scratch не трогаем: там могут быть куски слоёв
+            for x_start, y_start, x_end, y_end in dirty:
+                region = (slice(y_start, y_end), slice(x_start, x_end))
+                retained.frame.pixels[region] = scratch.pixels[region]
+            self.dirty_area = area(dirty)
+        else:
+            self.dirty_area = 0
+
+        retained.keys = keys
+        retained.bounds = bounds
+        retained.valid = True
+
+        frame = Frame(width, height)
+        np.copyto(frame.pixels, retained.frame.pixels)
+        return frame
+
+    def _draw_layer(self, frame: Frame, layer) -> None:
+        """Рисует слой без продвижения анимации (оно уже сделано в _render_retained)"""
+        if isinstance(layer, AnimatedSpriteLayer):
+            draw_animated_sprite(frame, layer)
+        elif isinstance(layer, MarqueeLayer):
+            draw_marquee(frame, layer)
+        else:
+            self._render_layer(frame, layer, 0.0)
+
+    def _render_layer(self, frame: Frame, layer, dt: float) -> None:
+        if isinstance(layer, FillLayer):
+            fill_layer(frame, layer)
+        elif isinstance(layer, AnimatedSpriteLayer):
+            animated_sprite_layer(frame, layer, dt)
+        elif isinstance(layer, SpriteLayer):
+            sprite_layer(frame, layer)
+        elif isinstance(layer, TextLayer):
+            text_layer(frame, layer)
+        elif isinstance(layer, MarqueeLayer):
+            marquee_layer(frame, layer, dt)
+        elif isinstance(layer, RectLayer):
+            rect_layer(frame, layer, dt)
+        elif isinstance(layer, RectBatchLayer):
+            rect_batch_layer(frame, layer)
+        elif isinstance(layer, LineLayer):
+            line_layer(frame, layer)
+        elif isinstance(layer, PointLayer):
+            point_layer(frame, layer)
+        elif isinstance(layer, CircleLayer):
+            circle_layer(frame, layer)
+
     def _apply_effects(self, layers: list, effects: list, dt: float) -> None:
         for effect in effects:
             if isinstance(effect, WiggleEffect):
-                wiggle_effect(layers, effect, dt)
+                with self.tracer.span("WiggleEffect", "effect"):
+                    wiggle_effect(layers, effect, dt)
 
     def _apply_post_effects(self, frame: Frame, effects: list, dt: float) -> None:
         for effect in effects:
             if isinstance(effect, DizzyEffect):
-                dizzy_effect(frame, effect, dt)
+                with self.tracer.span("DizzyEffect", "effect"):
+                    dizzy_effect(frame, effect, dt)
             elif isinstance(effect, RainbowEffect):
-                rainbow_effect(frame, effect, dt)
+                with self.tracer.span("RainbowEffect", "effect"):
+                    rainbow_effect(frame, effect, dt)
             elif isinstance(effect, ShakeEffect):
-                shake_effect(frame, effect, dt)
\ No newline at end of file
+                with self.tracer.span("ShakeEffect", "effect"):
+                    shake_effect(frame, effect, dt)
\ No newline at end of file
@@ -1,17 +1,26 @@
 from abc import ABC, abstractmethod
+from transport.proto import EncodedFrame
 
 
 class TransportBase(ABC):
     """Базовый класс для всех транспортов"""
+
+    # счётчики отправленного трафика для /api/metrics
+    bytes_sent: int = 0
+    packets_sent: int = 0
+
+    def _count_sent(self, size: int) -> None:
+        self.bytes_sent += size
+        self.packets_sent += 1
     
     @abstractmethod
-    async def send_frame(self, frame_data: bytes) -> None:
-        """Отправляет кадр RGB888 128x32 в транспорт"""
+    async def send_frame(self, frame: EncodedFrame) -> None:
+        """Отправляет закодированный кадр 128x32 в транспорт (seq назначает транспорт)"""
         pass
     
     @abstractmethod
-    async def send_led_strip_frame(self, pixels: bytes) -> None:
-        """Отправляет кадр для LED ленты в транспорт"""
+    async def send_led_strip_frame(self, frame: EncodedFrame) -> None:
+        """Отправляет закодированный кадр для LED ленты в транспорт"""
         pass
     
     @abstractmethod
@@ -1,103 +1,407 @@
+import asyncio
 import logging
-from typing import Optional
-from urllib.parse import urlparse
+import weakref
+from time import monotonic
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlparse, parse_qs
 
+import numpy as np
+
+from frame_trace import FrameTracer
 from transport.base import TransportBase
 from transport.ws import WSTransport
 from transport.udp import UDPTransport
+from transport.worker import TransportWorker
+from transport.proto import (
+    EncodedFrame, TYPE_FRAME, TYPE_LED_STRIP_FRAME, MATRIX_WIDTH, MATRIX_HEIGHT, PIXEL_FORMATS, MIN_TILE_MTU
+)
 from render.frame import Frame
 
 
 logger = logging.getLogger(__name__)
 
+# не чаще чем раз в N секунд пишем в лог ошибку одного и того же устройства
+ERROR_LOG_INTERVAL = 5.0
+
+Region = tuple[int, int, int, int]  # x, y, w, h в пикселях канваса
+
+
+class Sink:
+    """Одно устройство вывода: транспорт, область канваса и счётчики ошибок"""
+
+    def __init__(self, name: str, transport: TransportBase, region: Optional[Region] = None):
+        self.name = name
+        self.transport = transport
+        self.region = region  # None - весь канвас
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._last_error_log = 0.0
+
+    async def send(self, method: str, *args) -> None:
+        """Вызывает метод транспорта, ошибки считаются и не мешают остальным устройствам"""
+        try:
+            await getattr(self.transport, method)(*args)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            now = monotonic()
+            if now - self._last_error_log >= ERROR_LOG_INTERVAL:
+                logger.error(f"Error sending to {self.name} ({self.errors} errors total): {e}")
+                self._last_error_log = now
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "region": list(self.region) if self.region else None,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "bytes_sent": self.transport.bytes_sent,
+            "packets_sent": self.transport.packets_sent
+        }
+
+
+def _parse_region(value: str) -> Region:
+    """Разбирает область вида x,y,w,h и проверяет что она внутри канваса"""
+    try:
+        x, y, w, h = (int(v) for v in value.split(","))
+    except ValueError:
+        raise ValueError(f"Region must be x,y,w,h, got '{value}'")
+    if x < 0 or y < 0 or w <= 0 or h <= 0 or x + w > MATRIX_WIDTH or y + h > MATRIX_HEIGHT:
+        raise ValueError(f"Region {value} is outside of the {MATRIX_WIDTH}x{MATRIX_HEIGHT} canvas")
+    return x, y, w, h
+
+
+def _crop_frame(frame: EncodedFrame, region: Region) -> EncodedFrame:
+    x, y, w, h = region
+    pixels = np.frombuffer(frame.pixels, dtype=np.uint8).reshape(MATRIX_HEIGHT, MATRIX_WIDTH, 3)
+    cropped = np.ascontiguousarray(pixels[y:y + h, x:x + w]).tobytes()
+    return EncodedFrame(frame.ptype, frame.frame_id, cropped, frame.compress)
+
+
+class _RepeatFilter:
+    """
+    Отсекает повторы одного и того же кадра: неизменный кадр не кодируется и не отправляется,
+    но раз в keepalive секунд всё же уходит на устройства. keepalive=0 - отправлять всё.
+    """
+
+    def __init__(self, keepalive: float = 0.0):
+        self.keepalive = keepalive
+        self.skipped = 0
+        self._last: Optional[np.ndarray] = None
+        self._sent_at = 0.0
+
+    def is_repeat(self, pixels: np.ndarray) -> bool:
+        if not self.keepalive:
+            return False
+        now = monotonic()
+        if (self._last is not None and self._last.shape == pixels.shape
+                and now - self._sent_at < self.keepalive and np.array_equal(self._last, pixels)):
+            self.skipped += 1
+            return True
+        if self._last is None or self._last.shape != pixels.shape:
+            self._last = pixels.copy()
+        else:
+            np.copyto(self._last, pixels)
+        self._sent_at = now
+        return False
+
+
+class _SnapshotPool:
+    """
+    Заранее выделенные буферы для снимков кадров и их RLE.
+    Буфер переиспользуется только когда EncodedFrame, который на него смотрит, больше
+    никем не удерживается (база дельты в UDP, слот потока транспорта), поэтому в
+    установившемся режиме новых буферов не выделяется.
+    """
+
+    def __init__(self):
+        self._buffers: list[np.ndarray] = []
+        self._rle_buffers: list[np.ndarray] = []
+        self._owners: list[Optional[weakref.ref]] = []
+
+    def encode(self, frame: Frame, frame_id: int) -> EncodedFrame:
+        """
+        Копирует пиксели кадра в свободный буфер и оборачивает в EncodedFrame.
+        Копия нужна: кадры из пула переиспользуются рендером, пока транспорт их ещё держит.
+        """
+        if frame.pixels.shape != (MATRIX_HEIGHT, MATRIX_WIDTH, 3):
+            return EncodedFrame(TYPE_FRAME, frame_id, frame.to_bytes())
+
+        index = next((i for i, owner in enumerate(self._owners) if owner is None or owner() is None), None)
+        if index is None:
+            self._buffers.append(np.empty((MATRIX_HEIGHT, MATRIX_WIDTH, 3), dtype=np.uint8))
+            self._rle_buffers.append(np.empty(MATRIX_HEIGHT * MATRIX_WIDTH * 3, dtype=np.uint8))
+            self._owners.append(None)
+            index = len(self._buffers) - 1
+
+        buffer = self._buffers[index]
+        np.copyto(buffer, frame.pixels)
+        encoded = EncodedFrame(TYPE_FRAME, frame_id, memoryview(buffer).cast('B'),
+                               rle_buffer=self._rle_buffers[index])
+        self._owners[index] = weakref.ref(encoded)
+        return encoded
+
 
 class Driver:
-    """Драйвер для отправки кадров в транспорт"""
+    """
+    Драйвер для отправки кадров в транспорт.
+    Кодирует кадр один раз (EncodedFrame) и раздаёт его всем устройствам одновременно,
+    seq каждый транспорт назначает сам при отправке.
+
+    С threaded=True кодирование, упаковка и отправка на устройства идут в отдельном
+    потоке (TransportWorker), основной цикл только снимает копию кадра и отдаёт её в слот.
+    WS транспорт остаётся в основном loop (он живёт в FastAPI), но RLE для него
+    тоже считается в потоке транспорта.
+    """
     
-    def __init__(self):
-        self._transport: Optional[TransportBase] = None
+    def __init__(self, tracer: Optional[FrameTracer] = None):
+        self.tracer = tracer or FrameTracer()
+        self._sinks: list[Sink] = []
         self._ws_transport: Optional[WSTransport] = None
+        self._ws_sink: Optional[Sink] = None
+        self._frame_id = 0
+        self._led_frame_id = 0
+        self._snapshots = _SnapshotPool()
+        self._frame_repeats = _RepeatFilter()
+        self._led_repeats = _RepeatFilter()
+        self._worker: Optional[TransportWorker] = None
+        self._main_loop: Optional[asyncio.AbstractEventLoop] = None
     
-    def init_from_config(self, transport_uri: str, ws_enabled: bool = False) -> None:
+    def init_from_config(self, transport_uri: str | list[str], ws_enabled: bool = False,
+                         threaded: bool = False, static_keepalive: float = 0.0) -> None:
         """
-        Инициализирует транспорт из URI конфига.
+        Инициализирует транспорты из URI конфига, можно указать один URI или список.
         Примеры:
             - udp://192.168.1.100:5555 - UDP на конкретный IP и порт
             - udp://192.168.1.100 - UDP на порт 5555 по умолчанию
+            - udp://192.168.1.100:5555?delta=1&keyframe=60 - дельта-кадры, полный кадр раз в 60
+            - udp://192.168.1.100:5555?mtu=1500 - полные кадры режутся на тайлы под MTU
+            - udp://192.168.1.101:5555?region=0,0,64,32 - устройство получает только левую половину канваса
+            - udp://192.168.1.100:5555?formats=palette,rgb565 - полные кадры в самом коротком из форматов
         
         WS транспорт инициализируется отдельно через флаг ws_enabled и всегда слушает на /ws
         Приложение может работать только с WS если основной транспорт не указан
+        threaded - отправка на устройства в отдельном потоке
+        static_keepalive - неизменные кадры повторяются не чаще раза в N секунд (0 - каждый кадр)
         """
-        # инициализируем основной транспорт если указан
-        if transport_uri:
-            parsed = urlparse(transport_uri)
-            scheme = parsed.scheme
-            
-            if scheme == 'udp':
-                host = parsed.hostname or "10.0.0.2"
-                port = parsed.port or 5555
-                self._transport = UDPTransport(host=host, port=port)
-                logger.info(f"Initialized UDP transport: {host}:{port}")
-            else:
-                raise ValueError(f"Unknown transport type: {scheme}")
+        self._frame_repeats.keepalive = static_keepalive
+        self._led_repeats.keepalive = static_keepalive
+        uris = [transport_uri] if isinstance(transport_uri, str) else list(transport_uri)
+        for uri in uris:
+            if uri:
+                self._sinks.append(self._create_sink(uri))
         
         # WS транспорт инициализируется отдельно если включен в конфиге
         if ws_enabled:
             self._ws_transport = WSTransport()
+            self._ws_sink = Sink("ws", self._ws_transport)
+            self._sinks.append(self._ws_sink)
             logger.info("WS transport initialized on /api/ws")
         
         # убедимся что хотя бы один транспорт инициализирован
-        if not self._transport and not self._ws_transport:
+        if not self._sinks:
             raise ValueError("At least one transport must be specified (main or ws_enabled)")
+        
+        if threaded:
+            self._worker = TransportWorker()
+            logger.info("Transport worker thread enabled")
+
+    def _create_sink(self, uri: str) -> Sink:
+        parsed = urlparse(uri)
+        scheme = parsed.scheme
+        
+        if scheme == 'udp':
+            host = parsed.hostname or "10.0.0.2"
+            port = parsed.port or 5555
+            query = parse_qs(parsed.query)
+            delta_frames = query.get("delta", ["0"])[0].lower() in ("1", "true", "yes")
+            keyframe_interval = int(query.get("keyframe", ["60"])[0])
+            mtu = int(query.get("mtu", ["0"])[0])
+            if mtu and mtu < MIN_TILE_MTU:
+                raise ValueError(f"{uri}: mtu {mtu} cannot hold one {MATRIX_WIDTH}-pixel row, "
+                                 f"minimum is {MIN_TILE_MTU} (0 disables tiling)")
+            region = _parse_region(query["region"][0]) if "region" in query else None
+            formats = frozenset(f for f in query.get("formats", [""])[0].split(",") if f)
+            if not formats <= set(PIXEL_FORMATS):
+                raise ValueError(f"{uri}: unknown pixel formats {sorted(formats - set(PIXEL_FORMATS))}")
+            if region and (delta_frames or mtu):
+                # тайлы дельты и полосы FRAME_TILE рассчитаны на полный канвас
+                raise ValueError(f"{uri}: delta and mtu are not supported together with region")
+            transport = UDPTransport(
+                host=host,
+                port=port,
+                delta_frames=delta_frames,
+                keyframe_interval=keyframe_interval,
+                mtu=mtu,
+                formats=formats
+            )
+            logger.info(f"Initialized UDP transport: {host}:{port} (delta frames: {delta_frames}, "
+                        f"mtu: {mtu or 'off'}, region: {region or 'full'}, formats: {sorted(formats) or 'rgb888'})")
+            return Sink(f"udp://{host}:{port}", transport, region)
+        
+        raise ValueError(f"Unknown transport type: {scheme}")
+    
+    @property
+    def _device_sinks(self) -> list[Sink]:
+        """Устройства, которые в режиме threaded обслуживает поток транспорта"""
+        return [sink for sink in self._sinks if sink is not self._ws_sink]
     
     async def start(self) -> None:
-        """Запускает транспорт"""
-        if self._transport:
-            await self._transport.start()
-        if self._ws_transport:
-            await self._ws_transport.start()
+        """Запускает транспорты"""
+        self._main_loop = asyncio.get_running_loop()
+        if self._worker:
+            self._worker.start()
+        for sink in self._sinks:
+            await self._run_for(sink, sink.transport.start())
     
     async def stop(self) -> None:
-        """Останавливает транспорт"""
-        if self._transport:
-            await self._transport.stop()
-        if self._ws_transport:
-            await self._ws_transport.stop()
+        """Останавливает транспорты"""
+        for sink in self._sinks:
+            await self._run_for(sink, sink.transport.stop())
+        if self._worker:
+            self._worker.stop()
+    
+    async def _run_for(self, sink: Sink, coro):
+        """Выполняет корутину транспорта в том loop, где он живёт"""
+        if self._worker and sink is not self._ws_sink:
+            return await self._worker.run(coro)
+        return await coro
+    
+    def _encode_frame(self, frame: Frame) -> EncodedFrame:
+        with self.tracer.span("snapshot", "transport"):
+            encoded = self._snapshots.encode(frame, self._frame_id)
+        self._frame_id = (self._frame_id + 1) & 0xFFFF
+        return encoded
+    
+    def _encode_led_strip_frame(self, pixels: bytes) -> EncodedFrame:
+        encoded = EncodedFrame(TYPE_LED_STRIP_FRAME, self._led_frame_id, pixels)
+        self._led_frame_id = (self._led_frame_id + 1) & 0xFFFF
+        return encoded
     
     async def display_frame(self, frame: Frame) -> None:
-        """Отправляет готовый RGB888 кадр 128x32 в транспорт"""
-        frame_data = frame.to_bytes()
-        if self._transport:
-            await self._transport.send_frame(frame_data)
-        if self._ws_transport:
-            await self._ws_transport.send_frame(frame_data)
+        """Кодирует готовый RGB888 кадр 128x32 и одновременно отправляет на все устройства"""
+        if self._frame_repeats.is_repeat(frame.pixels):
+            return
+        encoded = self._encode_frame(frame)
+        if self._worker:
+            self._worker.submit("frame", lambda: self._send_from_worker("send_frame", encoded))
+        else:
+            await self._fan_out("send_frame", encoded, self._sinks)
     
     async def send_led_strip_frame(self, pixels: bytes) -> None:
-        """Отправляет кадр для LED ленты в транспорт"""
-        if self._transport:
-            await self._transport.send_led_strip_frame(pixels)
-        if self._ws_transport:
-            await self._ws_transport.send_led_strip_frame(pixels)
+        """Кодирует кадр для LED ленты и отправляет на все устройства"""
+        if self._led_repeats.is_repeat(np.frombuffer(pixels, dtype=np.uint8)):
+            return
+        encoded = self._encode_led_strip_frame(pixels)
+        if self._worker:
+            self._worker.submit("led", lambda: self._send_from_worker("send_led_strip_frame", encoded))
+        else:
+            await self._fan_out("send_led_strip_frame", encoded, self._sinks)
+    
+    @property
+    def threaded(self) -> bool:
+        return self._worker is not None
+    
+    def submit_output(self, stage: Callable[[], Awaitable[None]]) -> None:
+        """
+        Режим конвейера: весь этап вывода кадра (stage) выполняется в потоке транспорта.
+        Внутри stage кадры отправляются через output_frame / output_led_strip_frame.
+        """
+        self._worker.submit("output", stage)
+    
+    def discard_output(self) -> bool:
+        """Выбрасывает ещё не начатый этап вывода, True если он был"""
+        return self._worker.discard("output")
+    
+    async def output_frame(self, frame: Frame) -> None:
+        """display_frame для вызова из потока транспорта (внутри этапа вывода)"""
+        if self._frame_repeats.is_repeat(frame.pixels):
+            return
+        await self._send_from_worker("send_frame", self._encode_frame(frame))
+    
+    async def output_led_strip_frame(self, pixels: bytes) -> None:
+        """send_led_strip_frame для вызова из потока транспорта (внутри этапа вывода)"""
+        if self._led_repeats.is_repeat(np.frombuffer(pixels, dtype=np.uint8)):
+            return
+        await self._send_from_worker("send_led_strip_frame", self._encode_led_strip_frame(pixels))
+    
+    async def _fan_out(self, method: str, encoded: EncodedFrame, sinks: list[Sink]) -> None:
+        """Отправляет кадр на устройства одновременно"""
+        # устройства с одинаковой областью получают один и тот же закодированный кадр
+        regions: dict[Optional[Region], EncodedFrame] = {None: encoded}
+        # вырезается только кадр матрицы, кадр LED ленты уходит на все устройства целиком
+        crop = encoded.ptype == TYPE_FRAME
+        sends = []
+        for sink in sinks:
+            region = sink.region if crop else None
+            if region not in regions:
+                with self.tracer.span("crop", "transport"):
+                    regions[region] = _crop_frame(encoded, region)
+            send = sink.send(method, regions[region])
+            if self.tracer.enabled:
+                # кодирование под формат устройства идёт внутри отправки, попадает в этот же спан
+                send = self._traced(f"{method} {sink.name}", send)
+            sends.append(send)
+        await asyncio.gather(*sends)
+    
+    async def _traced(self, name: str, coro) -> None:
+        with self.tracer.span(name, "transport"):
+            await coro
+    
+    async def _send_from_worker(self, method: str, encoded: EncodedFrame) -> None:
+        """Выполняется в потоке транспорта: устройства отсюда, WS - через основной loop"""
+        await self._fan_out(method, encoded, self._device_sinks)
+        if self._ws_sink and await self._ws_transport.is_connected():
+            _ = encoded.payload  # RLE для WS считаем здесь, а не в основном loop
+            asyncio.run_coroutine_threadsafe(self._ws_sink.send(method, encoded), self._main_loop)
     
     def get_ws_transport(self) -> Optional[WSTransport]:
         """Возвращает WS транспорт для регистрации эндпоинта"""
         return self._ws_transport
+
+    def set_button_callback(self, callback: Callable[[int], None]) -> None:
+        """Кнопки принимаются с любого устройства, которое их поддерживает"""
+        if self._worker:
+            # UDP протокол живёт в потоке транспорта, а обработчик трогает состояние основного loop
+            main_callback = callback
+            callback = lambda button_id: self._main_loop.call_soon_threadsafe(main_callback, button_id)
+        for sink in self._sinks:
+            if hasattr(sink.transport, 'set_button_callback'):
+                sink.transport.set_button_callback(callback)
     
     async def set_brightness(self, level: int) -> None:
-        if self._transport:
-            await self._transport.set_brightness(level)
-        if self._ws_transport:
-            await self._ws_transport.set_brightness(level)
+        await asyncio.gather(*(self._run_for(sink, sink.send("set_brightness", level)) for sink in self._sinks))
 
     async def get_brightness(self) -> int:
-        if self._transport:
-            return await self._transport.get_brightness()
-        if self._ws_transport:
-            return await self._ws_transport.get_brightness()
+        if self._sinks:
+            sink = self._sinks[0]
+            return await self._run_for(sink, sink.transport.get_brightness())
         return 0 
 
+    def get_sink_stats(self) -> list[dict]:
+        """Счётчики ошибок и трафика по каждому устройству"""
+        return [sink.stats() for sink in self._sinks]
+
+    def get_static_stats(self) -> dict:
+        """Сколько неизменных кадров не было отправлено"""
+        return {
+            "keepalive": self._frame_repeats.keepalive,
+            "frames_skipped": self._frame_repeats.skipped,
+            "led_frames_skipped": self._led_repeats.skipped
+        }
+
+    def get_worker_stats(self) -> Optional[dict]:
+        """Задержка передачи кадров в поток транспорта, None если поток выключен"""
+        return self._worker.stats.to_dict() if self._worker else None
+
     @property
     def transport(self) -> Optional[TransportBase]:
-        return self._transport
-    
+        """Первый основной (не WS) транспорт"""
+        for sink in self._sinks:
+            if sink.transport is not self._ws_transport:
+                return sink.transport
+        return None
 
+    @property
+    def sinks(self) -> list[Sink]:
+        return self._sinks
@@ -1,4 +1,6 @@
 import struct
+import threading
+import numpy as np
 from typing import Dict, Any
 from fastcrc.crc8 import smbus as _crc8_impl
 
@@ -17,12 +19,188 @@ TYPE_FRAME = 0x02
 TYPE_INFO = 0x03
 TYPE_LED_STRIP_FRAME = 0x05
 TYPE_BUTTON = 0x06
+TYPE_FRAME_DELTA = 0x07
+TYPE_KEYFRAME_REQUEST = 0x08
+TYPE_FRAME_TILE = 0x09
 
 # Command IDs (for TYPE_CMD)
 CMD_BRIGHTNESS = 0x01
 
 # флаги кадра
 FRAME_FLAG_COMPRESSED = 1 << 0
+FRAME_FLAG_RGB565 = 1 << 1  # 2 байта на пиксель, только FRAME
+FRAME_FLAG_PALETTE = 1 << 2  # палитра + индексы (4 бита до 16 цветов, иначе 8), только FRAME
+
+# компактные форматы пикселей, которые устройство может принимать (опция транспорта formats)
+PIXEL_FORMAT_PALETTE = "palette"
+PIXEL_FORMAT_RGB565 = "rgb565"  # с потерями, младшие биты цвета отбрасываются
+PIXEL_FORMATS = (PIXEL_FORMAT_PALETTE, PIXEL_FORMAT_RGB565)
+PALETTE_4BIT_COLORS = 16
+PALETTE_MAX_COLORS = 256
+
+# заголовок payload FRAME / LED_STRIP_FRAME: FRAME_ID, FLAGS
+FRAME_HEADER_FMT = '<H B'
+FRAME_HEADER_SIZE = struct.calcsize(FRAME_HEADER_FMT)
+
+# максимальная длина run/literal блока RLE
+RLE_MAX_BLOCK = 128
+
+# геометрия канваса и тайлов для дельта-кадров (8x4 = 32 тайла, маска в uint32)
+MATRIX_WIDTH = 128
+MATRIX_HEIGHT = 32
+DELTA_TILE_WIDTH = 16
+DELTA_TILE_HEIGHT = 8
+DELTA_TILES_X = MATRIX_WIDTH // DELTA_TILE_WIDTH
+DELTA_TILES_Y = MATRIX_HEIGHT // DELTA_TILE_HEIGHT
+
+# размеры для тайловой отправки кадра по UDP без IP фрагментации
+DEFAULT_MTU = 1500
+UDP_IP_OVERHEAD = 28  # IPv4 (20) + UDP (8)
+FRAME_TILE_HEADER_FMT = '<H B B B B B'  # FRAME_ID, FLAGS, TILE_INDEX, TILE_COUNT, Y, H
+FRAME_TILE_HEADER_SIZE = struct.calcsize(FRAME_TILE_HEADER_FMT)
+
+
+class _RLEScratch:
+    """
+    Рабочие массивы RLE кодировщика на pixels пикселей, выделяются один раз на поток.
+    Все шаги кодирования пишут в них через out= / where=, так что кодирование кадра
+    в установившемся режиме ничего не выделяет.
+    """
+
+    def __init__(self, pixels: int):
+        self.pixels = pixels
+        self.index = np.arange(pixels)
+        self.ints = [np.empty(pixels, dtype=np.intp) for _ in range(8)]
+        self.bools = [np.empty(pixels, dtype=bool) for _ in range(7)]
+        self.differs = np.empty((pixels, 3), dtype=bool)
+        self.channel = np.empty(pixels, dtype=np.uint8)
+        # худший случай - control байт на каждый пиксель, плюс место для ненужных записей
+        self.out = np.empty(pixels * 4 + 4, dtype=np.uint8)
+        self.trash = pixels * 4  # сюда np.put сбрасывает пиксели, которые ничего не пишут
+        self.offsets = self.ints[0]  # смещения в out по пикселям после последнего кодирования
+
+
+_rle_local = threading.local()
+
+
+def _rle_scratch(pixels: int) -> _RLEScratch:
+    scratch = getattr(_rle_local, "scratch", None)
+    if scratch is None or scratch.pixels < pixels:
+        scratch = _rle_local.scratch = _RLEScratch(max(pixels, MATRIX_WIDTH * MATRIX_HEIGHT))
+    return scratch
+
+
+def _rle_encode_array(px: np.ndarray, segment: int = 0, limit: int = 0) -> np.ndarray | None:
+    """
+    Векторизованный жадный RLE кодировщик над массивом пикселей (N, unit),
+    unit - размер пикселя в байтах (3 для RGB888, 2 для RGB565, 1 для индексов палитры).
+    segment > 0 - блоки не пересекают границы кратные segment пикселей
+    (каждая строка кодируется независимо и поток можно резать по строкам).
+
+    Каждому пикселю считается, в каком он блоке и сколько байт пишет (control байт
+    начала блока, свой цвет у литерала и у начала run блока), затем все байты
+    раскладываются на места через np.put. Возвращает view на буфер потока, валидный
+    до следующего кодирования в этом потоке; None если результат не короче limit.
+    """
+    pixel_count, unit = px.shape
+    scratch = _rle_scratch(pixel_count)
+    n = pixel_count
+    index = scratch.index[:n]
+    start, end, length, pos, consumed, count, aux, dest = (a[:n] for a in scratch.ints)
+    boundary, in_run, literal, run_head, block_head, mark, writes = (a[:n] for a in scratch.bools)
+    offsets = start  # начало серии больше не нужно, когда считаются смещения
+
+    # границы серий одинаковых пикселей
+    boundary[0] = True
+    differs = scratch.differs[:n - 1, :unit]
+    np.not_equal(px[1:], px[:-1], out=differs)
+    np.any(differs, axis=1, out=boundary[1:])
+    if segment:
+        boundary[::segment] = True
+
+    # начало, конец и длина серии каждого пикселя, позиция пикселя в серии
+    # смешанные bool/int ufunc'и выделяют буфер приведения, поэтому маски применяются через where=
+    np.copyto(start, 0)
+    np.copyto(start, index, where=boundary)
+    np.maximum.accumulate(start, out=start)
+    end[n - 1] = n
+    np.copyto(end[:n - 1], n)
+    np.copyto(end[:n - 1], index[1:], where=boundary[1:])
+    np.minimum.accumulate(end[::-1], out=end[::-1])
+    np.subtract(end, start, out=length)
+    np.subtract(index, start, out=pos)
+
+    # серии >= 3 пикселей уходят в run блоки по 128, хвост 1-2 пикселя становится литералом:
+    # из серии в run блоки идёт length - rest, если rest = length % 128 меньше 3, иначе вся серия
+    np.remainder(length, RLE_MAX_BLOCK, out=consumed)
+    np.greater_equal(consumed, 3, out=mark)
+    np.copyto(consumed, 0, where=mark)
+    np.subtract(length, consumed, out=consumed)
+    np.less(pos, consumed, out=in_run)
+    np.logical_not(in_run, out=literal)
+    np.remainder(pos, RLE_MAX_BLOCK, out=aux)
+    np.equal(aux, 0, out=mark)
+    np.logical_and(mark, in_run, out=run_head)
+    np.subtract(consumed, pos, out=count)  # длина run блока для его первого пикселя
+
+    # литералы - все пиксели не из run блоков, подряд идущие склеиваются в отрезки
+    mark[0] = True
+    np.logical_not(literal[:n - 1], out=mark[1:])
+    if segment:
+        mark[::segment] = True
+    np.logical_and(mark, literal, out=mark)
+    np.copyto(aux, 0)
+    np.copyto(aux, index, where=mark)
+    np.maximum.accumulate(aux, out=aux)
+    np.subtract(index, aux, out=aux)  # позиция пикселя в отрезке литералов
+    np.remainder(aux, RLE_MAX_BLOCK, out=aux)
+    np.equal(aux, 0, out=block_head)
+    np.logical_and(block_head, literal, out=block_head)
+    # конец отрезка литералов: следующий пиксель не литерал или начинается новый сегмент
+    mark[n - 1] = True
+    np.logical_not(literal[1:], out=mark[:n - 1])
+    if segment:
+        mark[segment - 1::segment] = True
+    np.logical_and(mark, literal, out=mark)
+    np.copyto(aux, n)
+    np.add(index, 1, out=aux, where=mark)
+    np.minimum.accumulate(aux[::-1], out=aux[::-1])
+    np.subtract(aux, index, out=aux)  # длина литерала до конца отрезка
+    np.copyto(count, aux, where=literal)
+    np.minimum(count, RLE_MAX_BLOCK, out=count)
+    np.logical_or(block_head, run_head, out=block_head)
+
+    # байты пикселя: control байт у начала блока и unit байт цвета у литералов и начала run
+    np.logical_or(literal, run_head, out=writes)
+    np.copyto(aux, 0)
+    np.copyto(aux, unit, where=writes)
+    np.add(aux, 1, out=aux, where=block_head)
+    np.cumsum(aux, out=offsets)
+    total = int(offsets[n - 1])
+    np.subtract(offsets, aux, out=offsets)
+    if limit and total >= limit:
+        return None
+
+    out = scratch.out
+    # control байты: длина-1, старший бит у run блоков
+    np.subtract(count, 1, out=count)
+    np.add(count, 0x80, out=count, where=run_head)
+    np.copyto(scratch.channel[:n], count, casting='unsafe')
+    np.copyto(dest, scratch.trash)
+    np.copyto(dest, offsets, where=block_head)
+    np.put(out, dest, scratch.channel[:n])
+    # цвета: у начала блока сразу после control байта
+    np.copyto(dest, offsets)
+    np.add(dest, 1, out=dest, where=block_head)
+    np.logical_not(writes, out=writes)
+    np.copyto(dest, scratch.trash, where=writes)
+    for channel in range(unit):
+        np.copyto(scratch.channel[:n], px[:, channel])
+        np.put(out, dest, scratch.channel[:n])
+        np.add(dest, 1, out=dest)
+
+    scratch.offsets = offsets
+    return out[:total]
 
 
 def rle_encode(pixels: bytes) -> bytes:
@@ -32,91 +210,96 @@ def rle_encode(pixels: bytes) -> bytes:
     - control byte: старший бит = тип (1=run, 0=literal), младшие 7 бит = длина-1
     - run: 3 байта RGB повторяются (control & 0x7F) + 1 раз
     - literal: следующие ((control & 0x7F) + 1) * 3 байт - сырые пиксели
+
+    Векторизованная версия жадного кодировщика: границы серий ищутся через
+    сравнение соседних пикселей, а блоки run/literal собираются целиком в numpy.
+    Выход побайтно совпадает с прежней попиксельной реализацией
+    (см. tools/rle_bench).
     """
     if len(pixels) == 0 or len(pixels) % 3 != 0:
         return pixels
-    
-    result = bytearray()
-    pixel_count = len(pixels) // 3
-    i = 0
-    
-    while i < pixel_count:
-        r, g, b = pixels[i*3], pixels[i*3+1], pixels[i*3+2]
-        
-        # считаем сколько одинаковых пикселей подряд
-        run_length = 1
-        while (i + run_length < pixel_count and 
-               run_length < 128 and
-               pixels[(i + run_length)*3] == r and
-               pixels[(i + run_length)*3 + 1] == g and
-               pixels[(i + run_length)*3 + 2] == b):
-            run_length += 1
-        
-        if run_length >= 3:
-            # выгодно использовать run
-            control = 0x80 | (run_length - 1)
-            result.append(control)
-            result.extend([r, g, b])
-            i += run_length
-        else:
-            # собираем литералы пока не встретим серию >= 3
-            literal_start = i
-            literal_count = 0
-            
-            while i < pixel_count and literal_count < 128:
-                r2, g2, b2 = pixels[i*3], pixels[i*3+1], pixels[i*3+2]
-                run_ahead = 1
-                while (i + run_ahead < pixel_count and 
-                       run_ahead < 128 and
-                       pixels[(i + run_ahead)*3] == r2 and
-                       pixels[(i + run_ahead)*3 + 1] == g2 and
-                       pixels[(i + run_ahead)*3 + 2] == b2):
-                    run_ahead += 1
-                
-                if run_ahead >= 3 and literal_count > 0:
-                    break
-                
-                literal_count += 1
-                i += 1
-            
-            if literal_count > 0:
-                control = (literal_count - 1)
-                result.append(control)
-                result.extend(pixels[literal_start*3 : (literal_start + literal_count)*3])
-    
-    return bytes(result)
+
+    px = np.frombuffer(pixels, dtype=np.uint8).reshape(-1, 3)
+    return _rle_encode_array(px).tobytes()
 
 
-def rle_decode(data: bytes, expected_pixels: int) -> bytes:
-    """Декодирование RLE сжатых RGB888 пикселей."""
+def rle_encode_rows(pixels: bytes, row_pixels: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    RLE сжатие, где каждая строка из row_pixels пикселей кодируется независимо.
+    Возвращает (закодированный поток, смещения начала каждой строки в байтах + длина потока).
+    Поток строк [a, b) - это data[offsets[a]:offsets[b]], сам по себе валидный RLE.
+    """
+    px = np.frombuffer(pixels, dtype=np.uint8).reshape(-1, 3)
+    result = _rle_encode_array(px, row_pixels).copy()
+    # первый пиксель строки всегда начинает блок, его смещение - начало строки в потоке
+    row_offsets = np.append(_rle_scratch(0).offsets[::row_pixels], len(result))
+    return result, row_offsets
+
+
+def rle_decode(data: bytes, expected_pixels: int, unit: int = 3) -> bytes:
+    """
+    Декодирование RLE сжатых пикселей по unit байт (RGB888 по умолчанию).
+    Начало каждого блока зависит от предыдущего control байта, так что блоки разбираются
+    по очереди, но пиксели копируются целыми срезами: литерал - одним срезом,
+    run - повтором цвета (bytes * count). Это быстрее сборки индексов для numpy выборки.
+    """
+    expected_bytes = expected_pixels * unit
+    data = bytes(data)
+    data_len = len(data)
     result = bytearray()
-    expected_bytes = expected_pixels * 3
     read_offset = 0
-    
-    while read_offset < len(data) and len(result) < expected_bytes:
+
+    while read_offset < data_len and len(result) < expected_bytes:
         control = data[read_offset]
         read_offset += 1
-        
-        is_run = (control & 0x80) != 0
         count = (control & 0x7F) + 1
-        
-        if is_run:
-            if read_offset + 3 > len(data):
+
+        if control & 0x80:
+            end = read_offset + unit
+            if end > data_len:
                 break
-            r, g, b = data[read_offset], data[read_offset+1], data[read_offset+2]
-            read_offset += 3
-            for _ in range(count):
-                result.extend([r, g, b])
+            result += data[read_offset:end] * count  # run - один и тот же цвет
         else:
-            literal_bytes = count * 3
-            if read_offset + literal_bytes > len(data):
+            end = read_offset + count * unit
+            if end > data_len:
                 break
-            result.extend(data[read_offset:read_offset + literal_bytes])
-            read_offset += literal_bytes
-    
+            result += data[read_offset:end]  # literal - пиксели подряд
+        read_offset = end
+
     return bytes(result)
 
 
+def _as_tiles(pixels: bytes) -> np.ndarray:
+    """Представляет кадр 128x32 как массив тайлов (ty, tx, th, tw, 3)"""
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(
+        DELTA_TILES_Y, DELTA_TILE_HEIGHT, DELTA_TILES_X, DELTA_TILE_WIDTH, 3
+    ).transpose(0, 2, 1, 3, 4)
+
+
+def changed_tiles(pixels: bytes, prev_pixels: bytes) -> np.ndarray:
+    """Возвращает bool массив (4, 8) тайлов, изменившихся относительно предыдущего кадра"""
+    return np.any(_as_tiles(pixels) != _as_tiles(prev_pixels), axis=(2, 3, 4))
+
+
+def _pack_tile_mask(changed: np.ndarray) -> int:
+    return int(np.packbits(changed.reshape(-1), bitorder='little').view('<u4')[0])
+
+
+def _unpack_tile_mask(tile_mask: int) -> np.ndarray:
+    bits = np.unpackbits(np.array([tile_mask], dtype='<u4').view(np.uint8), bitorder='little')
+    return bits.astype(bool).reshape(DELTA_TILES_Y, DELTA_TILES_X)
+
+
+def apply_frame_delta(base_pixels: bytes, tile_mask: int, tile_pixels: bytes) -> bytes:
+    """Накладывает изменённые тайлы дельта-кадра на базовый кадр"""
+    frame = bytearray(base_pixels)
+    tiles = _as_tiles(frame)  # view поверх frame, запись идёт прямо в него
+    tiles[_unpack_tile_mask(tile_mask)] = np.frombuffer(tile_pixels, dtype=np.uint8).reshape(
+        -1, DELTA_TILE_HEIGHT, DELTA_TILE_WIDTH, 3
+    )
+    return bytes(frame)
+
+
 class Packet:
     """
     Пакет протокола UDP (v4).
@@ -199,17 +382,33 @@ class Packet:
         pixels - RGB888 байты (128*32*3 = 12288 байт).
         compress - использовать RLE сжатие.
         """
-        frame_flags = 0
-        pixel_data = pixels
-        
-        if compress:
-            compressed = rle_encode(pixels)
-            if len(compressed) < len(pixels):
-                pixel_data = compressed
-                frame_flags |= FRAME_FLAG_COMPRESSED
-        
-        payload = struct.pack('<H B', frame_id, frame_flags) + pixel_data
-        return cls(ptype=TYPE_FRAME, seq=seq, payload=payload)
+        return cls(ptype=TYPE_FRAME, seq=seq, payload=frame_payload(frame_id, pixels, compress))
+
+    @classmethod
+    def make_frame_delta(cls, frame_id: int, base_id: int, pixels: bytes, prev_pixels: bytes,
+                         seq: int = 0, compress: bool = True) -> 'Packet':
+        """
+        Создает FRAME_DELTA пакет - только тайлы 16x8, изменившиеся с кадра base_id.
+        pixels, prev_pixels - полные RGB888 кадры 128x32.
+        compress - использовать RLE сжатие для данных тайлов.
+        """
+        payload = frame_delta_payload(frame_id, base_id, pixels, prev_pixels, compress)
+        return cls(ptype=TYPE_FRAME_DELTA, seq=seq, payload=payload)
+
+    @classmethod
+    def make_frame_tiles(cls, frame_id: int, pixels: bytes, seq: int = 0,
+                         mtu: int = DEFAULT_MTU, compress: bool = True) -> list['Packet']:
+        """
+        Режет кадр 128x32 на FRAME_TILE пакеты, каждый влезает в MTU.
+        Каждый пакет получает свой seq начиная с seq.
+        """
+        payloads = frame_tile_payloads(frame_id, pixels, mtu, compress)
+        return [cls(ptype=TYPE_FRAME_TILE, seq=(seq + i) & 0xFFFF, payload=p) for i, p in enumerate(payloads)]
+
+    @classmethod
+    def make_keyframe_request(cls, last_frame_id: int, seq: int = 0) -> 'Packet':
+        payload = struct.pack('<H', last_frame_id)
+        return cls(ptype=TYPE_KEYFRAME_REQUEST, seq=seq, payload=payload)
 
     @classmethod
     def make_info(cls, brightness: int, seq: int = 0) -> 'Packet':
@@ -223,17 +422,7 @@ class Packet:
         pixels - RGB888 байты произвольной длины.
         compress - использовать RLE сжатие.
         """
-        frame_flags = 0
-        pixel_data = pixels
-        
-        if compress:
-            compressed = rle_encode(pixels)
-            if len(compressed) < len(pixels):
-                pixel_data = compressed
-                frame_flags |= FRAME_FLAG_COMPRESSED
-        
-        payload = struct.pack('<H B', frame_id, frame_flags) + pixel_data
-        return cls(ptype=TYPE_LED_STRIP_FRAME, seq=seq, payload=payload)
+        return cls(ptype=TYPE_LED_STRIP_FRAME, seq=seq, payload=frame_payload(frame_id, pixels, compress))
 
     def parse_payload(self) -> Dict[str, Any]:
         """Декодирует полезную нагрузку в соответствии с типом пакета."""
@@ -248,14 +437,56 @@ class Packet:
             if len(self.payload) < 3:
                 raise ValueError('frame payload too short')
             frame_id, frame_flags = struct.unpack('<H B', self.payload[:3])
-            pixel_data = self.payload[3:]
+            pixels = decode_frame_pixels(frame_flags, self.payload[3:], MATRIX_WIDTH * MATRIX_HEIGHT)
             
+            return {'frame_id': frame_id, 'frame_flags': frame_flags, 'pixels': pixels}
+
+        if self.ptype == TYPE_FRAME_DELTA:
+            if len(self.payload) < 9:
+                raise ValueError('frame delta payload too short')
+            frame_id, frame_flags, base_id, tile_mask = struct.unpack('<H B H I', self.payload[:9])
+            tile_data = self.payload[9:]
+            tile_count = bin(tile_mask).count('1')
+
             if frame_flags & FRAME_FLAG_COMPRESSED:
-                pixels = rle_decode(pixel_data, 128 * 32)
+                tile_data = rle_decode(tile_data, tile_count * DELTA_TILE_WIDTH * DELTA_TILE_HEIGHT)
+
+            return {
+                'frame_id': frame_id,
+                'frame_flags': frame_flags,
+                'base_id': base_id,
+                'tile_mask': tile_mask,
+                'pixels': tile_data,
+            }
+
+        if self.ptype == TYPE_FRAME_TILE:
+            if len(self.payload) < FRAME_TILE_HEADER_SIZE:
+                raise ValueError('frame tile payload too short')
+            frame_id, frame_flags, tile_index, tile_count, y, height = struct.unpack(
+                FRAME_TILE_HEADER_FMT, self.payload[:FRAME_TILE_HEADER_SIZE]
+            )
+            pixel_data = self.payload[FRAME_TILE_HEADER_SIZE:]
+
+            if frame_flags & FRAME_FLAG_COMPRESSED:
+                pixels = rle_decode(pixel_data, MATRIX_WIDTH * height)
             else:
                 pixels = pixel_data
-            
-            return {'frame_id': frame_id, 'frame_flags': frame_flags, 'pixels': pixels}
+
+            return {
+                'frame_id': frame_id,
+                'frame_flags': frame_flags,
+                'tile_index': tile_index,
+                'tile_count': tile_count,
+                'y': y,
+                'height': height,
+                'pixels': pixels,
+            }
+
+        if self.ptype == TYPE_KEYFRAME_REQUEST:
+            if len(self.payload) < 2:
+                raise ValueError('keyframe request payload too short')
+            last_frame_id, = struct.unpack('<H', self.payload[:2])
+            return {'last_frame_id': last_frame_id}
 
         if self.ptype == TYPE_INFO:
             if len(self.payload) < 3:
@@ -274,4 +505,324 @@ class Packet:
     def __repr__(self) -> str:
         return f"Packet(type={self.ptype:#02x}, seq={self.seq}, len={self.len})"
 
-    
+
+def frame_pixel_data(pixels: bytes, compress: bool = True,
+                     out: np.ndarray | None = None) -> tuple[int, np.ndarray]:
+    """
+    Пиксельная часть FRAME / LED_STRIP_FRAME: (флаги, данные).
+    Данные - RLE если так короче, иначе view на исходные пиксели без копии.
+    out - буфер uint8 не короче пикселей, куда кладётся RLE вместо нового массива.
+    """
+    raw = np.frombuffer(pixels, dtype=np.uint8)
+    if compress and raw.size and raw.size % 3 == 0:
+        compressed = _rle_encode_array(raw.reshape(-1, 3), limit=raw.size)
+        if compressed is not None:
+            if out is None:
+                return FRAME_FLAG_COMPRESSED, compressed.copy()
+            np.copyto(out[:compressed.size], compressed)
+            return FRAME_FLAG_COMPRESSED, out[:compressed.size]
+    return 0, raw
+
+
+def frame_payload(frame_id: int, pixels: bytes, compress: bool = True) -> bytes:
+    """Payload FRAME / LED_STRIP_FRAME: FRAME_ID, FLAGS и пиксели (RLE если так короче)"""
+    frame_flags, pixel_data = frame_pixel_data(pixels, compress)
+    return struct.pack(FRAME_HEADER_FMT, frame_id, frame_flags) + pixel_data.tobytes()
+
+
+def rgb888_to_rgb565(px: np.ndarray) -> np.ndarray:
+    """(N, 3) RGB888 -> (N, 2) RGB565 little-endian"""
+    px = px.astype(np.uint16)
+    packed = ((px[:, 0] >> 3) << 11) | ((px[:, 1] >> 2) << 5) | (px[:, 2] >> 3)
+    return packed.astype('<u2').view(np.uint8).reshape(-1, 2)
+
+
+def rgb565_to_rgb888(data: bytes) -> bytes:
+    """RGB565 little-endian -> RGB888, младшие биты заполняются старшими"""
+    packed = np.frombuffer(data, dtype='<u2').astype(np.uint16)
+    r = (packed >> 11) & 0x1F
+    g = (packed >> 5) & 0x3F
+    b = packed & 0x1F
+    px = np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=1)
+    return px.astype(np.uint8).tobytes()
+
+
+def palette_encode(px: np.ndarray) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Палитра кадра: (цвета (n, 3), индексы (N,) uint8), None если цветов больше 256.
+    Цвета сворачиваются в uint32 и считаются одним np.unique.
+    """
+    codes = (px[:, 0].astype(np.uint32) << 16) | (px[:, 1].astype(np.uint32) << 8) | px[:, 2]
+    colors, indices = np.unique(codes, return_inverse=True)
+    if len(colors) > PALETTE_MAX_COLORS:
+        return None
+    palette = np.stack(((colors >> 16) & 0xFF, (colors >> 8) & 0xFF, colors & 0xFF), axis=1).astype(np.uint8)
+    return palette, indices.astype(np.uint8)
+
+
+def _pack_nibbles(indices: np.ndarray) -> np.ndarray:
+    """Два 4-битных индекса в байт, первый пиксель в старшем полубайте"""
+    if len(indices) % 2:
+        indices = np.append(indices, 0)
+    return (indices[0::2] << 4) | indices[1::2]
+
+
+def _unpack_nibbles(data: np.ndarray, pixel_count: int) -> np.ndarray:
+    indices = np.empty(len(data) * 2, dtype=np.uint8)
+    indices[0::2] = data >> 4
+    indices[1::2] = data & 0x0F
+    return indices[:pixel_count]
+
+
+def _with_rle(frame_flags: int, prefix: bytes, data: np.ndarray, unit: int,
+              compress: bool) -> list[tuple[int, bytes, np.ndarray]]:
+    """Вариант кодирования и, если включено сжатие, он же поверх RLE"""
+    candidates = [(frame_flags, prefix, data.reshape(-1))]
+    if compress and data.size:
+        compressed = _rle_encode_array(data.reshape(-1, unit)).copy()
+        candidates.append((frame_flags | FRAME_FLAG_COMPRESSED, prefix, compressed))
+    return candidates
+
+
+def compact_pixel_data(pixels: bytes, formats: frozenset[str], compress: bool = True,
+                       rgb888: tuple[int, np.ndarray] | None = None) -> tuple[int, bytes, np.ndarray]:
+    """
+    Пиксельная часть FRAME в самом коротком из разрешённых форматов:
+    (флаги, префикс с палитрой, данные). RGB888 остаётся кандидатом всегда,
+    RGB565 (с потерями) - только если кадр не укладывается в палитру.
+    rgb888 - уже посчитанный frame_pixel_data, чтобы не кодировать RGB888 повторно
+    """
+    frame_flags, data = rgb888 or frame_pixel_data(pixels, compress)
+    candidates = [(frame_flags, b"", data)]
+    px = np.frombuffer(pixels, dtype=np.uint8).reshape(-1, 3)
+
+    encoded = palette_encode(px) if PIXEL_FORMAT_PALETTE in formats else None
+    if encoded is not None:
+        palette, indices = encoded
+        prefix = bytes([len(palette) - 1]) + palette.tobytes()
+        if len(palette) <= PALETTE_4BIT_COLORS:
+            indices = _pack_nibbles(indices)
+        candidates += _with_rle(FRAME_FLAG_PALETTE, prefix, indices, 1, compress)
+    elif PIXEL_FORMAT_RGB565 in formats:
+        candidates += _with_rle(FRAME_FLAG_RGB565, b"", rgb888_to_rgb565(px), 2, compress)
+
+    return min(candidates, key=lambda c: len(c[1]) + c[2].size)
+
+
+def decode_frame_pixels(frame_flags: int, data: bytes, pixel_count: int) -> bytes:
+    """Пиксельная часть FRAME (после FRAME_ID и FLAGS) -> RGB888"""
+    if frame_flags & FRAME_FLAG_PALETTE:
+        if not data:
+            raise ValueError('palette frame without palette')
+        color_count = data[0] + 1
+        palette_end = 1 + color_count * 3
+        palette = np.frombuffer(data[1:palette_end], dtype=np.uint8).reshape(-1, 3)
+        index_data = data[palette_end:]
+        packed_count = (pixel_count + 1) // 2 if color_count <= PALETTE_4BIT_COLORS else pixel_count
+        if frame_flags & FRAME_FLAG_COMPRESSED:
+            index_data = rle_decode(index_data, packed_count, unit=1)
+        indices = np.frombuffer(index_data, dtype=np.uint8)
+        if color_count <= PALETTE_4BIT_COLORS:
+            indices = _unpack_nibbles(indices, pixel_count)
+        return palette[indices].tobytes()
+
+    if frame_flags & FRAME_FLAG_RGB565:
+        if frame_flags & FRAME_FLAG_COMPRESSED:
+            data = rle_decode(data, pixel_count, unit=2)
+        return rgb565_to_rgb888(data)
+
+    if frame_flags & FRAME_FLAG_COMPRESSED:
+        return rle_decode(data, pixel_count)
+    return data
+
+
+def frame_delta_payload(frame_id: int, base_id: int, pixels: bytes, prev_pixels: bytes,
+                        compress: bool = True) -> bytes:
+    """Payload FRAME_DELTA: тайлы 16x8, изменившиеся относительно prev_pixels"""
+    changed = changed_tiles(pixels, prev_pixels)
+    tile_mask = _pack_tile_mask(changed)
+    tile_data = _as_tiles(pixels)[changed].tobytes()
+
+    frame_flags = 0
+    if compress and tile_data:
+        compressed = rle_encode(tile_data)
+        if len(compressed) < len(tile_data):
+            tile_data = compressed
+            frame_flags |= FRAME_FLAG_COMPRESSED
+
+    return struct.pack('<H B H I', frame_id, frame_flags, base_id, tile_mask) + tile_data
+
+
+def frame_tile_payloads(frame_id: int, pixels: bytes, mtu: int = DEFAULT_MTU,
+                        compress: bool = True) -> list[bytes]:
+    """
+    Payload'ы FRAME_TILE - полосы целых строк, каждый пакет с заголовком влезает в MTU.
+    Полосы набираются жадно по размеру строк после RLE, так что статичный кадр уходит
+    одним-двумя пакетами, а шумный - полосами по 3 строки.
+    """
+    budget = mtu - UDP_IP_OVERHEAD - Packet.HEADER_SIZE - FRAME_TILE_HEADER_SIZE
+    row_bytes = MATRIX_WIDTH * 3
+
+    if compress:
+        encoded, row_offsets = rle_encode_rows(pixels, MATRIX_WIDTH)
+        row_sizes = np.diff(row_offsets).tolist()
+    else:
+        row_sizes = [row_bytes + budget] * MATRIX_HEIGHT  # сжатие никогда не выбирается
+
+    # жадно набираем строки в полосы, пока сжатый или сырой вариант влезает
+    bands = []
+    y = 0
+    while y < MATRIX_HEIGHT:
+        height = 0
+        compressed_size = 0
+        raw_size = 0
+        while y + height < MATRIX_HEIGHT:
+            next_compressed = compressed_size + row_sizes[y + height]
+            next_raw = raw_size + row_bytes
+            if height > 0 and min(next_compressed, next_raw) > budget:
+                break
+            compressed_size, raw_size = next_compressed, next_raw
+            height += 1
+        bands.append((y, height, compressed_size < raw_size))
+        y += height
+
+    payloads = []
+    for index, (y, height, use_rle) in enumerate(bands):
+        if use_rle:
+            tile_data = encoded[row_offsets[y]:row_offsets[y + height]].tobytes()
+            frame_flags = FRAME_FLAG_COMPRESSED
+        else:
+            tile_data = pixels[y * row_bytes:(y + height) * row_bytes]
+            frame_flags = 0
+        header = struct.pack(FRAME_TILE_HEADER_FMT, frame_id, frame_flags, index, len(bands), y, height)
+        payloads.append(header + tile_data)
+
+    return payloads
+
+
+class EncodedFrame:
+    """
+    Кадр, закодированный один раз на тик и общий для всех транспортов.
+    Payload'ы считаются лениво и кешируются, данные только для чтения.
+    Транспорт добавляет лишь свой заголовок с seq в момент отправки.
+    """
+
+    def __init__(self, ptype: int, frame_id: int, pixels: bytes, compress: bool = True,
+                 rle_buffer: np.ndarray | None = None):
+        self.ptype = ptype  # TYPE_FRAME или TYPE_LED_STRIP_FRAME
+        self.frame_id = frame_id
+        self.pixels = pixels
+        self.compress = compress
+        self.rle_buffer = rle_buffer  # куда класть RLE пикселей, None - новый массив
+        self._payload: bytes | None = None
+        self._pixel_data: tuple[int, np.ndarray] | None = None
+        self._compact_pixel_data: dict[frozenset[str], tuple[int, bytes, np.ndarray]] = {}
+        self._tile_payloads: dict[int, list[bytes]] = {}
+        self._delta_payloads: dict[int, bytes] = {}
+
+    @property
+    def pixel_data(self) -> tuple[int, np.ndarray]:
+        """Флаги и пиксельные данные (RLE или сырые), считаются один раз"""
+        if self._pixel_data is None:
+            self._pixel_data = frame_pixel_data(self.pixels, self.compress, self.rle_buffer)
+        return self._pixel_data
+
+    @property
+    def payload(self) -> bytes:
+        """Payload полного FRAME / LED_STRIP_FRAME пакета"""
+        if self._payload is None:
+            frame_flags, pixel_data = self.pixel_data
+            self._payload = struct.pack(FRAME_HEADER_FMT, self.frame_id, frame_flags) + pixel_data.tobytes()
+        return self._payload
+
+    def pack(self, seq: int) -> bytes:
+        """Полный пакет с заголовком для конкретного получателя"""
+        return Packet(ptype=self.ptype, seq=seq, payload=self.payload).pack()
+
+    def compact_pixel_data(self, formats: frozenset[str]) -> tuple[int, bytes, np.ndarray]:
+        """Самое короткое кодирование пикселей из разрешённых форматов (общее для устройств с теми же форматами)"""
+        if formats not in self._compact_pixel_data:
+            self._compact_pixel_data[formats] = compact_pixel_data(
+                self.pixels, formats, self.compress, self.pixel_data
+            )
+        return self._compact_pixel_data[formats]
+
+    def pack_into(self, builder: 'PacketBuilder', seq: int,
+                  formats: frozenset[str] = frozenset()) -> memoryview:
+        """
+        Полный пакет, собранный в буфере builder без промежуточных bytes.
+        formats - компактные форматы, которые понимает получатель (только для FRAME)
+        """
+        if formats and self.ptype == TYPE_FRAME:
+            frame_flags, prefix, pixel_data = self.compact_pixel_data(formats)
+            return builder.build_frame(self.ptype, seq, self.frame_id, frame_flags, pixel_data, prefix)
+        frame_flags, pixel_data = self.pixel_data
+        return builder.build_frame(self.ptype, seq, self.frame_id, frame_flags, pixel_data)
+
+    def tile_payloads(self, mtu: int) -> list[bytes]:
+        """Payload'ы FRAME_TILE для заданного MTU"""
+        if mtu not in self._tile_payloads:
+            self._tile_payloads[mtu] = frame_tile_payloads(self.frame_id, self.pixels, mtu, self.compress)
+        return self._tile_payloads[mtu]
+
+    def delta_payload(self, base: 'EncodedFrame') -> bytes:
+        """Payload FRAME_DELTA относительно кадра base (общий для получателей с той же базой)"""
+        if base.frame_id not in self._delta_payloads:
+            self._delta_payloads[base.frame_id] = frame_delta_payload(
+                self.frame_id, base.frame_id, self.pixels, base.pixels, self.compress
+            )
+        return self._delta_payloads[base.frame_id]
+
+
+# меньший MTU не вмещает одну несжатую строку в FRAME_TILE пакете
+MIN_TILE_MTU = UDP_IP_OVERHEAD + Packet.HEADER_SIZE + FRAME_TILE_HEADER_SIZE + MATRIX_WIDTH * 3
+
+# самый большой пакет - несжатый полный кадр
+MAX_PACKET_SIZE = Packet.HEADER_SIZE + FRAME_HEADER_SIZE + MATRIX_WIDTH * MATRIX_HEIGHT * 3
+
+
+class PacketBuilder:
+    """
+    Собирает пакеты в одном переиспользуемом bytearray: заголовки пишутся через
+    pack_into, payload копируется прямо из numpy массива или bytes.
+    Возвращаемый memoryview валиден до следующей сборки - его нужно сразу отправить
+    (sendto копирует данные сам, если не может отправить сразу).
+    """
+
+    def __init__(self, capacity: int = MAX_PACKET_SIZE):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._array = np.frombuffer(self._buffer, dtype=np.uint8)
+
+    def build(self, ptype: int, seq: int, payload: bytes) -> memoryview:
+        """Пакет с готовым payload"""
+        end = Packet.HEADER_SIZE + len(payload)
+        self._check_capacity(end)
+        self._view[Packet.HEADER_SIZE:end] = payload
+        return self._finish(ptype, seq, end)
+
+    def build_frame(self, ptype: int, seq: int, frame_id: int, frame_flags: int,
+                    pixel_data: np.ndarray, prefix: bytes = b"") -> memoryview:
+        """
+        FRAME / LED_STRIP_FRAME пакет: заголовок кадра и пиксели пишутся на место.
+        prefix - данные между заголовком кадра и пикселями (палитра)
+        """
+        start = Packet.HEADER_SIZE + FRAME_HEADER_SIZE
+        end = start + len(prefix) + pixel_data.size
+        self._check_capacity(end)
+        struct.pack_into(FRAME_HEADER_FMT, self._buffer, Packet.HEADER_SIZE, frame_id, frame_flags)
+        self._view[start:start + len(prefix)] = prefix
+        self._array[start + len(prefix):end] = pixel_data
+        return self._finish(ptype, seq, end)
+
+    def _check_capacity(self, size: int) -> None:
+        if size > len(self._buffer):
+            raise ValueError(f"packet of {size} bytes does not fit builder buffer of {len(self._buffer)}")
+
+    def _finish(self, ptype: int, seq: int, end: int) -> memoryview:
+        struct.pack_into(
+            Packet.HEADER_FMT_NO_CRC, self._buffer, 0,
+            SYNC, PROTOCOL_VERSION, ptype, end - Packet.HEADER_SIZE, seq
+        )
+        self._buffer[Packet.HEADER_SIZE - 1] = crc8(self._view[:Packet.HEADER_SIZE - 1])
+        return self._view[:end]
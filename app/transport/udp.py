@@ -3,7 +3,10 @@ import asyncio
 from typing import Optional, Tuple, Callable
 from time import time
 from transport.base import TransportBase
-from transport.proto import Packet, TYPE_BUTTON
+from transport.proto import (
+    Packet, PacketBuilder, EncodedFrame, TYPE_BUTTON, TYPE_KEYFRAME_REQUEST,
+    TYPE_FRAME_DELTA, TYPE_FRAME_TILE, UDP_IP_OVERHEAD
+)
 
 
 logger = logging.getLogger(__name__)
@@ -13,27 +16,45 @@ CMD_BRIGHTNESS = 0x01
 
 
 class UDPTransport(TransportBase):    
-    def __init__(self, host: str = "192.168.1.100", port: int = 5555):
+    def __init__(self, host: str = "192.168.1.100", port: int = 5555,
+                 delta_frames: bool = False, keyframe_interval: int = 60, mtu: int = 0,
+                 formats: frozenset[str] = frozenset()):
         """
         Инициализирует UDP транспорт
         host - IP адрес устройства
         port - UDP порт
+        delta_frames - отправлять FRAME_DELTA (только изменённые тайлы) между ключевыми кадрами
+        keyframe_interval - полный кадр раз в N кадров в режиме delta_frames
+        mtu - если задан, полные кадры режутся на FRAME_TILE пакеты не больше MTU
+        formats - компактные форматы пикселей для полных кадров (palette, rgb565), которые понимает устройство
         """
         self.host = host
         self.port = port
+        self.delta_frames = delta_frames
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.mtu = mtu
+        self.formats = formats
         self._transport: Optional[asyncio.DatagramTransport] = None
         self._protocol: Optional[asyncio.DatagramProtocol] = None
         self._seq = 0
         self._led_seq = 0
+        self._builder = PacketBuilder()  # один буфер на все пакеты, sendto копирует сам
         self._button_callback: Optional[Callable[[int], None]] = None
         self._brightness: int = 255
+        # состояние дельта-кадров
+        self._last_frame: Optional[EncodedFrame] = None
+        self._frames_since_keyframe = 0
+        self._keyframe_requested = True
+        # ошибка сокета пришедшая асинхронно (например ICMP unreachable), отдаётся драйверу
+        # после следующей отправки - сам пакет из-за старой ошибки не теряется
+        self._pending_error: Optional[Exception] = None
     
     async def start(self) -> None:
         """Запускает UDP транспорт"""
         loop = asyncio.get_event_loop()
         try:
             # Создаем UDP сокет для отправки
-            protocol = _UDPProtocol(self._button_callback)
+            protocol = _UDPProtocol(self._button_callback, self.request_keyframe, self._on_socket_error)
             self._transport, self._protocol = await loop.create_datagram_endpoint(
                 lambda: protocol,
                 remote_addr=(self.host, self.port)
@@ -55,47 +76,78 @@ class UDPTransport(TransportBase):
         if self._protocol:
             self._protocol.button_callback = callback
     
-    async def send_frame(self, frame_data: bytes) -> None:
+    def _on_socket_error(self, exc: Exception) -> None:
+        self._pending_error = exc
+
+    def _raise_pending_error(self) -> None:
+        """
+        Ошибки отправки не глотаются здесь, их считает драйвер по каждому устройству.
+        Вызывается после отправки и обновления состояния, так что текущий пакет уже ушёл.
+        """
+        if self._pending_error is not None:
+            exc, self._pending_error = self._pending_error, None
+            raise exc
+
+    def request_keyframe(self) -> None:
+        """Следующий кадр будет отправлен полностью (устройство потеряло базовый кадр)"""
+        self._keyframe_requested = True
+
+    async def send_frame(self, frame: EncodedFrame) -> None:
         """Отправляет кадр 128x32 на устройство"""
         if not self._transport:
             logger.warning("UDP transport not initialized")
             return
         
-        packet = Packet.make_frame(
-            frame_id=self._seq,
-            pixels=frame_data,
-            seq=self._seq,
-            compress=True
-        )
-        self._seq = (self._seq + 1) & 0xFFFF
+        payloads = None
+        delta = False
         
-        try:
-            data = packet.pack()
-            self._transport.sendto(data)
-        except Exception as e:
-            logger.error(f"Error sending frame: {e}")
+        if (self.delta_frames and not self._keyframe_requested and self._last_frame is not None
+                and self._frames_since_keyframe < self.keyframe_interval):
+            payload = frame.delta_payload(self._last_frame)
+            # если изменилось почти всё или дельта не влезает в MTU - шлём полный кадр
+            too_big = self.mtu and len(payload) + Packet.HEADER_SIZE + UDP_IP_OVERHEAD > self.mtu
+            if len(payload) < len(frame.pixels) and not too_big:
+                payloads = [(TYPE_FRAME_DELTA, payload)]
+                delta = True
+        
+        if payloads is None and self.mtu:
+            payloads = [(TYPE_FRAME_TILE, p) for p in frame.tile_payloads(self.mtu)]
+        
+        if payloads is None:
+            # полный кадр собирается сразу в буфере, без payload и склейки с заголовком
+            self._sendto(frame.pack_into(self._builder, self._seq, self.formats))
+            self._seq = (self._seq + 1) & 0xFFFF
+        else:
+            for ptype, payload in payloads:
+                self._sendto(self._builder.build(ptype, self._seq, payload))
+                self._seq = (self._seq + 1) & 0xFFFF
+        
+        # состояние дельты меняется только после отправки: следующая дельта строится
+        # от кадра, который действительно ушёл на устройство
+        if delta:
+            self._frames_since_keyframe += 1
+        else:
+            self._frames_since_keyframe = 0
+            self._keyframe_requested = False
+        self._last_frame = frame
+        
+        self._raise_pending_error()
     
 
-    async def send_led_strip_frame(self, pixels: bytes) -> None:
+    async def send_led_strip_frame(self, frame: EncodedFrame) -> None:
         """Отправляет кадр для LED ленты на устройство"""
         if not self._transport:
             logger.warning("UDP transport is not initialized")
             return
         
-        packet = Packet.make_led_strip_frame(
-            frame_id=self._led_seq,
-            pixels=pixels,
-            seq=self._led_seq,
-            compress=True
-        )
+        self._sendto(frame.pack_into(self._builder, self._led_seq))
         self._led_seq = (self._led_seq + 1) & 0xFFFF
-        
-        try:
-            data = packet.pack()
-            self._transport.sendto(data)
-        except Exception as e:
-            logger.error(f"Error sending LED frame: {e}")
+        self._raise_pending_error()
     
+    def _sendto(self, data) -> None:
+        self._transport.sendto(data)
+        self._count_sent(len(data))
+
     async def is_connected(self) -> bool:
         """Checks connection (UDP has no connection state, returns True if initialized)"""
         return self._transport is not None
@@ -115,11 +167,8 @@ class UDPTransport(TransportBase):
         packet = Packet.make_cmd(CMD_BRIGHTNESS, bytes([level]), seq=self._seq)
         self._seq = (self._seq + 1) & 0xFFFF
         
-        try:
-            data = packet.pack()
-            self._transport.sendto(data)
-        except Exception as e:
-            logger.error(f"Error sending brightness command: {e}")
+        self._sendto(packet.pack())
+        self._raise_pending_error()
     
     async def get_brightness(self) -> int:
         """Returns the current display brightness level"""
@@ -129,8 +178,12 @@ class UDPTransport(TransportBase):
 class _UDPProtocol(asyncio.DatagramProtocol):
     """Internal protocol for handling UDP packets"""
     
-    def __init__(self, button_callback: Optional[Callable[[int], None]] = None):
+    def __init__(self, button_callback: Optional[Callable[[int], None]] = None,
+                 keyframe_callback: Optional[Callable[[], None]] = None,
+                 error_callback: Optional[Callable[[Exception], None]] = None):
         self.button_callback = button_callback
+        self.keyframe_callback = keyframe_callback
+        self.error_callback = error_callback
         self._last_error_time = 0
         self._error_throttle_interval = 5.0
     
@@ -146,12 +199,20 @@ class _UDPProtocol(asyncio.DatagramProtocol):
                 logger.info(f"Received button press: {button_id}")
                 if self.button_callback:
                     self.button_callback(button_id)
+            
+            elif packet.ptype == TYPE_KEYFRAME_REQUEST:
+                payload = packet.parse_payload()
+                logger.debug(f"Keyframe requested, device has frame {payload.get('last_frame_id')}")
+                if self.keyframe_callback:
+                    self.keyframe_callback()
                     
         except ValueError as e:
             logger.warning(f"Error parsing UDP packet: {e}")
     
     def error_received(self, exc: Exception) -> None:
         """Handles UDP errors"""
+        if self.error_callback:
+            self.error_callback(exc)
         current_time = time()
         if current_time - self._last_error_time >= self._error_throttle_interval:
             logger.error(f"UDP error: {exc}")
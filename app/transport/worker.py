@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+from time import monotonic
+from typing import Any, Awaitable, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# сколько ждать остановки потока при выключении
+STOP_TIMEOUT = 2.0
+
+
+class HandoffStats:
+    """Задержка передачи кадра из основного цикла в поток транспорта"""
+
+    def __init__(self):
+        self.count = 0
+        self.dropped = 0  # кадры, вытесненные более новыми до того как поток их забрал
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+
+    def record(self, latency: float) -> None:
+        self.count += 1
+        self.last = latency
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "dropped": self.dropped,
+            "last_ms": self.last * 1000,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000
+        }
+
+
+class TransportWorker:
+    """
+    Отдельный поток со своим event loop для кодирования, упаковки и отправки кадров.
+    Основной цикл кладёт готовый кадр в слот (по одному на поток данных - кадр, LED)
+    и сразу возвращается к следующему кадру; если поток не успел забрать
+    предыдущий кадр, тот вытесняется - на устройство всегда уходит самый свежий.
+    """
+
+    def __init__(self, name: str = "transport-worker"):
+        self.name = name
+        self.stats = HandoffStats()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._slots: dict[str, tuple[float, Callable[[], Awaitable[None]]]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run_thread, name=self.name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        logger.info(f"Transport worker thread '{self.name}' started")
+
+    def stop(self) -> None:
+        if self.loop and self._thread and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(STOP_TIMEOUT)
+        logger.info(f"Transport worker thread '{self.name}' stopped")
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """Выполняет корутину в потоке транспорта и ждёт результат из основного loop"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def submit(self, stream: str, send: Callable[[], Awaitable[None]]) -> None:
+        """
+        Кладёт отправку в слот потока данных, вытесняя ещё не взятую.
+        send - фабрика корутины, вызывается уже в потоке транспорта.
+        """
+        with self._lock:
+            if stream in self._slots:
+                self.stats.dropped += 1
+            self._slots[stream] = (monotonic(), send)
+        self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    def discard(self, stream: str) -> bool:
+        """Выбрасывает ещё не взятую отправку из слота, True если она была"""
+        with self._lock:
+            if self._slots.pop(stream, None) is None:
+                return False
+            self.stats.dropped += 1
+            return True
+
+    def _run_thread(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._wakeup = asyncio.Event()
+        task = self.loop.create_task(self._process())
+        self.loop.call_soon(self._ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            task.cancel()
+            self.loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+            self.loop.close()
+
+    async def _process(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            with self._lock:
+                slots, self._slots = self._slots, {}
+
+            # сначала кадр, потом LED - как в основном цикле
+            for stream in sorted(slots, key=lambda s: s != "frame"):
+                submitted, send = slots.pop(stream)
+                self.stats.record(monotonic() - submitted)
+                try:
+                    await send()
+                except Exception as e:
+                    logger.error(f"Error in transport worker ({stream}): {e}")
+                # отпускаем задание сразу, оно может держать буфер кадра
+                del send
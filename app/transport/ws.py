@@ -1,140 +1,288 @@
+import asyncio
 import logging
-from typing import Optional, Set
+from collections import deque
+from dataclasses import dataclass
+from time import monotonic
+from typing import Callable, Mapping, Optional
+import numpy as np
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketState
 from transport.base import TransportBase
-from transport.proto import Packet, CMD_BRIGHTNESS
+from transport.proto import (
+    Packet, EncodedFrame, CMD_BRIGHTNESS, TYPE_FRAME, TYPE_LED_STRIP_FRAME, MATRIX_WIDTH, MATRIX_HEIGHT
+)
 
 
 logger = logging.getLogger(__name__)
 
+# сколько ждать отправки одного сообщения прежде чем считать клиента зависшим
+SEND_TIMEOUT = 2.0
+# лимит очереди команд (яркость и т.п.), кадры в ней не лежат
+CONTROL_QUEUE_SIZE = 16
 
-class WSTransport(TransportBase):
-    """WebSocket транспорт для отправки кадров через WS соединение"""
-    
-    def __init__(self):
-        self._connections: Set[WebSocket] = set()
-        self._seq: int = 0
-        self._led_seq: int = 0
-        self._brightness: int = 150
-    
-    async def send_frame(self, frame_data: bytes) -> None:
-        """Отправляет кадр всем подключенным клиентам"""
-        if not self._connections:
-            return
-        
-        packet = Packet.make_frame(
-            frame_id=self._seq,
-            pixels=frame_data,
-            seq=self._seq,
-            compress=True
+
+PREVIEW_REGIONS = ("full", "left", "right")
+PREVIEW_SCALES = (1, 2, 4)
+PREVIEW_STREAMS = ("all", "frame", "led")
+
+
+@dataclass
+class PreviewSubscription:
+    """
+    Что клиент хочет получать, задаётся query строкой при подключении:
+    /api/ws?fps=10&stream=frame&scale=2&region=left
+    Размер кадра клиент знает сам: (64 или 128) / scale x 32 / scale.
+    """
+    max_fps: float = 0.0  # 0 - без ограничения, отдельно для кадров и для LED ленты
+    frames: bool = True
+    led: bool = True
+    scale: int = 1  # уменьшение в N раз усреднением блоков N x N
+    region: str = "full"  # full, left, right - весь канвас или половина 64x32
+
+    @classmethod
+    def from_query(cls, params: Mapping[str, str]) -> 'PreviewSubscription':
+        stream = params.get("stream", "all")
+        region = params.get("region", "full")
+        scale = int(params.get("scale", 1))
+        max_fps = float(params.get("fps", 0))
+        if stream not in PREVIEW_STREAMS:
+            raise ValueError(f"stream must be one of {PREVIEW_STREAMS}")
+        if region not in PREVIEW_REGIONS:
+            raise ValueError(f"region must be one of {PREVIEW_REGIONS}")
+        if scale not in PREVIEW_SCALES:
+            raise ValueError(f"scale must be one of {PREVIEW_SCALES}")
+        if max_fps < 0:
+            raise ValueError("fps must be positive")
+        return cls(
+            max_fps=max_fps,
+            frames=stream in ("all", "frame"),
+            led=stream in ("all", "led"),
+            scale=scale,
+            region=region
         )
+
+    @property
+    def variant(self) -> tuple[str, int]:
+        """Ключ для общего кодирования кадра клиентами с одинаковым превью"""
+        return self.region, self.scale
+
+
+def _preview_frame(frame: EncodedFrame, region: str, scale: int) -> EncodedFrame:
+    """Вырезает половину канваса и/или уменьшает кадр для превью"""
+    if region == "full" and scale == 1:
+        return frame
+
+    pixels = np.frombuffer(frame.pixels, dtype=np.uint8).reshape(MATRIX_HEIGHT, MATRIX_WIDTH, 3)
+    if region == "left":
+        pixels = pixels[:, :MATRIX_WIDTH // 2]
+    elif region == "right":
+        pixels = pixels[:, MATRIX_WIDTH // 2:]
+
+    if scale > 1:
+        h, w, _ = pixels.shape
+        pixels = pixels.reshape(h // scale, scale, w // scale, scale, 3).mean(axis=(1, 3)).astype(np.uint8)
+
+    return EncodedFrame(frame.ptype, frame.frame_id, np.ascontiguousarray(pixels).tobytes(), frame.compress)
+
+
+class _WSClient:
+    """
+    Одно WS соединение со своей задачей отправки.
+    Для кадров и LED ленты хранится только последний пакет - старые вытесняются,
+    команды идут отдельной небольшой очередью и не теряются.
+    """
+
+    def __init__(self, websocket: WebSocket, subscription: PreviewSubscription,
+                 send_timeout: float = SEND_TIMEOUT, on_sent: Optional[Callable[[int], None]] = None):
+        self.websocket = websocket
+        self.subscription = subscription
+        self.send_timeout = send_timeout
+        self.on_sent = on_sent  # учёт трафика в транспорте
+        self.dropped = 0  # кадры, вытесненные более новыми до отправки
+        self._seq = 0
+        self._led_seq = 0
+        self._next_frame_time = 0.0
+        self._next_led_time = 0.0  # у LED ленты своя сетка max_fps
+        self._latest: dict[int, bytes] = {}  # тип пакета -> последний пакет
+        self._control: deque[bytes] = deque(maxlen=CONTROL_QUEUE_SIZE)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, on_done) -> None:
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(lambda _: on_done(self))
+
+    def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    def wants_frame(self, now: float) -> bool:
+        """Подписан ли клиент на кадры и не превысит ли новый кадр его max_fps"""
+        if not self.subscription.frames or now < self._next_frame_time:
+            return False
+        self._next_frame_time = self._next_deadline(self._next_frame_time, now)
+        return True
+
+    def wants_led(self, now: float) -> bool:
+        """То же для кадров LED ленты"""
+        if not self.subscription.led or now < self._next_led_time:
+            return False
+        self._next_led_time = self._next_deadline(self._next_led_time, now)
+        return True
+
+    def _next_deadline(self, deadline: float, now: float) -> float:
+        if self.subscription.max_fps <= 0:
+            return deadline
+        # держим сетку от предыдущего дедлайна, но не копим долг после паузы
+        return max(deadline + 1.0 / self.subscription.max_fps, now)
+
+    def put_frame(self, frame: EncodedFrame) -> None:
+        """Кладёт кадр, заменяя ещё не отправленный кадр того же типа"""
+        if frame.ptype == TYPE_LED_STRIP_FRAME:
+            data = frame.pack(self._led_seq)
+            self._led_seq = (self._led_seq + 1) & 0xFFFF
+        else:
+            data = frame.pack(self._seq)
+            self._seq = (self._seq + 1) & 0xFFFF
+
+        if frame.ptype in self._latest:
+            self.dropped += 1
+        self._latest[frame.ptype] = data
+        self._wakeup.set()
+
+    def put_cmd(self, cmd_id: int, args: bytes) -> None:
+        """Кладёт команду в очередь команд (не вытесняется кадрами)"""
+        self._control.append(Packet.make_cmd(cmd_id, args, seq=self._seq).pack())
         self._seq = (self._seq + 1) & 0xFFFF
-        
-        data = packet.pack()
-        
-        disconnected = set()
-        for ws in self._connections:
-            try:
-                if ws.client_state == WebSocketState.CONNECTED:
-                    await ws.send_bytes(data)
-                else:
-                    disconnected.add(ws)
-            except Exception as e:
-                logger.error(f"Error sending to WS: {e}")
-                disconnected.add(ws)
-        
-        self._connections -= disconnected
-    
-    async def send_led_strip_frame(self, pixels: bytes) -> None:
-        """Отправляет кадр для LED ленты всем подключенным клиентам"""
-        if not self._connections:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        try:
+            while self.websocket.client_state == WebSocketState.CONNECTED:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                while self._control:
+                    await self._send(self._control.popleft())
+
+                # сначала кадр, потом LED - как в основном цикле
+                for ptype in (TYPE_FRAME, TYPE_LED_STRIP_FRAME):
+                    data = self._latest.pop(ptype, None)
+                    if data is not None:
+                        await self._send(data)
+        except asyncio.TimeoutError:
+            logger.warning(f"WS client stalled for more than {self.send_timeout}s, disconnecting")
+            await self._close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to WS: {e}")
+            await self._close()
+
+    async def _send(self, data: bytes) -> None:
+        await asyncio.wait_for(self.websocket.send_bytes(data), timeout=self.send_timeout)
+        if self.on_sent:
+            self.on_sent(len(data))
+
+    async def _close(self) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+
+class WSTransport(TransportBase):
+    """
+    WebSocket транспорт для отправки кадров через WS соединение.
+    Основной цикл только кладёт пакеты в очереди клиентов и не ждёт сеть,
+    каждый клиент отправляет из своей задачи и со своим seq.
+    """
+
+    def __init__(self, send_timeout: float = SEND_TIMEOUT):
+        self._clients: dict[WebSocket, _WSClient] = {}
+        self._brightness: int = 150
+        self.send_timeout = send_timeout
+
+    async def send_frame(self, frame: EncodedFrame) -> None:
+        """Ставит кадр в очередь подписанным клиентам, каждое превью кодируется один раз"""
+        if not self._clients:
             return
-        
-        packet = Packet.make_led_strip_frame(
-            frame_id=self._led_seq,
-            pixels=pixels,
-            seq=self._led_seq,
-            compress=True
-        )
-        self._led_seq = (self._led_seq + 1) & 0xFFFF
-        
-        data = packet.pack()
-        
-        disconnected = set()
-        for ws in self._connections:
-            try:
-                if ws.client_state == WebSocketState.CONNECTED:
-                    await ws.send_bytes(data)
-                else:
-                    disconnected.add(ws)
-            except Exception as e:
-                logger.error(f"Error sending LED to WS: {e}")
-                disconnected.add(ws)
-        
-        self._connections -= disconnected
-    
+
+        now = monotonic()
+        variants: dict[tuple[str, int], EncodedFrame] = {}
+        for client in self._clients.values():
+            if not client.wants_frame(now):
+                continue
+            key = client.subscription.variant
+            if key not in variants:
+                variants[key] = _preview_frame(frame, *key)
+            client.put_frame(variants[key])
+
+    async def send_led_strip_frame(self, frame: EncodedFrame) -> None:
+        """Ставит кадр для LED ленты в очередь подписанным клиентам с учётом их max_fps"""
+        now = monotonic()
+        for client in self._clients.values():
+            if client.wants_led(now):
+                client.put_frame(frame)
+
     async def _broadcast_brightness(self) -> None:
         """Отправляет текущий уровень яркости всем подключенным клиентам"""
-        if not self._connections:
-            return
-        
-        packet = Packet.make_cmd(CMD_BRIGHTNESS, bytes([self._brightness]), seq=self._seq)
-        self._seq = (self._seq + 1) & 0xFFFF
-        data = packet.pack()
-        
-        disconnected = set()
-        for ws in self._connections:
-            try:
-                if ws.client_state == WebSocketState.CONNECTED:
-                    await ws.send_bytes(data)
-                else:
-                    disconnected.add(ws)
-            except Exception as e:
-                logger.error(f"Error sending brightness to WS: {e}")
-                disconnected.add(ws)
-        
-        self._connections -= disconnected
-    
+        for client in self._clients.values():
+            client.put_cmd(CMD_BRIGHTNESS, bytes([self._brightness]))
+
     async def is_connected(self) -> bool:
-        return len(self._connections) > 0
-    
+        return len(self._clients) > 0
+
     async def start(self) -> None:
         logger.info("WS transport started")
-    
+
     async def stop(self) -> None:
-        for ws in list(self._connections):
+        for websocket, client in list(self._clients.items()):
+            client.stop()
             try:
-                await ws.close()
+                await websocket.close()
             except Exception:
                 pass
-        self._connections.clear()
+        self._clients.clear()
         logger.info("WS transport stopped")
-    
-    async def add_connection(self, websocket: WebSocket) -> None:
+
+    async def add_connection(self, websocket: WebSocket,
+                             subscription: Optional[PreviewSubscription] = None) -> None:
         """Добавляет новое WS соединение"""
         await websocket.accept()
-        self._connections.add(websocket)
-        logger.info(f"WS client connected, total: {len(self._connections)}")
-        
+        client = _WSClient(websocket, subscription or PreviewSubscription(), self.send_timeout, self._count_sent)
+        self._clients[websocket] = client
+        client.start(self._on_client_done)
+        logger.info(f"WS client connected ({client.subscription}), total: {len(self._clients)}")
+
         # send current brightness to new client
-        try:
-            packet = Packet.make_cmd(CMD_BRIGHTNESS, bytes([self._brightness]), seq=self._seq)
-            self._seq = (self._seq + 1) & 0xFFFF
-            data = packet.pack()
-            if websocket.client_state == WebSocketState.CONNECTED:
-                await websocket.send_bytes(data)
-        except Exception as e:
-            logger.error(f"Error sending initial brightness to WS: {e}")
-    
+        client.put_cmd(CMD_BRIGHTNESS, bytes([self._brightness]))
+
+    def _on_client_done(self, client: _WSClient) -> None:
+        """Задача отправки завершилась (ошибка или таймаут) - забываем клиента"""
+        if self._clients.get(client.websocket) is client:
+            del self._clients[client.websocket]
+            logger.info(f"WS client dropped, total: {len(self._clients)}")
+
     async def remove_connection(self, websocket: WebSocket) -> None:
         """Удаляет WS соединение"""
-        self._connections.discard(websocket)
-        logger.info(f"WS client disconnected, total: {len(self._connections)}")
-    
+        client = self._clients.pop(websocket, None)
+        if client:
+            client.stop()
+            if client.dropped:
+                logger.debug(f"WS client skipped {client.dropped} stale packets")
+        logger.info(f"WS client disconnected, total: {len(self._clients)}")
+
     async def handle_connection(self, websocket: WebSocket) -> None:
-        """Обрабатывает WS соединение"""
-        await self.add_connection(websocket)
+        """Обрабатывает WS соединение, параметры превью берутся из query строки"""
+        try:
+            subscription = PreviewSubscription.from_query(websocket.query_params)
+        except ValueError as e:
+            logger.warning(f"Rejecting WS client with bad subscription: {e}")
+            await websocket.close(code=1008)
+            return
+
+        await self.add_connection(websocket, subscription)
         try:
             while websocket.client_state == WebSocketState.CONNECTED:
                 try:
@@ -144,7 +292,7 @@ class WSTransport(TransportBase):
                     break
         finally:
             await self.remove_connection(websocket)
-    
+
     async def _handle_incoming(self, data: bytes) -> None:
         """Обрабатывает входящие данные от клиента"""
         try:
@@ -158,4 +306,4 @@ class WSTransport(TransportBase):
 
     async def set_brightness(self, brightness: int):
         self._brightness = brightness
-        await self._broadcast_brightness()
\ No newline at end of file
+        await self._broadcast_brightness()
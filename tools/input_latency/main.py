@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Input-to-photon latency benchmark.
+
+Runs the app in-process (real lifespan: main loop, scheduler, driver, UDP transport)
+against the UDP hardware emulator in headless mode as the device. A probe app flips
+the whole matrix between black and white on every input. Each trial injects one input:
+  - button: a BUTTON packet sent by the emulator, as the real device does
+  - api: POST /api/events/emit/ProbeToggle through the ASGI app (middleware included)
+and measures the time until the emulator presents the first frame with the new colour.
+Both ends run in one process and share perf_counter. Trials start at a random phase
+relative to the frame grid.
+
+Usage:
+    python tools/input_latency/main.py [--source button|api] [--trials 100] [--fps 60]
+        [--max-fps 120] [--pipeline 0|2|3] [--thread] [--no-idle] [--json result.json]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+from time import perf_counter
+
+import numpy as np
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "app")
+EMULATOR_PATH = os.path.join(os.path.dirname(__file__), "..", "udp_hw_emulator", "main.py")
+sys.path.insert(0, APP_DIR)
+
+from apps.base import BaseApp  # noqa: E402
+from api.app_commands import register_event_type  # noqa: E402
+from config import GlobalConfig  # noqa: E402
+from models.app_contract import Event  # noqa: E402
+from models.config import (  # noqa: E402
+    SystemConfig, ReactiveFaceConfig, LedStripConfig, VideoPlayerConfig, WebUIConfig
+)
+from render.frame_description import FrameDescription, FillLayer  # noqa: E402
+
+
+PROBE_APP = "latency_probe"
+WHITE = (255, 255, 255, 255)
+BLACK = (0, 0, 0, 255)
+# сколько ждать кадр с новым цветом, дальше попытка считается потерянной
+TRIAL_TIMEOUT = 2.0
+
+
+class ProbeToggle(Event):
+    """Переключает цвет пробы (кнопка устройства или API)"""
+    latency_sensitive = True
+
+
+class LatencyProbeApp(BaseApp):
+    """Весь экран белый или чёрный, каждый ввод меняет цвет"""
+    name = PROBE_APP
+    latency_sensitive = True
+
+    def __init__(self, idle: bool = True):
+        super().__init__()
+        self.idle = idle
+        self.lit = False
+
+    def update(self, dt, events):
+        for event in events:
+            if isinstance(event, ProbeToggle):
+                self.lit = not self.lit
+
+    def button_event(self, button_id):
+        return ProbeToggle()
+
+    def render(self) -> FrameDescription:
+        return FrameDescription(layers=[FillLayer(color=WHITE if self.lit else BLACK)])
+
+    def wake_after(self):
+        return math.inf if self.idle else None
+
+
+class FrameWatcher:
+    """Ловит первый кадр эмулятора с ожидаемым цветом (вызывается из потока приёма)"""
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.presented = threading.Event()
+        self.presented_at = 0.0
+        self._expect_lit = None
+
+    def expect(self, lit: bool) -> None:
+        self.presented.clear()
+        self._expect_lit = lit
+
+    def on_frame(self) -> None:
+        if self._expect_lit is None or self.presented.is_set():
+            return
+        if (self.emulator.matrix_buffer[0] > 127) == self._expect_lit:
+            self.presented_at = perf_counter()
+            self.presented.set()
+
+
+def load_emulator_module():
+    """Эмулятор лежит в tools/udp_hw_emulator/main.py, имя main занято приложением"""
+    spec = importlib.util.spec_from_file_location("udp_hw_emulator", EMULATOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_config(args) -> GlobalConfig:
+    return GlobalConfig(
+        system=SystemConfig(
+            transport=f"udp://127.0.0.1:{args.port}",
+            startup_app=PROBE_APP,
+            target_fps=args.fps,
+            max_fps=args.max_fps,
+            transport_thread=args.thread,
+            pipeline_depth=args.pipeline,
+            idle_mode=not args.no_idle,
+        ),
+        reactive_face=ReactiveFaceConfig(default_preset="default"),
+        led_strip=LedStripConfig(led_number=16),
+        video_player=VideoPlayerConfig(),
+        webui=WebUIConfig(enabled=False),
+    )
+
+
+def summarize(latencies: list[float]) -> dict:
+    samples = np.array(latencies) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": float(samples.mean()),
+        "min_ms": float(samples.min()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "max_ms": float(samples.max()),
+    }
+
+
+async def run(args) -> dict:
+    import dependencies
+    dependencies.config.model = build_config(args)
+    probe = LatencyProbeApp(idle=not args.no_idle)
+    dependencies.app_manager.available_apps[PROBE_APP] = probe
+    register_event_type(ProbeToggle)
+
+    import httpx
+    import main as app_main
+
+    emulator_module = load_emulator_module()
+    emulator = emulator_module.HardwareEmulator(host="127.0.0.1", port=args.port, headless=True)
+    watcher = FrameWatcher(emulator)
+    emulator.on_frame = watcher.on_frame
+    emulator.start_receiver()
+
+    loop = asyncio.get_running_loop()
+    latencies: list[float] = []
+    lost = 0
+    button_seq = 0
+
+    async with app_main.lifespan(app_main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_main.app), base_url="http://bench") as client:
+            # ждём первые кадры, чтобы эмулятор узнал адрес приложения
+            await asyncio.sleep(0.5)
+            if emulator.client_addr is None:
+                raise RuntimeError("No frames from the app, check the transport")
+
+            for _ in range(args.trials):
+                await asyncio.sleep(random.uniform(0.03, 0.08))
+                watcher.expect(not probe.lit)
+                started = perf_counter()
+                if args.source == "button":
+                    emulator.sock.sendto(emulator_module.Packet.make_button(0, seq=button_seq), emulator.client_addr)
+                    button_seq = (button_seq + 1) & 0xFFFF
+                else:
+                    response = await client.post(f"/api/events/emit/{ProbeToggle.__name__}", json={})
+                    response.raise_for_status()
+
+                if await loop.run_in_executor(None, watcher.presented.wait, TRIAL_TIMEOUT):
+                    latencies.append(watcher.presented_at - started)
+                else:
+                    lost += 1
+
+    emulator.stop()
+    return {
+        "config": {
+            "source": args.source,
+            "fps": args.fps,
+            "max_fps": args.max_fps,
+            "pipeline": args.pipeline,
+            "thread": args.thread,
+            "idle": not args.no_idle,
+        },
+        "lost": lost,
+        "latency": summarize(latencies) if latencies else None,
+        "samples_ms": [t * 1000 for t in latencies],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Input-to-photon latency benchmark against the headless emulator")
+    parser.add_argument("--source", choices=("button", "api"), default="button")
+    parser.add_argument("--trials", type=int, default=100)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--max-fps", type=int, default=120, help="0 disables early frames")
+    parser.add_argument("--pipeline", type=int, default=0, help="pipeline depth, 0 or 2..3")
+    parser.add_argument("--thread", action="store_true", help="transport worker thread")
+    parser.add_argument("--no-idle", action="store_true", help="probe animates, main loop never idles")
+    parser.add_argument("--port", type=int, default=5599, help="emulator UDP port")
+    parser.add_argument("--json", help="write config, summary and samples to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    os.chdir(APP_DIR)  # приложения грузят ассеты относительно app/
+    result = asyncio.run(run(args))
+
+    config = ", ".join(f"{key}={value}" for key, value in result["config"].items())
+    print(f"input -> photon ({config})")
+    if result["latency"]:
+        for key, value in result["latency"].items():
+            print(f"  {key:8s} {value:8.2f}" if key != "count" else f"  {key:8s} {value:8d}")
+    print(f"  lost     {result['lost']:8d}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
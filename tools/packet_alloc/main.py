@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Allocation meter for the frame send path (Driver -> UDPTransport -> sendto).
+
+Runs ticks through the real Driver and UDPTransport with a datagram transport
+that drops packets, and reports per tick with tracemalloc (numpy buffers included):
+  - peak: largest amount of memory allocated on top of the baseline during the tick
+  - net: memory still held after the tick (should be 0 in steady state)
+The legacy path (Frame.to_bytes + header/payload concatenation) is measured
+next to it for comparison, and "raw" shows the packet builder alone without RLE.
+The RLE encoder works in preallocated per-thread scratch arrays, so "driver" should
+stay within a few KB of "raw" (numpy views and iterator buffers, not frame-sized).
+
+Usage:
+    python tools/packet_alloc/main.py [ticks]
+"""
+
+import asyncio
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "app"))
+
+from render.frame import Frame  # noqa: E402
+from transport.driver import Driver  # noqa: E402
+from transport.proto import EncodedFrame, PacketBuilder, TYPE_FRAME  # noqa: E402
+
+
+MATRIX_WIDTH = 128
+MATRIX_HEIGHT = 32
+
+
+class AllocationMeter:
+    """Пиковые и оставшиеся аллокации за тик через tracemalloc"""
+
+    def __init__(self):
+        self.peaks: list[int] = []
+        self.nets: list[int] = []
+        self._start = 0
+
+    def __enter__(self) -> 'AllocationMeter':
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        tracemalloc.stop()
+
+    def begin_tick(self) -> None:
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def end_tick(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        self.peaks.append(peak - self._start)
+        self.nets.append(current - self._start)
+
+    def summary(self, warmup: int) -> str:
+        peaks = np.array(self.peaks[warmup:])
+        nets = np.array(self.nets[warmup:])
+        return f"peak {int(np.median(peaks)):>7} B/tick (max {int(peaks.max()):>7})  net {int(np.median(nets)):>5} B/tick"
+
+
+class _NullDatagramTransport:
+    def sendto(self, data, addr=None) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def build_frames() -> dict[str, Frame]:
+    rng = np.random.default_rng(0)
+    frames = {}
+    for name in ("black", "face", "noise"):
+        frame = Frame(MATRIX_WIDTH, MATRIX_HEIGHT)
+        if name == "face":
+            frame.pixels[8:24, 16:48] = (255, 0, 128)
+            frame.pixels[8:24, 80:112] = (255, 0, 128)
+            frame.pixels[26:28, 40:88] = (0, 200, 255)
+        elif name == "noise":
+            frame.pixels[:] = rng.integers(0, 256, frame.pixels.shape, dtype=np.uint8)
+        frames[name] = frame
+    return frames
+
+
+def make_driver() -> Driver:
+    driver = Driver()
+    driver.init_from_config("udp://127.0.0.1:5555")
+    driver.transport._transport = _NullDatagramTransport()
+    return driver
+
+
+async def run_driver(frame: Frame, ticks: int, warmup: int) -> str:
+    driver = make_driver()
+    with AllocationMeter() as meter:
+        for _ in range(ticks):
+            meter.begin_tick()
+            await driver.display_frame(frame)
+            meter.end_tick()
+    return meter.summary(warmup)
+
+
+def run_legacy(frame: Frame, ticks: int, warmup: int) -> str:
+    sink = _NullDatagramTransport()
+    with AllocationMeter() as meter:
+        for seq in range(ticks):
+            meter.begin_tick()
+            encoded = EncodedFrame(TYPE_FRAME, seq, frame.to_bytes())
+            sink.sendto(encoded.pack(seq))
+            del encoded
+            meter.end_tick()
+    return meter.summary(warmup)
+
+
+def run_builder_raw(frame: Frame, ticks: int, warmup: int) -> str:
+    """Только сборка пакета без RLE: снимок в готовый буфер и pack_into"""
+    sink = _NullDatagramTransport()
+    builder = PacketBuilder()
+    snapshot = np.empty_like(frame.pixels)
+    pixels = memoryview(snapshot).cast('B')
+    with AllocationMeter() as meter:
+        for seq in range(ticks):
+            meter.begin_tick()
+            np.copyto(snapshot, frame.pixels)
+            sink.sendto(EncodedFrame(TYPE_FRAME, seq, pixels, compress=False).pack_into(builder, seq))
+            meter.end_tick()
+    return meter.summary(warmup)
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    warmup = min(10, ticks // 2)
+
+    for name, frame in build_frames().items():
+        print(f"{name:<6} legacy  {run_legacy(frame, ticks, warmup)}")
+        print(f"{name:<6} driver  {asyncio.run(run_driver(frame, ticks, warmup))}")
+        print(f"{name:<6} raw     {run_builder_raw(frame, ticks, warmup)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Headless deterministic replay benchmark for the render path.
+
+Drives AppManager, the app itself, Renderer (with EffectManager effects), TransitionEngine,
+DisplayManager and LED strip generation exactly like the main loop does, but without FastAPI,
+transport or frame pacing: every frame gets the same fixed dt and the next frame starts as
+soon as the previous one is done. A script of timed app switches, events and effects is
+replayed on top (simulated time, so the same frames are rendered on every run).
+
+Reports per app: frames, achieved fps, per-stage timings (p50/p95/p99/max) and per-frame
+values such as the repainted area (dirty_px), plus a CRC of all output frames so a change
+in rendered output is visible next to the speed change.
+Global random generators are seeded; effects take their own seed from the script.
+WiggleEffect decides "same frame" by wall time, so its output is not reproducible here.
+
+Script (JSON): {"fps": 60, "duration": 20.0, "steps": [
+    {"at": 0.0, "app": "snake"},
+    {"at": 0.5, "event": "MoveSnake", "payload": {"direction": 3}},
+    {"at": 1.0, "effect": "Shake", "params": {"amplitude": 2.0, "seed": 1}},
+    {"at": 3.0, "clear_effects": true}]}
+
+Usage:
+    python tools/replay_bench/main.py [--script script.json] [--repeat 3] [--json result.json]
+        [--baseline baseline.json [--tolerance 0.15] [--check-output]]
+
+--repeat runs the replay in fresh processes (apps keep state between runs) and keeps
+the fastest run per app, which filters out scheduler noise.
+
+With --baseline exits with code 1 if any app is slower than the baseline by more than
+--tolerance (and, with --check-output, if its rendered output differs).
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import zlib
+from time import perf_counter
+
+import numpy as np
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from config import GlobalConfig  # noqa: E402
+from models.config import (  # noqa: E402
+    SystemConfig, ReactiveFaceConfig, LedStripConfig, VideoPlayerConfig, WebUIConfig
+)
+
+
+SEED = 1234
+LED_COUNT = 16
+
+DEFAULT_SCRIPT = {
+    "fps": 60,
+    "duration": 40.0,
+    "steps": [
+        {"at": 0.0, "app": "snake"},
+        {"at": 0.5, "event": "MoveSnake", "payload": {"direction": 3}},
+        {"at": 1.5, "event": "MoveSnake", "payload": {"direction": 1}},
+        {"at": 2.0, "effect": "Rainbow", "params": {"speed": 1.0}},
+        {"at": 5.0, "clear_effects": True},
+        {"at": 8.0, "app": "pong"},
+        {"at": 9.0, "event": "MovePlayer", "payload": {"player_id": 1, "direction": 1}},
+        {"at": 10.0, "effect": "Shake", "params": {"amplitude": 2.0, "seed": 1}},
+        {"at": 13.0, "clear_effects": True},
+        {"at": 16.0, "app": "flappy_bird"},
+        {"at": 16.5, "event": "Flap"},
+        {"at": 17.5, "event": "Flap"},
+        {"at": 18.5, "effect": "Dizzy"},
+        {"at": 21.0, "clear_effects": True},
+        {"at": 24.0, "app": "dino_game"},
+        {"at": 25.0, "event": "JumpEvent"},
+        {"at": 27.0, "effect": "ColorOverride", "params": {"base_color": [0, 200, 255], "seed": 2}},
+        {"at": 30.0, "clear_effects": True},
+        {"at": 32.0, "app": "bsod"},
+    ],
+}
+
+
+def build_config(script: dict) -> GlobalConfig:
+    return GlobalConfig(
+        system=SystemConfig(
+            transport="udp://127.0.0.1:5555",  # не используется, транспорт не запускается
+            startup_app=script["steps"][0].get("app", ""),
+            target_fps=script.get("fps", 60),
+            idle_mode=False,
+        ),
+        reactive_face=ReactiveFaceConfig(default_preset="default"),
+        led_strip=LedStripConfig(led_number=LED_COUNT),
+        video_player=VideoPlayerConfig(),
+        webui=WebUIConfig(enabled=False),
+    )
+
+
+class AppStats:
+    """Замеры кадров одного приложения за весь прогон"""
+
+    def __init__(self):
+        from metrics import FrameMetrics
+        self.metrics = FrameMetrics(enabled=True)
+        self.frames = 0
+        self.busy = 0.0  # суммарное время кадров
+        self.crc = 0
+
+    def frame_done(self, frame, started: float) -> None:
+        self.busy += perf_counter() - started
+        self.frames += 1
+        self.crc = zlib.crc32(frame.pixels.tobytes(), self.crc)
+
+    def summary(self) -> dict:
+        return {
+            "frames": self.frames,
+            "fps": self.frames / self.busy if self.busy else 0.0,
+            "frame_crc": f"{self.crc:08x}",
+            **{key: value for key, value in self.metrics.summary().items() if key in ("stages", "values")},
+        }
+
+
+def replay(script: dict) -> dict:
+    import dependencies
+    dependencies.config.model = build_config(script)
+
+    from api.app_commands import get_event_class
+    from app_frame import render_app_frame
+    from dependencies import app_manager, effect_manager, transition_engine, display_manager
+    from render.led_strip import generate_led_strip_pixels
+
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+    fps = script.get("fps", 60)
+    dt = 1.0 / fps
+    total_frames = round(script["duration"] * fps)
+    steps = sorted(script["steps"], key=lambda step: step["at"])
+    pending = 0
+    stats: dict[str, AppStats] = {}
+    started_run = perf_counter()
+
+    for index in range(total_frames):
+        events = []
+        while pending < len(steps) and round(steps[pending]["at"] * fps) <= index:
+            step = steps[pending]
+            pending += 1
+            if "app" in step:
+                if not app_manager.set_active_app_by_name(step["app"], step.get("transition", True)):
+                    raise ValueError(f"App '{step['app']}' is not available: {app_manager.get_available_app_names()}")
+            elif "event" in step:
+                event_class = get_event_class(step["event"])
+                if event_class is None:
+                    raise ValueError(f"Event '{step['event']}' not found")
+                events.append(event_class.model_validate(step.get("payload", {})))
+            elif "effect" in step:
+                effect_manager.add_effect_by_name(step["effect"], **step.get("params", {}))
+            elif step.get("clear_effects"):
+                effect_manager.clear_effects()
+
+        started = perf_counter()
+        app_manager._apply_pending_app()
+        app = app_manager.get_current_app()
+        if app is None:
+            continue
+        app_stats = stats.setdefault(app.name, AppStats())
+        timer = app_stats.metrics.frame_timer()
+
+        timer.lap("events")
+        app.update(dt, events)
+        timer.lap("app_update")
+        frame, rainbow_effect = render_app_frame(app, dt, timer)
+        if frame is None:
+            continue
+        frame = transition_engine.process(frame, dt)
+        timer.lap("transition")
+        app_manager.save_last_frame(frame)
+        frame = display_manager.process_frame(frame)
+        timer.lap("display_manager")
+        generate_led_strip_pixels(LED_COUNT, frame, rainbow_effect)
+        timer.lap("led_generate")
+        timer.finish()
+        app_stats.frame_done(frame, started)
+
+    return {
+        "fps": fps,
+        "frames": total_frames,
+        "wall_time": perf_counter() - started_run,
+        "apps": {name: app_stats.summary() for name, app_stats in stats.items()},
+    }
+
+
+def replay_repeated(script: dict, repeat: int) -> dict:
+    """Лучший по fps прогон каждого приложения из repeat прогонов в отдельных процессах"""
+    best = None
+    with tempfile.TemporaryDirectory() as tmp:
+        script_path = os.path.join(tmp, "script.json")
+        with open(script_path, "w") as f:
+            json.dump(script, f)
+        for run in range(repeat):
+            result_path = os.path.join(tmp, f"run{run}.json")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--script", script_path,
+                            "--json", result_path, "--quiet"], check=True)
+            with open(result_path) as f:
+                result = json.load(f)
+            if best is None:
+                best = result
+                continue
+            best["wall_time"] = min(best["wall_time"], result["wall_time"])
+            for name, app in result["apps"].items():
+                if app["fps"] > best["apps"][name]["fps"]:
+                    best["apps"][name] = app
+    return best
+
+
+def compare(result: dict, baseline: dict, tolerance: float, check_output: bool) -> list[str]:
+    """Список регрессий относительно baseline (пустой - всё в порядке)"""
+    problems = []
+    for name, base in baseline["apps"].items():
+        current = result["apps"].get(name)
+        if current is None:
+            problems.append(f"{name}: missing from this run")
+            continue
+        if current["fps"] < base["fps"] * (1 - tolerance):
+            problems.append(f"{name}: {current['fps']:.0f} fps, baseline {base['fps']:.0f} fps")
+        if check_output and current["frame_crc"] != base["frame_crc"]:
+            problems.append(f"{name}: output differs from baseline")
+    return problems
+
+
+def print_result(result: dict, baseline: dict | None) -> None:
+    print(f"{result['frames']} frames at dt=1/{result['fps']}, {result['wall_time']:.2f} s")
+    for name, app in result["apps"].items():
+        line = f"{name:14s} {app['frames']:6d} frames {app['fps']:8.0f} fps  crc {app['frame_crc']}"
+        base = baseline["apps"].get(name) if baseline else None
+        if base:
+            change = (app["fps"] / base["fps"] - 1) * 100 if base["fps"] else 0.0
+            same = "same output" if app["frame_crc"] == base["frame_crc"] else "output differs"
+            line += f"  ({change:+.1f}% vs baseline, {same})"
+        print(line)
+        for stage, summary in app["stages"].items():
+            if summary["count"]:
+                print(f"    {stage:16s} p50 {summary['p50_ms']:7.3f}  p95 {summary['p95_ms']:7.3f}  "
+                      f"max {summary['max_ms']:7.3f} ms")
+        for name, summary in app.get("values", {}).items():
+            if summary["count"]:
+                print(f"    {name:16s} p50 {summary['p50']:7.0f}  p95 {summary['p95']:7.0f}  "
+                      f"mean {summary['mean']:7.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless deterministic replay benchmark of the render path")
+    parser.add_argument("--script", help="replay script (JSON), built-in tour of the apps by default")
+    parser.add_argument("--repeat", type=int, default=1, help="runs in fresh processes, best fps per app is kept")
+    parser.add_argument("--quiet", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="write the result to this file (use it as a baseline later)")
+    parser.add_argument("--baseline", help="compare with a previous --json result")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed fps drop vs baseline (fraction)")
+    parser.add_argument("--check-output", action="store_true", help="fail if rendered frames differ from baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR if args.quiet else logging.WARNING)
+    paths = {name: os.path.abspath(path) for name, path in
+             (("script", args.script), ("json", args.json), ("baseline", args.baseline)) if path}
+
+    script = DEFAULT_SCRIPT
+    if "script" in paths:
+        with open(paths["script"]) as f:
+            script = json.load(f)
+    baseline = None
+    if "baseline" in paths:
+        with open(paths["baseline"]) as f:
+            baseline = json.load(f)
+
+    if args.repeat > 1:
+        result = replay_repeated(script, args.repeat)
+    else:
+        os.chdir(APP_DIR)  # приложения грузят ассеты относительно app/
+        result = replay(script)
+    if not args.quiet:
+        print_result(result, baseline)
+
+    if "json" in paths:
+        with open(paths["json"], "w") as f:
+            json.dump(result, f, indent=2)
+
+    if baseline:
+        problems = compare(result, baseline, args.tolerance, args.check_output)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
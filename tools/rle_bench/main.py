@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Equivalence check and microbenchmark for the vectorized RLE codec in app/transport/proto.py.
+
+Compares rle_encode/rle_decode byte-for-byte against the original pure Python
+implementation (kept below as reference) on synthetic and edge-case frames,
+then times both on typical 128x32 frames (best of TIMING_REPEATS runs).
+
+Fails if the output differs or if rle_decode is slower than the reference decoder
+by more than DECODE_TOLERANCE on any benchmarked frame.
+
+Usage:
+    python tools/rle_bench/main.py [iterations]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "app"))
+
+from transport.proto import rle_encode, rle_decode  # noqa: E402
+
+
+MATRIX_WIDTH = 128
+MATRIX_HEIGHT = 32
+
+TIMING_REPEATS = 5
+# rle_decode должен быть не медленнее эталона (с запасом на шум замеров)
+DECODE_TOLERANCE = 0.2
+
+
+# ---- reference implementation (protocol v4 encoder before vectorization) ----
+
+def reference_rle_encode(pixels: bytes) -> bytes:
+    """
+    RLE сжатие RGB888 пикселей.
+    Формат:
+    - control byte: старший бит = тип (1=run, 0=literal), младшие 7 бит = длина-1
+    - run: 3 байта RGB повторяются (control & 0x7F) + 1 раз
+    - literal: следующие ((control & 0x7F) + 1) * 3 байт - сырые пиксели
+    """
+    if len(pixels) == 0 or len(pixels) % 3 != 0:
+        return pixels
+    
+    result = bytearray()
+    pixel_count = len(pixels) // 3
+    i = 0
+    
+    while i < pixel_count:
+        r, g, b = pixels[i*3], pixels[i*3+1], pixels[i*3+2]
+        
+        # считаем сколько одинаковых пикселей подряд
+        run_length = 1
+        while (i + run_length < pixel_count and 
+               run_length < 128 and
+               pixels[(i + run_length)*3] == r and
+               pixels[(i + run_length)*3 + 1] == g and
+               pixels[(i + run_length)*3 + 2] == b):
+            run_length += 1
+        
+        if run_length >= 3:
+            # выгодно использовать run
+            control = 0x80 | (run_length - 1)
+            result.append(control)
+            result.extend([r, g, b])
+            i += run_length
+        else:
+            # собираем литералы пока не встретим серию >= 3
+            literal_start = i
+            literal_count = 0
+            
+            while i < pixel_count and literal_count < 128:
+                r2, g2, b2 = pixels[i*3], pixels[i*3+1], pixels[i*3+2]
+                run_ahead = 1
+                while (i + run_ahead < pixel_count and 
+                       run_ahead < 128 and
+                       pixels[(i + run_ahead)*3] == r2 and
+                       pixels[(i + run_ahead)*3 + 1] == g2 and
+                       pixels[(i + run_ahead)*3 + 2] == b2):
+                    run_ahead += 1
+                
+                if run_ahead >= 3 and literal_count > 0:
+                    break
+                
+                literal_count += 1
+                i += 1
+            
+            if literal_count > 0:
+                control = (literal_count - 1)
+                result.append(control)
+                result.extend(pixels[literal_start*3 : (literal_start + literal_count)*3])
+    
+    return bytes(result)
+
+
+def reference_rle_decode(data: bytes, expected_pixels: int) -> bytes:
+    """Декодирование RLE сжатых RGB888 пикселей."""
+    result = bytearray()
+    expected_bytes = expected_pixels * 3
+    read_offset = 0
+    
+    while read_offset < len(data) and len(result) < expected_bytes:
+        control = data[read_offset]
+        read_offset += 1
+        
+        is_run = (control & 0x80) != 0
+        count = (control & 0x7F) + 1
+        
+        if is_run:
+            if read_offset + 3 > len(data):
+                break
+            r, g, b = data[read_offset], data[read_offset+1], data[read_offset+2]
+            read_offset += 3
+            for _ in range(count):
+                result.extend([r, g, b])
+        else:
+            literal_bytes = count * 3
+            if read_offset + literal_bytes > len(data):
+                break
+            result.extend(data[read_offset:read_offset + literal_bytes])
+            read_offset += literal_bytes
+    
+    return bytes(result)
+
+
+# ---- corpus ----
+
+def _runs_frame(rng: np.random.Generator, pixel_count: int, max_run: int) -> bytes:
+    """Frame built from random-length runs of random colors"""
+    out = []
+    total = 0
+    while total < pixel_count:
+        length = min(int(rng.integers(1, max_run + 1)), pixel_count - total)
+        color = rng.integers(0, 256, 3, dtype=np.uint8)
+        out.append(np.tile(color, (length, 1)))
+        total += length
+    return np.concatenate(out).tobytes()
+
+
+def build_corpus(seed: int = 1234) -> dict[str, bytes]:
+    rng = np.random.default_rng(seed)
+    n = MATRIX_WIDTH * MATRIX_HEIGHT
+    corpus = {
+        "empty": b"",
+        "black": bytes(n * 3),
+        "noise": rng.integers(0, 256, n * 3, dtype=np.uint8).tobytes(),
+        "gradient": np.repeat(np.arange(n) % 256, 3).astype(np.uint8).tobytes(),
+        "few_colors": rng.integers(0, 2, n * 3, dtype=np.uint8).tobytes(),
+        "led_strip": rng.integers(0, 256, 16 * 3, dtype=np.uint8).tobytes(),
+        "unaligned": b"\x01\x02\x03\x04",
+    }
+
+    # sprite-like frame: black background with a few solid blocks
+    face = np.zeros((MATRIX_HEIGHT, MATRIX_WIDTH, 3), dtype=np.uint8)
+    face[8:14, 10:30] = (255, 255, 255)
+    face[8:14, 98:118] = (255, 255, 255)
+    face[22:26, 40:88] = (255, 80, 120)
+    corpus["face"] = face.tobytes()
+
+    # short runs mixed with literals: many small blocks, worst case for per-block work
+    corpus["short_runs"] = _runs_frame(rng, n, 4)
+
+    # every run length around the 3-pixel threshold and the 128-pixel block limit
+    for length in (1, 2, 3, 4, 127, 128, 129, 130, 131, 255, 256, 257, 258, 259, 383, 384, 385):
+        a = np.tile([1, 2, 3], (length, 1))
+        b = np.tile([9, 9, 9], (2, 1))
+        c = np.tile([7, 8, 9], (1, 1))
+        corpus[f"run_{length}"] = np.concatenate([a, b, c, a]).astype(np.uint8).tobytes()
+
+    for i in range(200):
+        max_run = (1, 2, 3, 4, 8, 64, 300)[i % 7]
+        size = n if i % 2 == 0 else int(rng.integers(1, 600))
+        corpus[f"random_{i}"] = _runs_frame(rng, size, max_run)
+
+    return corpus
+
+
+def check_equivalence(corpus: dict[str, bytes]) -> int:
+    failures = 0
+    for name, pixels in corpus.items():
+        expected = reference_rle_encode(pixels)
+        actual = rle_encode(pixels)
+        if actual != expected:
+            print(f"FAIL encode {name}: {len(actual)} bytes vs reference {len(expected)}")
+            failures += 1
+            continue
+
+        if len(pixels) % 3:
+            continue
+        pixel_count = len(pixels) // 3
+        decoded = rle_decode(expected, pixel_count)
+        if decoded != reference_rle_decode(expected, pixel_count) or decoded != pixels:
+            print(f"FAIL decode {name}")
+            failures += 1
+
+        # truncated streams must stop at the same block boundary
+        for cut in (1, 4, len(expected) // 2, len(expected) - 1):
+            if 0 < cut < len(expected):
+                if rle_decode(expected[:cut], pixel_count) != reference_rle_decode(expected[:cut], pixel_count):
+                    print(f"FAIL decode truncated {name} at {cut}")
+                    failures += 1
+
+        # expected_pixels smaller than the stream stops after the covering block
+        short = max(1, pixel_count // 3)
+        if rle_decode(expected, short) != reference_rle_decode(expected, short):
+            print(f"FAIL decode short {name}")
+            failures += 1
+
+    return failures
+
+
+def _time(fn, arg, iterations: int) -> float:
+    """Лучшее среднее время вызова в мс из TIMING_REPEATS прогонов"""
+    best = float("inf")
+    for _ in range(TIMING_REPEATS):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(*arg)
+        best = min(best, (time.perf_counter() - start) / iterations * 1000.0)
+    return best
+
+
+def benchmark(corpus: dict[str, bytes], iterations: int) -> int:
+    """Печатает замеры, возвращает число кадров, где rle_decode медленнее эталона"""
+    slow = 0
+    print(f"{'frame':<12} {'ref enc ms':>11} {'enc ms':>8} {'ref dec ms':>11} {'dec ms':>8} {'bytes':>7}")
+    for name in ("black", "face", "few_colors", "gradient", "noise", "short_runs"):
+        pixels = corpus[name]
+        pixel_count = len(pixels) // 3
+        encoded = rle_encode(pixels)
+        ref_enc = _time(reference_rle_encode, (pixels,), iterations)
+        enc = _time(rle_encode, (pixels,), iterations)
+        ref_dec = _time(reference_rle_decode, (encoded, pixel_count), iterations)
+        dec = _time(rle_decode, (encoded, pixel_count), iterations)
+        line = f"{name:<12} {ref_enc:>11.3f} {enc:>8.3f} {ref_dec:>11.3f} {dec:>8.3f} {len(encoded):>7}"
+        if dec > ref_dec * (1 + DECODE_TOLERANCE):
+            line += "  SLOW decode"
+            slow += 1
+        print(line)
+    return slow
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    corpus = build_corpus()
+    failures = check_equivalence(corpus)
+    if failures:
+        print(f"{failures} mismatches")
+        sys.exit(1)
+    print(f"Equivalence OK on {len(corpus)} inputs")
+
+    slow = benchmark(corpus, iterations)
+    if slow:
+        print(f"rle_decode slower than the reference on {slow} frames")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
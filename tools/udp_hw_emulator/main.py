@@ -4,10 +4,14 @@ import sys
 import struct
 import socket
 import threading
-from typing import Optional
+import time
+from typing import Callable, Optional
 from dataclasses import dataclass
 
-import pygame
+try:
+    import pygame
+except ImportError:  # headless mode (benchmarks) works without pygame
+    pygame = None
 
 
 # Protocol constants
@@ -19,8 +23,14 @@ TYPE_FRAME = 0x02
 TYPE_INFO = 0x03
 TYPE_LED_STRIP_FRAME = 0x05
 TYPE_BUTTON = 0x06
+TYPE_FRAME_DELTA = 0x07
+TYPE_KEYFRAME_REQUEST = 0x08
+TYPE_FRAME_TILE = 0x09
 
 FRAME_FLAG_COMPRESSED = 1 << 0
+FRAME_FLAG_RGB565 = 1 << 1
+FRAME_FLAG_PALETTE = 1 << 2
+PALETTE_4BIT_COLORS = 16
 
 CMD_BRIGHTNESS = 0x01
 
@@ -28,6 +38,17 @@ MATRIX_WIDTH = 128
 MATRIX_HEIGHT = 32
 LED_STRIP_MAX = 16
 
+DELTA_TILE_WIDTH = 16
+DELTA_TILE_HEIGHT = 8
+DELTA_TILES_X = MATRIX_WIDTH // DELTA_TILE_WIDTH
+DELTA_TILES_Y = MATRIX_HEIGHT // DELTA_TILE_HEIGHT
+
+# a tiled frame is shown partially if not all tiles arrive in time
+TILE_DEADLINE = 0.05
+
+# packets sharing the host's main sequence counter (LED strip has its own)
+MAIN_SEQ_TYPES = (TYPE_CMD, TYPE_FRAME, TYPE_FRAME_DELTA, TYPE_FRAME_TILE)
+
 
 def crc8(data: bytes) -> int:
     """CRC-8 (poly 0x07) - SMBus variant"""
@@ -42,10 +63,10 @@ def crc8(data: bytes) -> int:
     return crc
 
 
-def rle_decode(data: bytes, expected_pixels: int) -> bytes:
-    """Decodes RLE compressed RGB888 pixels"""
+def rle_decode(data: bytes, expected_pixels: int, unit: int = 3) -> bytes:
+    """Decodes RLE compressed pixels of `unit` bytes (RGB888 by default)"""
     result = bytearray()
-    expected_bytes = expected_pixels * 3
+    expected_bytes = expected_pixels * unit
     read_offset = 0
     
     while read_offset < len(data) and len(result) < expected_bytes:
@@ -56,14 +77,13 @@ def rle_decode(data: bytes, expected_pixels: int) -> bytes:
         count = (control & 0x7F) + 1
         
         if is_run:
-            if read_offset + 3 > len(data):
+            if read_offset + unit > len(data):
                 break
-            r, g, b = data[read_offset], data[read_offset+1], data[read_offset+2]
-            read_offset += 3
-            for _ in range(count):
-                result.extend([r, g, b])
+            value = data[read_offset:read_offset + unit]
+            read_offset += unit
+            result.extend(value * count)
         else:
-            literal_bytes = count * 3
+            literal_bytes = count * unit
             if read_offset + literal_bytes > len(data):
                 break
             result.extend(data[read_offset:read_offset + literal_bytes])
@@ -72,6 +92,42 @@ def rle_decode(data: bytes, expected_pixels: int) -> bytes:
     return bytes(result)
 
 
+def decode_frame_pixels(frame_flags: int, data: bytes, pixel_count: int) -> bytes:
+    """Decodes FRAME pixel data (RGB888, RGB565 or palette, optionally RLE) to RGB888"""
+    if frame_flags & FRAME_FLAG_PALETTE:
+        color_count = data[0] + 1
+        palette_end = 1 + color_count * 3
+        palette = [data[1 + i * 3:4 + i * 3] for i in range(color_count)]
+        index_data = data[palette_end:]
+        four_bit = color_count <= PALETTE_4BIT_COLORS
+        packed_count = (pixel_count + 1) // 2 if four_bit else pixel_count
+        if frame_flags & FRAME_FLAG_COMPRESSED:
+            index_data = rle_decode(index_data, packed_count, unit=1)
+        result = bytearray()
+        for i in range(pixel_count):
+            if four_bit:
+                byte = index_data[i // 2]
+                index = (byte >> 4) if i % 2 == 0 else (byte & 0x0F)
+            else:
+                index = index_data[i]
+            result.extend(palette[index])
+        return bytes(result)
+
+    if frame_flags & FRAME_FLAG_RGB565:
+        if frame_flags & FRAME_FLAG_COMPRESSED:
+            data = rle_decode(data, pixel_count, unit=2)
+        result = bytearray()
+        for i in range(0, len(data) - 1, 2):
+            value = data[i] | (data[i + 1] << 8)
+            r, g, b = (value >> 11) & 0x1F, (value >> 5) & 0x3F, value & 0x1F
+            result.extend(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)))
+        return bytes(result)
+
+    if frame_flags & FRAME_FLAG_COMPRESSED:
+        return rle_decode(data, pixel_count)
+    return data
+
+
 @dataclass
 class Packet:
     """UDP protocol packet (v4)"""
@@ -123,19 +179,34 @@ class Packet:
     def make_button(cls, button_id: int, seq: int = 0) -> bytes:
         """Creates a BUTTON packet"""
         payload = struct.pack('B', button_id)
-        
-        header_without_crc = struct.pack('<HBBHH', SYNC, PROTOCOL_VERSION, TYPE_BUTTON, len(payload), seq)
+        return cls._pack(TYPE_BUTTON, payload, seq)
+    
+    @classmethod
+    def make_keyframe_request(cls, last_frame_id: int, seq: int = 0) -> bytes:
+        """Creates a KEYFRAME_REQUEST packet"""
+        payload = struct.pack('<H', last_frame_id)
+        return cls._pack(TYPE_KEYFRAME_REQUEST, payload, seq)
+    
+    @staticmethod
+    def _pack(ptype: int, payload: bytes, seq: int) -> bytes:
+        header_without_crc = struct.pack('<HBBHH', SYNC, PROTOCOL_VERSION, ptype, len(payload), seq)
         header_crc = crc8(header_without_crc)
         
         return header_without_crc + struct.pack('B', header_crc) + payload
 
 
 class HardwareEmulator:
-    """Hardware emulator with GUI"""
+    """
+    Hardware emulator with GUI.
+    headless=True skips the window: packets are still decoded into the buffers,
+    on_frame is called after every presented matrix frame (from the receiver thread).
+    """
     
-    def __init__(self, host: str = "0.0.0.0", port: int = 5555):
+    def __init__(self, host: str = "0.0.0.0", port: int = 5555, headless: bool = False,
+                 on_frame: Optional[Callable[[], None]] = None):
         self.host = host
         self.port = port
+        self.on_frame = on_frame
         self.sock: Optional[socket.socket] = None
         self.running = False
         self.client_addr: Optional[tuple] = None
@@ -147,7 +218,27 @@ class HardwareEmulator:
         self.brightness = 255
         self.button_seq = 0
         
-        # GUI
+        # Delta frame state
+        self.frame_id: Optional[int] = None  # id of the frame currently in matrix_buffer
+        self.last_seq: Optional[int] = None
+        self.delta_frames = 0
+        self.keyframe_requests = 0
+        
+        # Tiled frame assembly
+        self.tile_frame_id: Optional[int] = None
+        self.tile_buffer = bytearray(MATRIX_WIDTH * MATRIX_HEIGHT * 3)
+        self.tiles_received: set[int] = set()
+        self.tile_count = 0
+        self.tile_deadline = 0.0
+        self.partial_frames = 0
+        
+        if not headless:
+            self._init_gui()
+    
+    def _init_gui(self):
+        """Creates the window"""
+        if pygame is None:
+            raise RuntimeError("pygame is required for the GUI, install it or run headless")
         pygame.init()
         
         # Window dimensions
@@ -202,6 +293,12 @@ class HardwareEmulator:
         # Draw button
         self._draw_button()
         
+        # Delta frame stats
+        delta_text = (f"Delta frames: {self.delta_frames}  Keyframe requests: {self.keyframe_requests}"
+                      f"  Partial tiled frames: {self.partial_frames}")
+        delta = self.small_font.render(delta_text, True, (200, 200, 200))
+        self.screen.blit(delta, (self.padding, self.button_rect.bottom + 30))
+        
         # Brightness
         brightness_text = f"Brightness: {self.brightness}"
         brightness = self.small_font.render(brightness_text, True, (200, 200, 200))
@@ -291,10 +388,42 @@ class HardwareEmulator:
         except Exception as e:
             print(f"Error sending button event: {e}")
     
+    def request_keyframe(self, reason: str):
+        """Asks the host to send a full frame"""
+        if not self.client_addr:
+            return
+        
+        packet = Packet.make_keyframe_request(self.frame_id or 0, seq=self.button_seq)
+        self.button_seq = (self.button_seq + 1) & 0xFFFF
+        self.keyframe_requests += 1
+        
+        try:
+            self.sock.sendto(packet, self.client_addr)
+            print(f"Keyframe requested: {reason}")
+        except Exception as e:
+            print(f"Error sending keyframe request: {e}")
+    
+    def _check_seq(self, packet: Packet) -> bool:
+        """Tracks the main sequence counter, returns False on a gap"""
+        if packet.ptype not in MAIN_SEQ_TYPES:
+            return True
+        
+        expected = None if self.last_seq is None else (self.last_seq + 1) & 0xFFFF
+        self.last_seq = packet.seq
+        return expected is None or packet.seq == expected
+    
     def process_packet(self, packet: Packet):
         """Processes received packet"""
+        if not self._check_seq(packet):
+            # a lost packet may have been a frame the next delta is based on
+            self.frame_id = None
+        
         if packet.ptype == TYPE_FRAME:
             self._process_frame(packet)
+        elif packet.ptype == TYPE_FRAME_DELTA:
+            self._process_frame_delta(packet)
+        elif packet.ptype == TYPE_FRAME_TILE:
+            self._process_frame_tile(packet)
         elif packet.ptype == TYPE_LED_STRIP_FRAME:
             self._process_led_strip(packet)
         elif packet.ptype == TYPE_CMD:
@@ -307,12 +436,11 @@ class HardwareEmulator:
             return
         
         frame_id, frame_flags = struct.unpack('<HB', packet.payload[:3])
-        pixel_data = packet.payload[3:]
-        
-        if frame_flags & FRAME_FLAG_COMPRESSED:
-            pixels = rle_decode(pixel_data, MATRIX_WIDTH * MATRIX_HEIGHT)
-        else:
-            pixels = pixel_data
+        try:
+            pixels = decode_frame_pixels(frame_flags, packet.payload[3:], MATRIX_WIDTH * MATRIX_HEIGHT)
+        except IndexError:
+            print("Frame pixel data truncated")
+            return
         
         expected_size = MATRIX_WIDTH * MATRIX_HEIGHT * 3
         if len(pixels) != expected_size:
@@ -320,6 +448,105 @@ class HardwareEmulator:
             return
         
         self.matrix_buffer[:] = pixels
+        self.frame_id = frame_id
+        self._frame_presented()
+    
+    def _frame_presented(self):
+        if self.on_frame:
+            self.on_frame()
+    
+    def _process_frame_delta(self, packet: Packet):
+        """Processes delta frame packet: only changed 16x8 tiles"""
+        if len(packet.payload) < 9:
+            print("Frame delta payload too short")
+            return
+        
+        frame_id, frame_flags, base_id, tile_mask = struct.unpack('<HBHI', packet.payload[:9])
+        tile_data = packet.payload[9:]
+        
+        if self.frame_id is None or base_id != self.frame_id:
+            self.request_keyframe(f"delta {frame_id} based on {base_id}, have {self.frame_id}")
+            return
+        
+        tiles = [i for i in range(DELTA_TILES_X * DELTA_TILES_Y) if tile_mask & (1 << i)]
+        tile_pixels = DELTA_TILE_WIDTH * DELTA_TILE_HEIGHT
+        
+        if frame_flags & FRAME_FLAG_COMPRESSED:
+            tile_data = rle_decode(tile_data, len(tiles) * tile_pixels)
+        
+        if len(tile_data) != len(tiles) * tile_pixels * 3:
+            print(f"Delta size mismatch: {len(tile_data)}, expected {len(tiles) * tile_pixels * 3}")
+            self.frame_id = None
+            self.request_keyframe("corrupt delta")
+            return
+        
+        row_bytes = DELTA_TILE_WIDTH * 3
+        src = 0
+        for tile in tiles:
+            tile_x = (tile % DELTA_TILES_X) * DELTA_TILE_WIDTH
+            tile_y = (tile // DELTA_TILES_X) * DELTA_TILE_HEIGHT
+            for row in range(DELTA_TILE_HEIGHT):
+                dst = ((tile_y + row) * MATRIX_WIDTH + tile_x) * 3
+                self.matrix_buffer[dst:dst + row_bytes] = tile_data[src:src + row_bytes]
+                src += row_bytes
+        
+        self.frame_id = frame_id
+        self.delta_frames += 1
+        self._frame_presented()
+    
+    def _process_frame_tile(self, packet: Packet):
+        """Processes one tile (band of full rows) of a tiled frame"""
+        if len(packet.payload) < 7:
+            print("Frame tile payload too short")
+            return
+        
+        frame_id, frame_flags, tile_index, tile_count, y, height = struct.unpack('<HBBBBB', packet.payload[:7])
+        pixel_data = packet.payload[7:]
+        
+        if frame_flags & FRAME_FLAG_COMPRESSED:
+            pixels = rle_decode(pixel_data, MATRIX_WIDTH * height)
+        else:
+            pixels = pixel_data
+        
+        expected_size = MATRIX_WIDTH * height * 3
+        if y + height > MATRIX_HEIGHT or len(pixels) != expected_size:
+            print(f"Tile size mismatch: {len(pixels)}, expected {expected_size}")
+            return
+        
+        if frame_id != self.tile_frame_id:
+            # tiles of a newer frame arrived, show whatever we have of the old one
+            self._present_tiles()
+            self.tile_frame_id = frame_id
+            self.tile_buffer[:] = self.matrix_buffer
+            self.tiles_received = set()
+            self.tile_count = tile_count
+            self.tile_deadline = time.monotonic() + TILE_DEADLINE
+        
+        start = y * MATRIX_WIDTH * 3
+        self.tile_buffer[start:start + expected_size] = pixels
+        self.tiles_received.add(tile_index)
+        
+        if len(self.tiles_received) >= self.tile_count:
+            self._present_tiles()
+    
+    def _present_tiles(self):
+        """Shows the frame being assembled, complete or not"""
+        if self.tile_frame_id is None:
+            return
+        
+        self.matrix_buffer[:] = self.tile_buffer
+        if len(self.tiles_received) >= self.tile_count:
+            self.frame_id = self.tile_frame_id
+        else:
+            # missing tiles keep old pixels, deltas can't be applied on top of that
+            self.frame_id = None
+            self.partial_frames += 1
+        self.tile_frame_id = None
+        self._frame_presented()
+    
+    def _check_tile_deadline(self):
+        if self.tile_frame_id is not None and time.monotonic() >= self.tile_deadline:
+            self._present_tiles()
     
     def _process_led_strip(self, packet: Packet):
         """Processes LED strip frame packet"""
@@ -373,26 +600,37 @@ class HardwareEmulator:
                     self.process_packet(packet)
                 except ValueError as e:
                     print(f"Error parsing packet: {e}")
+                
+                self._check_tile_deadline()
                     
             except socket.timeout:
+                self._check_tile_deadline()
                 continue
             except Exception as e:
                 if self.running:
                     print(f"UDP receiver error: {e}")
     
-    def start(self):
-        """Starts the emulator"""
-        # Setup UDP socket
+    def start_receiver(self):
+        """Opens the socket and starts the receiver thread (all a headless emulator needs)"""
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.sock.bind((self.host, self.port))
-        self.sock.settimeout(1.0)
+        self.sock.settimeout(TILE_DEADLINE / 2)
         
         self.running = True
         
-        # Start UDP receiver thread
         receiver = threading.Thread(target=self.udp_receiver_thread, daemon=True)
         receiver.start()
+    
+    def stop(self):
+        """Stops a headless emulator"""
+        self.running = False
+        if self.sock:
+            self.sock.close()
+    
+    def start(self):
+        """Starts the emulator"""
+        self.start_receiver()
         
         # Main event loop
         while self.running: